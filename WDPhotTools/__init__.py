@@ -4,7 +4,9 @@ from . import atmosphere_model_reader
 from . import plotter
 from . import fitter
 from . import reddening
+from . import sfr
 from . import util
+from . import wdlf_store
 
 __all__ = [
     'theoretical_lf',
@@ -13,7 +15,9 @@ __all__ = [
     'plotter',
     'fitter',
     'reddening',
-    'util'
+    'sfr',
+    'util',
+    'wdlf_store'
 ]
 
 __author__ = "Marco C Lam"
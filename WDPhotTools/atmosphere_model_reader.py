@@ -1,10 +1,34 @@
 import numpy as np
+from numpy.lib import recfunctions
 import os
-from scipy.interpolate import CloughTocher2DInterpolator
+from scipy.interpolate import RegularGridInterpolator
+
+from .synthetic_photometry import absolute_magnitude
+from .synthetic_photometry import load_synthetic_photometry
+from .synthetic_photometry import synthesise_photometry
+from .util import CloughTocher2DGradientInterpolator
 
 
 class atm_reader:
-    def __init__(self):
+    '''
+    Read the synthetic photometry of the DA and DB atmosphere models.
+
+    Parameters
+    ----------
+    columns: list of str (Default: None)
+        The photometric columns to be loaded, all the columns are loaded if
+        None. The physical properties ('Teff', 'logg', 'mass', 'Mbol' and
+        'age') are always loaded.
+    single_precision: boolean (Default: False)
+        Set to True to store the photometric columns (the BC and the
+        magnitudes) in float32 to halve their memory footprint. The
+        physical properties are always stored in float64.
+
+    '''
+
+    physical_columns = ['Teff', 'logg', 'mass', 'Mbol', 'age']
+
+    def __init__(self, columns=None, single_precision=False):
 
         # DA atmosphere
         filepath_da = os.path.join(os.path.dirname(os.path.abspath(__file__)),
@@ -61,13 +85,50 @@ class atm_reader:
             self.column_units[i] = k
             self.column_wavelengths[i] = l
 
-        self.column_type = np.array(([np.float64] * len(self.column_key)))
-        self.dtype = [(i, j)
-                      for i, j in zip(self.column_key, self.column_type)]
+        if columns is None:
+
+            columns = self.column_key
+
+        columns = np.asarray(columns).reshape(-1)
+
+        for i in columns:
+
+            if i not in self.column_names:
+
+                raise ValueError('{} is not a column of the atmosphere '
+                                 'models.'.format(i))
+
+        # Keep the columns in the order of the files
+        self.columns = [
+            i for i in self.column_key
+            if (i in self.physical_columns) or (i in columns)
+        ]
+        self.usecols = [list(self.column_key).index(i) for i in self.columns]
+
+        self.single_precision = single_precision
+
+        if single_precision:
+
+            self.column_type = np.array([
+                np.float64 if i in self.physical_columns else np.float32
+                for i in self.columns
+            ])
+
+        else:
+
+            self.column_type = np.array(([np.float64] * len(self.columns)))
+
+        self.dtype = [(i, j) for i, j in zip(self.columns, self.column_type)]
 
         # Load the synthetic photometry file in a recarray
-        self.model_da = np.loadtxt(filepath_da, skiprows=2, dtype=self.dtype)
-        self.model_db = np.loadtxt(filepath_db, skiprows=2, dtype=self.dtype)
+        self.model_da = np.loadtxt(filepath_da,
+                                   skiprows=2,
+                                   dtype=self.dtype,
+                                   usecols=self.usecols)
+        self.model_db = np.loadtxt(filepath_db,
+                                   skiprows=2,
+                                   dtype=self.dtype,
+                                   usecols=self.usecols)
 
         self.model_da['age'] = np.log10(self.model_da['age'])
         self.model_db['age'] = np.log10(self.model_db['age'])
@@ -81,14 +142,129 @@ class atm_reader:
 
         for i, j in zip(self.column_names.items(), self.column_units.items()):
 
+            if i[0] not in self.columns:
+
+                continue
+
             print('Parameter: {}, Column Name: {}, Unit: {}'.format(
                 i[1], i[0], j[1]))
 
+    def add_synthetic_photometry(self,
+                                 filters=None,
+                                 filepath=None,
+                                 overwrite=False):
+        '''
+        Add the synthetic photometry of the Koester DA spectra as columns of
+        the DA atmosphere models, so that any filter in filter_response can
+        be interpolated with interp_atm(). The synthetic surface magnitudes
+        are interpolated to the Teff and the logg of each model and
+        converted into absolute magnitudes with its mass. The DA models
+        outside the Koester grid and all the DB models are set to NaN, which
+        are not used by interp_atm().
+
+        Parameters
+        ----------
+        filters: str or list of str (Default: None)
+            The filters to be added, all the filters of the synthetic
+            photometry are added if None. The filters which are not in the
+            synthetic photometry are synthesised from the spectra, see
+            synthetic_photometry.synthesise_photometry().
+        filepath: str (Default: None)
+            The path of the synthetic photometry, see
+            synthetic_photometry.load_synthetic_photometry().
+        overwrite: boolean (Default: False)
+            Set to True to replace the columns which are already loaded.
+
+        Return
+        ------
+        List of the columns added.
+
+        '''
+
+        photometry = load_synthetic_photometry(filepath)
+
+        if filters is not None:
+
+            filters = list(np.asarray(filters).reshape(-1))
+
+        if (photometry is None) or ((filters is not None) and not np.isin(
+                filters, photometry['filters']).all()):
+
+            photometry = synthesise_photometry(filters)
+
+        if filters is None:
+
+            filters = list(photometry['filters'])
+
+        for i in filters:
+
+            if (i in self.columns) and (not overwrite):
+
+                raise ValueError(
+                    '{} is already loaded, set overwrite to True to replace '
+                    'it.'.format(i))
+
+        # Interpolate the surface magnitudes to the DA models
+        points = np.column_stack(
+            (self.model_da['logg'], np.log10(self.model_da['Teff'])))
+        data = {}
+
+        for i in filters:
+
+            k = list(photometry['filters']).index(i)
+            surface_magnitude = RegularGridInterpolator(
+                (photometry['logg'], np.log10(photometry['Teff'])),
+                photometry['data'][k],
+                bounds_error=False,
+                fill_value=np.nan)(points)
+            data[i] = absolute_magnitude(surface_magnitude,
+                                         self.model_da['mass'],
+                                         self.model_da['logg'])
+
+            if i not in self.column_names:
+
+                self.column_names[i] = i
+                self.column_units[i] = 'mag'
+
+            self.column_wavelengths[i] = float(
+                photometry['pivot_wavelength'][k])
+
+        dtype = np.float32 if self.single_precision else np.float64
+        new_columns = [i for i in filters if i not in self.columns]
+
+        for i in filters:
+
+            if i in self.columns:
+
+                self.model_da[i] = data[i]
+                self.model_db[i] = np.nan
+
+        if len(new_columns) > 0:
+
+            self.model_da = recfunctions.append_fields(
+                self.model_da,
+                new_columns, [data[i] for i in new_columns],
+                dtypes=[dtype] * len(new_columns),
+                usemask=False)
+            self.model_db = recfunctions.append_fields(
+                self.model_db,
+                new_columns,
+                [np.full(len(self.model_db), np.nan) for i in new_columns],
+                dtypes=[dtype] * len(new_columns),
+                usemask=False)
+            self.columns += new_columns
+            self.column_type = np.append(self.column_type,
+                                         [dtype] * len(new_columns))
+            self.dtype += [(i, dtype) for i in new_columns]
+
+        return filters
+
     def interp_atm(self,
                    dependent='G3',
                    atmosphere='H',
                    independent=['logg', 'Mbol'],
                    logg=8.0,
+                   extinction=None,
                    kwargs_for_interpolator={
                        'fill_value': float('-inf'),
                        'tol': 1e-10,
@@ -101,20 +277,28 @@ class atm_reader:
 
         Parameters
         ----------
-        dependent: str (Default: 'G3')
+        dependent: str or list of str (Default: 'G3')
             The value to be interpolated over. Choose from:
             'Teff', 'logg', 'mass', 'Mbol', 'BC', 'U', 'B', 'V', 'R', 'I', 'J',
             'H', 'Ks', 'Y_mko', 'J_mko', 'H_mko', 'K_mko', 'W1',
             'W2', 'W3', 'W4', 'S36', 'S45', 'S58', 'S80', 'u_sdss', 'g_sdss',
             'r_sdss', 'i_sdss', 'z_sdss', 'g_ps1', 'r_ps1', 'i_ps1', 'z_ps1',
             'y_ps1', 'G2', 'G2_BP', 'G2_RP', 'G3', 'G3_BP', 'G3_RP', 'FUV',
-            'NUV', 'age'.
+            'NUV', 'age'. If a list is provided, a single multi-output
+            interpolator is returned, which shares the triangulation of the
+            grid and returns the values in the order of the list along the
+            last axis.
         atmosphere: str (Default: 'H')
             The atmosphere type, 'H' or 'He'.
         independent: list (Default: ['logg', 'Mbol'])
             The parameters to be interpolated over for dependent.
         logg: float (Default: 8.0)
             Only used if independent is of length 1.
+        extinction: array of float (Default: None)
+            The extinction of every model in the dependent, in the shape of
+            (nmodel, ) or (nmodel, ndependent). If provided, the reddened
+            values, i.e. the values plus the extinction, are interpolated.
+            The models with NaN extinction are not used.
         kwargs_for_interpolator: dict (Default: {'fill_value': -np.inf,
             'tol': 1e-10, 'maxiter': 100000})
             Keyword argument for the interpolator. See
@@ -122,7 +306,10 @@ class atm_reader:
 
         Returns
         -------
-            A callable function of CloughTocher2DInterpolator.
+            A callable function of CloughTocher2DInterpolator, the gradient
+            with respect to the independent variables is given by its
+            gradient() and value_and_gradient() methods, see
+            util.CloughTocher2DGradientInterpolator.
 
         """
 
@@ -143,6 +330,42 @@ class atm_reader:
 
         independent = np.asarray(independent).reshape(-1)
 
+        for i in np.concatenate((np.asarray(dependent).reshape(-1),
+                                 independent)):
+
+            if i not in self.columns:
+
+                raise ValueError(
+                    '{} is not loaded, please include it in the columns of '
+                    'the atm_reader.'.format(i))
+
+        # Stack the dependent columns if more than one is requested
+        if isinstance(dependent, str):
+
+            values = model[dependent]
+
+        else:
+
+            values = np.column_stack([model[i] for i in dependent])
+
+        if extinction is not None:
+
+            values = values + np.asarray(extinction).reshape(values.shape)
+
+        # The models without synthetic photometry are NaN, see
+        # add_synthetic_photometry()
+        valid = ~np.isnan(values.reshape(len(model), -1)).any(axis=1)
+
+        if not valid.any():
+
+            raise ValueError('There is no {} model with {}.'.format(
+                atmosphere, dependent))
+
+        if not valid.all():
+
+            model = model[valid]
+            values = values[valid]
+
         # If only performing a 1D interpolation, the logg has to be assumed.
         if len(independent) == 1:
 
@@ -157,22 +380,34 @@ class atm_reader:
                     'variable has to be one of: Teff, mass, Mbol, or age.')
 
             # Interpolate with the scipy CloughTocher2DInterpolator
-            _atmosphere_interpolator = CloughTocher2DInterpolator(
+            _atmosphere_interpolator = CloughTocher2DGradientInterpolator(
                 (model[independent[0]], model[independent[1]]),
-                model[dependent], **kwargs_for_interpolator)
+                values, **kwargs_for_interpolator)
 
             # Interpolate with the scipy interp1d
             def atmosphere_interpolator(x):
                 return _atmosphere_interpolator(logg, x)
 
+            # The derivative with respect to the independent variable
+            def value_and_gradient(x):
+                value, gradient = _atmosphere_interpolator.value_and_gradient(
+                    logg, x)
+                return value, gradient[..., 1:]
+
+            def gradient(x):
+                return value_and_gradient(x)[1]
+
+            atmosphere_interpolator.value_and_gradient = value_and_gradient
+            atmosphere_interpolator.gradient = gradient
+
         # If a 2D grid is to be interpolated, normally is the logg and another
         # parameter
         elif len(independent) == 2:
 
             # Interpolate with the scipy CloughTocher2DInterpolator
-            atmosphere_interpolator = CloughTocher2DInterpolator(
+            atmosphere_interpolator = CloughTocher2DGradientInterpolator(
                 (model[independent[0]], model[independent[1]]),
-                model[dependent], **kwargs_for_interpolator)
+                values, **kwargs_for_interpolator)
 
         else:
 
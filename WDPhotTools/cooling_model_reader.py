@@ -1,32 +1,27 @@
-import io
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from itertools import islice
 import glob
+import json
 import numpy as np
+from numpy.lib.recfunctions import repack_fields, structured_to_unstructured
 import os
+import warnings
 
-model_list = {
-    'montreal_co_da_20': 'Bedard et al. 2020 CO DA',
-    'montreal_co_db_20': 'Bedard et al. 2020 CO DB',
-    'lpcode_he_da_07': 'Panei et al. 2007 He DA',
-    'lpcode_co_da_07': 'Panei et al. 2007 CO DA',
-    'lpcode_he_da_09': 'Althaus et al. 2009 He DA',
-    'lpcode_co_da_10_z001': 'Renedo et al. 2010 CO DA Z=0.01',
-    'lpcode_co_da_10_z0001': 'Renedo et al. 2010 CO DA Z=0.001',
-    'lpcode_co_da_15_z00003': 'Althaus et al. 2015 DA Z=0.00003',
-    'lpcode_co_da_15_z0001': 'Althaus et al. 2015 DA Z=0.0001',
-    'lpcode_co_da_15_z0005': 'Althaus et al. 2015 DA Z=0.0005',
-    'lpcode_co_db_17_z00005': 'Althaus et al. 2017 DB Y=0.4',
-    'lpcode_co_db_17_z0001': 'Althaus et al. 2017 DB Y=0.4',
-    'lpcode_co_db_17': 'Camisassa et al. 2017 DB',
-    'basti_co_da_10': 'Salari et al. 2010 CO DA',
-    'basti_co_db_10': 'Salari et al. 2010 CO DB',
-    'basti_co_da_10_nps': 'Salari et al. 2010 CO DA, no phase separation',
-    'basti_co_db_10_nps': 'Salari et al. 2010 CO DB, no phase separation',
-    'lpcode_one_da_07': 'Althaus et al. 2007 ONe DA',
-    'lpcode_one_da_19': 'Camisassa et al. 2019 ONe DA',
-    'lpcode_one_db_19': 'Camisassa et al. 2019 ONe DB',
-    'mesa_one_da_18': 'Lauffer et al. 2018 ONe DA',
-    'mesa_one_db_18': 'Lauffer et al. 2018 ONe DB'
-}
+from .util import temporary_path
+
+
+# The default location of the packed archive of the cooling models, see
+# build_cooling_model_archive()
+archive_path = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                            'wd_cooling', 'cooling_models.npy')
+
+# The version of the format of the archive, an archive of another version
+# is not used
+archive_version = 1
+
+# The opened archives, keyed by their paths
+_archives = {}
 
 
 def list_cooling_model():
@@ -62,9 +57,364 @@ def list_cooling_parameters(model):
             i[1], i[0], j[1]))
 
 
-def get_cooling_model(model, mass_range='all'):
+def list_cooling_model_names(mass_range='all'):
+    '''
+    Get the names of the cooling models which are available in the chosen
+    mass range, in the order of the `model_list`.
+
+    Parameters
+    ----------
+    mass_range: str (Default: 'all')
+        'all', 'low', 'intermediate' or 'high'.
+
+    '''
+
+    if mass_range == 'all':
+
+        return list(cooling_model_registry)
+
+    return [
+        model for model, entry in cooling_model_registry.items()
+        if mass_range in entry['mass_ranges']
+    ]
+
+
+def _check_mass_range(model, mass_range):
+    '''
+    Check if the model exists and is available in the chosen mass range,
+    from the registry only, without finding or parsing any track file.
+
+    '''
+
+    if model not in cooling_model_registry:
+
+        raise ValueError('Invalid model name.')
+
+    if (mass_range != 'all') and (
+            mass_range not in cooling_model_registry[model]['mass_ranges']):
+
+        raise ValueError(
+            '{} is not available in the {} mass range, please choose from: '
+            '{}.'.format(model, mass_range, ', '.join(
+                ('all', ) + cooling_model_registry[model]['mass_ranges'])))
+
+
+def get_cooling_model(model,
+                      mass_range='all',
+                      n_jobs=1,
+                      backend='thread',
+                      archive=None):
+    '''
+    Choose the specified cooling model for the chosen mass range. The
+    cooling tracks are returned in ascending order of mass.
+
+    Parameters
+    ----------
+    model: str
+        Name of the cooling model as in the `model_list`.
+    mass_range: str (Default: 'all')
+        The mass range in which the cooling model should return.
+        The ranges are defined as <0.5, 0.5-1.0 and >1.0 solar masses.
+    n_jobs: int (Default: 1)
+        The number of workers to parse the track files concurrently. Set to
+        -1 to use all the available cores.
+    backend: str (Default: 'thread')
+        Choose from 'thread' and 'process' for the pool of workers.
+    archive: str, CoolingModelArchive or boolean (Default: None)
+        The packed archive of the cooling models. If the model is in the
+        archive, the tracks are read-only views of the memory-mapped
+        archive and no track file is parsed. If None, the archive at the
+        default `archive_path` is used if it exists. Set to False to always
+        parse the track files.
+
+    '''
+
+    archive = _get_archive(archive)
+
+    if (archive is not None) and archive.has(model, mass_range):
+
+        return archive.get(model, mass_range)
+
+    mass, filelist, loader, column_names, column_units = _get_catalogue(
+        model, mass_range)
+
+    cooling_model = _load_tracks(filelist,
+                                 loader,
+                                 n_jobs=n_jobs,
+                                 backend=backend)
+
+    return mass, cooling_model, column_names, column_units
+
+
+def get_cooling_tracks(model, mass_range='all', archive=None):
+    '''
+    Get a lazy accessor of the specified cooling model for the chosen mass
+    range. Only the list of the track files is prepared, the tracks are
+    parsed on demand. See `CoolingTracks`.
+
+    Parameters
+    ----------
+    model: str
+        Name of the cooling model as in the `model_list`.
+    mass_range: str (Default: 'all')
+        The mass range in which the cooling model should return.
+        The ranges are defined as <0.5, 0.5-1.0 and >1.0 solar masses.
+    archive: str, CoolingModelArchive or boolean (Default: None)
+        The packed archive of the cooling models, see get_cooling_model().
+
+    '''
+
+    return CoolingTracks(model, mass_range, archive=archive)
+
+
+class CoolingTracks:
+    '''
+    A lazy accessor of a cooling model. The masses, the column names and the
+    units are available without parsing any track, a track is only parsed
+    when it is requested, and only the requested columns are kept.
+
+    Parameters
+    ----------
+    model: str
+        Name of the cooling model as in the `model_list`.
+    mass_range: str (Default: 'all')
+        The mass range in which the cooling model should return.
+        The ranges are defined as <0.5, 0.5-1.0 and >1.0 solar masses.
+    archive: str, CoolingModelArchive or boolean (Default: None)
+        The packed archive of the cooling models, see get_cooling_model().
+        If the model is in the archive, the tracks are sliced from the
+        archive instead of parsed from the track files.
+
+    '''
+    def __init__(self, model, mass_range='all', archive=None):
+
+        self.model = model
+        self.mass_range = mass_range
+        self.archive = _get_archive(archive)
+
+        if (self.archive is not None) and self.archive.has(model, mass_range):
+
+            self.mass, self.tracks, self.column_names,\
+                self.column_units = self.archive.get(model, mass_range)
+            self.filelist = None
+            self.loader = None
+
+        else:
+
+            self.archive = None
+            self.mass, self.filelist, self.loader, self.column_names,\
+                self.column_units = _get_catalogue(model, mass_range)
+
+    def __len__(self):
+
+        return len(self.mass)
+
+    def _select(self, mass):
+        '''
+        Get the indices of the tracks of the given masses, to the nearest
+        0.001 solar mass.
+
+        '''
+
+        if isinstance(mass, str) and (mass == 'all'):
+
+            return np.arange(len(self.mass))
+
+        index = []
+
+        for m in np.asarray(mass, dtype=np.float64).reshape(-1):
+
+            match = np.where(np.isclose(self.mass, m, rtol=0., atol=1e-3))[0]
+
+            if len(match) == 0:
+
+                raise ValueError('There is no track of mass {} in {}, the '
+                                 'available masses are: {}.'.format(
+                                     m, self.model, self.mass))
+
+            index.append(match[0])
+
+        return np.array(index, dtype=int)
+
+    def get(self,
+            mass='all',
+            columns=None,
+            n_jobs=1,
+            backend='thread',
+            single_precision=False):
+        '''
+        Parse the tracks of the given masses.
+
+        Parameters
+        ----------
+        mass: str, float or list of float (Default: 'all')
+            The masses of the tracks, or 'all'.
+        columns: list of str (Default: None)
+            The columns to be kept, all the columns are kept if None.
+        n_jobs: int (Default: 1)
+            The number of workers to parse the track files concurrently.
+        backend: str (Default: 'thread')
+            Choose from 'thread' and 'process' for the pool of workers.
+        single_precision: boolean (Default: False)
+            Set to True to store the photometric columns in float32, see
+            get_cooling_model_flat().
+
+        Return
+        ------
+        The array of the masses and the object array of the tracks, as in
+        get_cooling_model().
+
+        '''
+
+        index = self._select(mass)
+        columns = self._check_columns(columns)
+
+        if self.archive is not None:
+
+            cooling_model = np.empty(len(index), dtype='object')
+
+            for i, j in enumerate(index):
+
+                if columns is None:
+
+                    cooling_model[i] = self.tracks[j]
+
+                else:
+
+                    cooling_model[i] = self.tracks[j][columns]
+
+                if single_precision:
+
+                    cooling_model[i] = _single_precision(
+                        cooling_model[i], self.column_units)
+
+            return self.mass[index], cooling_model
+
+        if columns is None:
+
+            loader = self.loader
+
+        else:
+
+            loader = partial(self.loader, usecols=columns)
+
+        cooling_model = _load_tracks(np.asarray(self.filelist)[index],
+                                     loader,
+                                     n_jobs=n_jobs,
+                                     backend=backend)
+
+        if single_precision:
+
+            for i, track in enumerate(cooling_model):
+
+                cooling_model[i] = _single_precision(track, self.column_units)
+
+        return self.mass[index], cooling_model
+
+    def get_flat(self,
+                 mass='all',
+                 columns=None,
+                 n_jobs=1,
+                 backend='thread',
+                 single_precision=False):
+        '''
+        Parse the tracks of the given masses into the flat representation,
+        see get_cooling_model_flat(). If the tracks are sliced from the
+        archive, they are a single zero-copy view of the archive.
+
+        Parameters
+        ----------
+        mass: str, float or list of float (Default: 'all')
+            The masses of the tracks, or 'all'.
+        columns: list of str (Default: None)
+            The columns to be kept, all the columns are kept if None.
+        n_jobs: int (Default: 1)
+            The number of workers to parse the track files concurrently.
+        backend: str (Default: 'thread')
+            Choose from 'thread' and 'process' for the pool of workers.
+        single_precision: boolean (Default: False)
+            Set to True to store the photometric columns in float32, see
+            get_cooling_model_flat().
+
+        Return
+        ------
+        The array of the masses, the offsets of the tracks and the
+        concatenated tracks.
+
+        '''
+
+        if self.archive is not None:
+
+            index = self._select(mass)
+            columns = self._check_columns(columns)
+            mass, offsets, tracks, _, _ = self.archive.get_flat(
+                self.model, self.mass_range, index=index)
+
+            if columns is not None:
+
+                tracks = tracks[columns]
+
+            if single_precision:
+
+                tracks = _single_precision(tracks, self.column_units)
+
+            return mass, offsets, tracks
+
+        mass, cooling_model = self.get(mass=mass,
+                                       columns=columns,
+                                       n_jobs=n_jobs,
+                                       backend=backend,
+                                       single_precision=single_precision)
+
+        if len(cooling_model) == 0:
+
+            if columns is None:
+
+                columns = list(self.column_names)
+
+            tracks = np.zeros(0, dtype=[(i, np.float64) for i in columns])
+
+            if single_precision:
+
+                tracks = _single_precision(tracks, self.column_units)
+
+            return mass, np.zeros(1, dtype=np.int64), tracks
+
+        offsets, tracks = _flatten_tracks(cooling_model)
+
+        return mass, offsets, tracks
+
+    def _check_columns(self, columns):
+
+        if columns is None:
+
+            return None
+
+        columns = list(np.asarray(columns).reshape(-1))
+
+        for c in columns:
+
+            if c not in self.column_names:
+
+                raise ValueError('{} is not a column of {}.'.format(
+                    c, self.model))
+
+        return columns
+
+
+def get_cooling_model_flat(model,
+                           mass_range='all',
+                           columns=None,
+                           n_jobs=1,
+                           backend='thread',
+                           archive=None,
+                           single_precision=False):
     '''
-    Choose the specified cooling model for the chosen mass range.
+    Choose the specified cooling model for the chosen mass range, in a flat
+    representation: the tracks, in ascending order of mass, are
+    concatenated into a single structured array, and the i-th track is
+    tracks[offsets[i]:offsets[i + 1]]. The mass of each point on the tracks
+    is np.repeat(mass, np.diff(offsets)).
 
     Parameters
     ----------
@@ -73,80 +423,746 @@ def get_cooling_model(model, mass_range='all'):
     mass_range: str (Default: 'all')
         The mass range in which the cooling model should return.
         The ranges are defined as <0.5, 0.5-1.0 and >1.0 solar masses.
+    columns: list of str (Default: None)
+        The columns to be kept, all the columns are kept if None.
+    n_jobs: int (Default: 1)
+        The number of workers to parse the track files concurrently.
+    backend: str (Default: 'thread')
+        Choose from 'thread' and 'process' for the pool of workers.
+    archive: str, CoolingModelArchive or boolean (Default: None)
+        The packed archive of the cooling models, see get_cooling_model().
+    single_precision: boolean (Default: False)
+        Set to True to store the photometric columns (those in unit of mag)
+        in float32. The ages, luminosities and the other physical
+        properties are always stored in float64.
+
+    Return
+    ------
+    The array of the masses, the offsets of the tracks, the concatenated
+    tracks, the column names and the column units.
+
+    '''
+
+    cooling_tracks = CoolingTracks(model, mass_range, archive=archive)
+    mass, offsets, tracks = cooling_tracks.get_flat(
+        columns=columns,
+        n_jobs=n_jobs,
+        backend=backend,
+        single_precision=single_precision)
+
+    return mass, offsets, tracks, cooling_tracks.column_names,\
+        cooling_tracks.column_units
+
+
+def _single_precision(track, column_units):
+    '''
+    Cast the photometric columns (those in unit of mag) of a track to
+    float32, the other columns are kept in float64.
+
+    '''
+
+    dtype = [(i, np.float32 if column_units.get(i) == 'mag' else np.float64)
+             for i in track.dtype.names]
+
+    return track.astype(dtype)
+
+
+def _flatten_tracks(cooling_model):
+    '''
+    Concatenate the object array of tracks into the flat representation.
+
+    Return
+    ------
+    The offsets of the tracks and the concatenated tracks.
+
+    '''
+
+    nrows = np.array([len(i) for i in cooling_model], dtype=np.int64)
+    offsets = np.concatenate(([0], np.cumsum(nrows)))
+
+    return offsets, np.concatenate(list(cooling_model))
+
+
+def resample_cooling_tracks(mass, offsets, tracks, n_logL=1000, n_mass=200):
+    '''
+    Resample the ragged cooling tracks onto a uniform log(luminosity) x mass
+    grid of the cooling age. Each track is interpolated linearly in logL on
+    its cooling sequence, i.e. the part over which the luminosity keeps
+    decreasing with age, and then the tracks are interpolated linearly in
+    mass. The grid is NaN outside the physical domain, i.e. beyond the
+    luminosity range of either of the neighbouring tracks, or outside the
+    mass range of the tracks.
+
+    Parameters
+    ----------
+    mass: array of float
+        The masses of the tracks.
+    offsets: array of int
+        The offsets of the tracks, as returned by get_cooling_model_flat().
+    tracks: structured array or dict of arrays
+        The concatenated tracks with the columns 'age' in yr and 'lum' in
+        erg/s, as returned by get_cooling_model_flat().
+    n_logL: int (Default: 1000)
+        The number of grid points in log(luminosity).
+    n_mass: int (Default: 200)
+        The number of grid points in mass.
+
+    Return
+    ------
+    The grid of log(luminosity) in erg/s, the grid of mass in solar mass,
+    and the cooling age in yr in the shape of (n_logL, n_mass).
+
+    '''
+
+    mass = np.asarray(mass, dtype=np.float64).reshape(-1)
+
+    # Only one track per mass is used
+    mass, index = np.unique(mass, return_index=True)
+
+    if len(mass) < 2:
+
+        raise ValueError('At least 2 tracks of different masses are needed '
+                         'to resample onto a grid.')
+
+    age_flat = np.asarray(tracks['age'], dtype=np.float64)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+
+        logL_flat = np.log10(np.asarray(tracks['lum'], dtype=np.float64))
+
+    logL_tracks = []
+    age_tracks = []
 
+    for i in index:
+
+        age = age_flat[offsets[i]:offsets[i + 1]]
+        logL = logL_flat[offsets[i]:offsets[i + 1]]
+
+        finite = np.isfinite(age) & np.isfinite(logL)
+        age = age[finite]
+        logL = logL[finite]
+
+        # Keep the cooling sequence, along which logL is strictly decreasing
+        order = np.argsort(age, kind='stable')
+        age = age[order]
+        logL = logL[order]
+        keep = np.concatenate(
+            ([True], logL[1:] < np.minimum.accumulate(logL)[:-1]))
+
+        logL_tracks.append(logL[keep][::-1])
+        age_tracks.append(age[keep][::-1])
+
+    logL_grid = np.linspace(min(i[0] for i in logL_tracks),
+                            max(i[-1] for i in logL_tracks), n_logL)
+    mass_grid = np.linspace(mass[0], mass[-1], n_mass)
+
+    # Resample each track in logL, NaN beyond its luminosity range
+    age_logL = np.column_stack([
+        np.interp(logL_grid, logL, age, left=np.nan, right=np.nan)
+        for logL, age in zip(logL_tracks, age_tracks)
+    ])
+
+    # Interpolate between the neighbouring tracks in mass
+    idx = np.clip(
+        np.searchsorted(mass, mass_grid, side='right') - 1, 0,
+        len(mass) - 2)
+    weight = (mass_grid - mass[idx]) / (mass[idx + 1] - mass[idx])
+
+    with np.errstate(invalid='ignore'):
+
+        age_grid = (age_logL[:, idx] * (1. - weight) +
+                    age_logL[:, idx + 1] * weight)
+
+    # On a track, the neighbouring track is not needed
+    age_grid = np.where(weight == 0., age_logL[:, idx], age_grid)
+    age_grid = np.where(weight == 1., age_logL[:, idx + 1], age_grid)
+
+    return logL_grid, mass_grid, age_grid
+
+
+def build_cooling_model_archive(filepath=None,
+                                models=None,
+                                n_jobs=1,
+                                backend='thread'):
     '''
+    Pack the cooling models into a single archive, so that they can be
+    memory-mapped instead of parsed from the track files. The archive is a
+    flat float64 .npy file, in which the tracks of each model are stored
+    as one contiguous block of records, and a JSON index (same path with
+    the .json extension) of the column names and units of each model, and
+    the mass, the offset and the number of rows of each track. The index
+    also records the format version and the modification times and sizes
+    of the track files of each model, a model whose track files have been
+    changed, added or removed since the archive was built is read from the
+    track files instead, until the archive is rebuilt.
 
-    if model in ['montreal_co_da_20', 'montreal_co_db_20']:
+    Parameters
+    ----------
+    filepath: str (Default: None)
+        The path to the archive, the default `archive_path` is used if None.
+    models: list of str (Default: None)
+        The cooling models to be packed, all the models in the `model_list`
+        are packed if None. A model which cannot be parsed is skipped with
+        a warning.
+    n_jobs: int (Default: 1)
+        The number of workers to parse the track files concurrently.
+    backend: str (Default: 'thread')
+        Choose from 'thread' and 'process' for the pool of workers.
+
+    Return
+    ------
+    The path to the archive.
 
-        mass, cooling_model, column_names, column_units =\
-            _bedard20_formatter(model, mass_range)
+    '''
 
-    elif model in ['lpcode_he_da_07', 'lpcode_co_da_07']:
+    if filepath is None:
 
-        mass, cooling_model, column_names, column_units =\
-            _panei07_formatter(model)
+        filepath = archive_path
 
-    elif model == 'lpcode_he_da_09':
+    filepath = os.path.abspath(filepath)
 
-        mass, cooling_model, column_names, column_units =\
-            _althaus09_formatter(mass_range)
+    if models is None:
 
-    elif model in ['lpcode_co_db_17_z00005', 'lpcode_co_db_17_z0001']:
+        models = list(model_list)
 
-        mass, cooling_model, column_names, column_units =\
-            _althaus17_formatter(model, mass_range)
+    blocks = []
+    index = {}
+    offset = 0
 
-    elif model in ['lpcode_co_da_10_z001', 'lpcode_co_da_10_z0001']:
+    for model in models:
 
-        mass, cooling_model, column_names, column_units =\
-            _renedo10_formatter(model)
+        try:
 
-    elif model in [
-            'lpcode_co_da_15_z00003', 'lpcode_co_da_15_z0001',
-            'lpcode_co_da_15_z0005'
-    ]:
+            mass, filelist, loader, column_names, column_units =\
+                _get_catalogue(model)
+            cooling_model = _load_tracks(filelist,
+                                         loader,
+                                         n_jobs=n_jobs,
+                                         backend=backend)
 
-        mass, cooling_model, column_names, column_units =\
-            _althaus15_formatter(model)
+        except (OSError, ValueError) as e:
 
-    elif model == 'lpcode_co_db_17':
+            warnings.warn('{} is not archived: {}'.format(model, e))
+            continue
 
-        mass, cooling_model, column_names, column_units =\
-                _camisassa17_formatter()
+        if len(mass) == 0:
 
-    elif model in [
-            'basti_co_da_10', 'basti_co_db_10', 'basti_co_da_10_nps',
-            'basti_co_db_10_nps'
-    ]:
+            warnings.warn('{} is not archived: no track file is '
+                          'found.'.format(model))
+            continue
 
-        mass, cooling_model, column_names, column_units =\
-            _salaris10_formatter(model, mass_range)
+        columns = list(cooling_model[0].dtype.names)
+        track_offsets, flat = _flatten_tracks(cooling_model)
+        block = structured_to_unstructured(flat, dtype=np.float64)
+        blocks.append(np.ascontiguousarray(block).reshape(-1))
 
-    elif model == 'lpcode_one_da_07':
+        tracks = [{
+            'mass': float(m),
+            'offset': offset + int(track_offsets[i]) * len(columns),
+            'nrows': int(track_offsets[i + 1] - track_offsets[i])
+        } for i, m in enumerate(mass)]
 
-        mass, cooling_model, column_names, column_units =\
-            _althaus07_formatter()
+        offset += block.size
 
-    elif model in ['lpcode_one_da_19', 'lpcode_one_db_19']:
+        # The tracks in each mass range, as their positions in the model
+        position = {f: i for i, f in enumerate(filelist)}
+        mass_ranges = {}
 
-        mass, cooling_model, column_names, column_units =\
-            _camisassa19_formatter(model)
+        for mass_range in ('all', ) + cooling_model_registry[model][
+                'mass_ranges']:
 
-    elif model in ['mesa_one_da_18', 'mesa_one_db_18']:
+            mass_ranges[mass_range] = [
+                position[f] for f in _get_catalogue(model, mass_range)[1]
+            ]
 
-        mass, cooling_model, column_names, column_units =\
-            _lauffer18_formatter(model)
+        index[model] = {
+            'columns': columns,
+            'column_names': column_names,
+            'column_units': column_units,
+            'mass_ranges': mass_ranges,
+            'tracks': tracks,
+            'sources': _get_sources(filelist)
+        }
+
+    if len(blocks) > 0:
+
+        data = np.concatenate(blocks)
 
     else:
 
-        raise ValueError('Invalid model name.')
+        data = np.zeros(0)
 
-    return mass, cooling_model, column_names, column_units
+    # Write to temporary files first so that a partially written archive is
+    # never read
+    index_path = os.path.splitext(filepath)[0] + '.json'
+    tmp_path = temporary_path(filepath)
+    tmp_index_path = temporary_path(index_path)
+
+    with open(tmp_path, 'wb') as f:
+
+        np.save(f, data)
+
+    with open(tmp_index_path, 'w') as f:
+
+        json.dump({'version': archive_version, 'models': index}, f)
 
+    _archives.pop(filepath, None)
+    os.replace(tmp_path, filepath)
+    os.replace(tmp_index_path, index_path)
 
-def _althaus07_formatter():
+    return filepath
+
+
+class CoolingModelArchive:
     '''
-    A formatter to load the Althaus et al. 2007 WD cooling model
+    A memory-mapped packed archive of the cooling models, see
+    build_cooling_model_archive(). The tracks are zero-copy read-only views
+    of the archive, so only the pages which are accessed are read from the
+    disk.
+
+    Parameters
+    ----------
+    filepath: str (Default: None)
+        The path to the archive, the default `archive_path` is used if None.
+
+    '''
+    def __init__(self, filepath=None):
+
+        if filepath is None:
+
+            filepath = archive_path
+
+        self.filepath = os.path.abspath(filepath)
+
+        with open(os.path.splitext(self.filepath)[0] + '.json') as f:
+
+            index = json.load(f)
+
+        # The archives built before the format was versioned have no version
+        self.version = index.get('version')
+        self.index = index.get('models', {})
+        self.data = np.load(self.filepath, mmap_mode='r')
+
+        # The models whose track files have not changed, checked on demand
+        self._up_to_date = {}
+
+    def __contains__(self, model):
+
+        return model in self.index
+
+    def is_up_to_date(self, model):
+        '''
+        Check if the track files of the model are the same as when the
+        archive was built, by their paths, modification times and sizes.
+
+        '''
+
+        if model not in self._up_to_date:
+
+            try:
+
+                filelist = _get_catalogue(model)[1]
+
+            except ValueError:
+
+                filelist = []
+
+            up_to_date = (self.index[model].get('sources') ==
+                          _get_sources(filelist))
+
+            if not up_to_date:
+
+                warnings.warn('The track files of {} have changed since the '
+                              'archive {} was built, they are read instead. '
+                              'Rebuild the archive with '
+                              'build_cooling_model_archive().'.format(
+                                  model, self.filepath))
+
+            self._up_to_date[model] = up_to_date
+
+        return self._up_to_date[model]
+
+    def has(self, model, mass_range='all'):
+        '''
+        Check if the mass range of the model is in the archive and its
+        track files have not changed since the archive was built.
+
+        '''
+
+        return (self.version == archive_version) and (
+            model in self.index) and isinstance(mass_range, str) and (
+                mass_range in self.index[model]['mass_ranges']
+            ) and self.is_up_to_date(model)
+
+    def get(self, model, mass_range='all'):
+        '''
+        Get the specified cooling model for the chosen mass range, in the
+        same format as get_cooling_model().
+
+        Parameters
+        ----------
+        model: str
+            Name of the cooling model as in the `model_list`.
+        mass_range: str (Default: 'all')
+            The mass range in which the cooling model should return.
+
+        '''
+
+        entry = self.index[model]
+        dtype = np.dtype([(i, np.float64) for i in entry['columns']])
+        ncols = len(entry['columns'])
+        selected = entry['mass_ranges'][mass_range]
+
+        mass = np.array([entry['tracks'][i]['mass'] for i in selected],
+                        dtype=np.float64)
+        cooling_model = np.empty(len(selected), dtype='object')
+
+        for i, j in enumerate(selected):
+
+            start = entry['tracks'][j]['offset']
+            end = start + entry['tracks'][j]['nrows'] * ncols
+            cooling_model[i] = self.data[start:end].view(dtype, np.ndarray)
+
+        return mass, cooling_model, dict(entry['column_names']), dict(
+            entry['column_units'])
+
+    def get_flat(self, model, mass_range='all', index=None):
+        '''
+        Get the specified cooling model for the chosen mass range, in the
+        same format as get_cooling_model_flat(). The tracks of a mass range
+        are adjacent in the archive, so they are a single zero-copy view.
+
+        Parameters
+        ----------
+        model: str
+            Name of the cooling model as in the `model_list`.
+        mass_range: str (Default: 'all')
+            The mass range in which the cooling model should return.
+        index: array of int (Default: None)
+            The positions of the tracks in the mass range, all the tracks
+            are returned if None.
+
+        '''
+
+        entry = self.index[model]
+        dtype = np.dtype([(i, np.float64) for i in entry['columns']])
+        ncols = len(entry['columns'])
+        selected = np.asarray(entry['mass_ranges'][mass_range], dtype=int)
+
+        if index is not None:
+
+            selected = selected[index]
+
+        mass = np.array([entry['tracks'][i]['mass'] for i in selected],
+                        dtype=np.float64)
+        start = np.array([entry['tracks'][i]['offset'] for i in selected],
+                         dtype=np.int64)
+        nrows = np.array([entry['tracks'][i]['nrows'] for i in selected],
+                         dtype=np.int64)
+        offsets = np.concatenate(([0], np.cumsum(nrows)))
+
+        if np.array_equal(start[1:], start[:-1] + nrows[:-1] * ncols):
+
+            begin = start[0] if len(start) > 0 else 0
+            tracks = self.data[begin:begin + offsets[-1] * ncols].view(
+                dtype, np.ndarray)
+
+        else:
+
+            tracks = np.concatenate([
+                self.data[i:i + n * ncols].view(dtype, np.ndarray)
+                for i, n in zip(start, nrows)
+            ])
+
+        return mass, offsets, tracks, dict(entry['column_names']), dict(
+            entry['column_units'])
+
+
+def _get_archive(archive=None):
+    '''
+    Get the opened archive, the archive at the default `archive_path` if
+    None and it exists, or None if archive is False. An archive of another
+    format version is not used, so the track files are read instead.
+
+    '''
+
+    if archive is False:
+
+        return None
+
+    if isinstance(archive, CoolingModelArchive):
+
+        return archive
+
+    if archive is None:
+
+        if not os.path.exists(archive_path):
+
+            return None
+
+        archive = archive_path
+
+    archive = os.path.abspath(archive)
+
+    if archive not in _archives:
+
+        _archives[archive] = CoolingModelArchive(archive)
+
+        if _archives[archive].version != archive_version:
+
+            warnings.warn('The archive {} is of version {} instead of {}, '
+                          'the track files are read instead. Rebuild the '
+                          'archive with build_cooling_model_archive().'.format(
+                              archive, _archives[archive].version,
+                              archive_version))
+
+    if _archives[archive].version != archive_version:
+
+        return None
+
+    return _archives[archive]
+
+
+def _get_sources(filelist):
+    '''
+    Get the modification times in ns and the sizes of the track files,
+    keyed by their paths relative to the package, to detect the track
+    files which are changed after the archive is built.
+
+    '''
+
+    folder = os.path.dirname(os.path.abspath(__file__))
+
+    return {
+        os.path.relpath(os.path.abspath(f), folder):
+        [os.stat(f).st_mtime_ns, os.stat(f).st_size]
+        for f in filelist
+    }
+
+
+def _get_catalogue(model, mass_range='all'):
+    '''
+    Catalogue the track files of the specified cooling model for the chosen
+    mass range.
+
+    Parameters
+    ----------
+    model: str
+        Name of the cooling model as in the `model_list`.
+    mass_range: str (Default: 'all')
+        The mass range in which the cooling model should return.
+        The ranges are defined as <0.5, 0.5-1.0 and >1.0 solar masses.
+
+    Return
+    ------
+    The masses, the track files in ascending order of mass, the function to
+    parse a track file, the column names and the column units.
+
+    '''
+
+    _check_mass_range(model, mass_range)
+
+    entry = cooling_model_registry[model]
+
+    if entry['split_by_mass']:
+
+        return entry['catalogue'](mass_range=mass_range)
+
+    return entry['catalogue']()
+
+
+def _read_track(filepath,
+                dtype,
+                skiprows=1,
+                age_log=False,
+                age_scale=1.,
+                age_zero=False,
+                usecols=None):
+    '''
+    Load a cooling track in plain text, convert the log luminosity in solar
+    unit into erg/s and convert the age into yr.
+
+    Parameters
+    ----------
+    filepath: str
+        The path to the track file.
+    dtype: list
+        The structured dtype of the track.
+    skiprows: int (Default: 1)
+        The number of header lines.
+    age_log: boolean (Default: False)
+        Set to True if the age is tabulated in log.
+    age_scale: float (Default: 1.)
+        The age in yr per unit of the tabulated (linear) age.
+    age_zero: boolean (Default: False)
+        Set to True to count the age from the beginning of the track.
+    usecols: list of str (Default: None)
+        The columns to be parsed, all the columns are parsed if None.
+
+    '''
+
+    dtype = np.dtype(dtype)
+
+    if usecols is None:
+
+        track = np.loadtxt(filepath, skiprows=skiprows, dtype=dtype)
+
+    else:
+
+        track = np.loadtxt(filepath,
+                           skiprows=skiprows,
+                           dtype=[(i, dtype[i]) for i in usecols],
+                           usecols=[dtype.names.index(i) for i in usecols])
+
+    # Convert the luminosity into erg/s
+    if 'lum' in track.dtype.names:
+
+        track['lum'] = 10.**track['lum'] * 3.826E33
+
+    # Convert the age to yr
+    if 'age' in track.dtype.names:
+
+        if age_log:
+
+            track['age'] = 10.**track['age']
+
+        track['age'] *= age_scale
+
+        if age_zero:
+
+            track['age'] -= min(track['age'])
+
+    return track
+
+
+def _sort_by_mass(mass, filelist):
+    '''
+    Sort the masses and the track files in ascending order of mass.
+
+    '''
+
+    order = np.argsort(mass, kind='stable')
+
+    return mass[order], np.array(filelist)[order]
+
+
+def _load_tracks(filelist, loader, n_jobs=1, backend='thread'):
+    '''
+    Parse the track files, concurrently if n_jobs is not 1, and gather the
+    tracks in an object array in the same order as the filelist.
+
+    Parameters
+    ----------
+    filelist: list of str
+        The paths to the track files.
+    loader: callable function
+        The function which parses a track file, it has to be picklable
+        (e.g. a module level function or a functools.partial of it) if the
+        process backend is used.
+    n_jobs: int (Default: 1)
+        The number of workers. Set to -1 to use all the available cores.
+    backend: str (Default: 'thread')
+        Choose from 'thread' and 'process'.
+
+    '''
+
+    if n_jobs is None or n_jobs < 1:
+
+        n_jobs = os.cpu_count()
+
+    if (n_jobs == 1) or (len(filelist) <= 1):
+
+        tracks = [loader(i) for i in filelist]
+
+    else:
+
+        if backend == 'thread':
+
+            executor = ThreadPoolExecutor
+
+        elif backend == 'process':
+
+            executor = ProcessPoolExecutor
+
+        else:
+
+            raise ValueError('Please choose from "thread" or "process" as '
+                             'the backend, you have provided '
+                             '{}.'.format(backend))
+
+        with executor(max_workers=min(n_jobs, len(filelist))) as pool:
+
+            tracks = list(pool.map(loader, filelist))
+
+    # Create an empty array for holding the cooling models
+    cooling_model = np.empty(len(tracks), dtype='object')
+
+    for i, track in enumerate(tracks):
+
+        cooling_model[i] = track
+
+    return cooling_model
+
+
+def _read_wrapped_track(filepath, dtype, skiprows=0, usecols=None):
+    '''
+    Load a cooling track of which each record is wrapped over multiple
+    lines, e.g. the Bedard et al. 2020 models. The whitespace separated
+    values after the header are parsed in a single pass into a contiguous
+    float64 array, which is then viewed as the structured dtype, so a
+    record can be wrapped over any number of lines.
+
+    Parameters
+    ----------
+    filepath: str
+        The path to the track file.
+    dtype: list
+        The structured dtype of the track, all columns have to be float64.
+    skiprows: int (Default: 0)
+        The number of header lines.
+    usecols: list of str (Default: None)
+        The columns to be kept, all the columns are kept if None.
+
+    '''
+
+    dtype = np.dtype(dtype)
+    ncols = len(dtype.names)
+
+    with open(filepath) as infile:
+
+        for _ in range(skiprows):
+
+            next(infile)
+
+        text = infile.read()
+
+    try:
+
+        values = np.array(text.split(), dtype=np.float64)
+
+    except ValueError as e:
+
+        raise ValueError('{} cannot be parsed as numbers: {}'.format(
+            filepath, e)) from None
+
+    if values.size % ncols != 0:
+
+        raise ValueError('{} values cannot be reshaped into records of {} '
+                         'columns in {}.'.format(values.size, ncols,
+                                                 filepath))
+
+    track = values.view(dtype)
+
+    if usecols is not None:
+
+        track = repack_fields(track[list(usecols)])
+
+    return track
+
+
+def _althaus07_catalogue():
+    '''
+    Catalogue the track files of the Althaus et al. 2007 WD cooling model
 
     '''
 
@@ -176,26 +1192,18 @@ def _althaus07_formatter():
     # Get the mass from the file name
     mass = np.array([i.split('_')[-1][:3]
                      for i in filelist]).astype(np.float64) / 100000.
+    mass, filelist = _sort_by_mass(mass, filelist)
 
-    # Create an empty array for holding the cooling models
-    cooling_model = np.array(([''] * len(mass)), dtype='object')
+    loader = partial(_read_track,
+                     dtype=dtype,
+                     age_log=True)
 
-    for i, filepath in enumerate(filelist):
+    return mass, filelist, loader, column_names, column_units
 
-        cooling_model[i] = np.loadtxt(filepath, skiprows=1, dtype=dtype)
 
-        # Convert the luminosity into erg/s
-        cooling_model[i]['lum'] = 10.**cooling_model[i]['lum'] * 3.826E33
-
-        # Convert the age to yr
-        cooling_model[i]['age'] = 10.**cooling_model[i]['age']
-
-    return mass, cooling_model, column_names, column_units
-
-
-def _althaus09_formatter(mass_range='all'):
+def _althaus09_catalogue(mass_range='all'):
     '''
-    A formatter to load the Althaus et al. 2009 WD cooling model
+    Catalogue the track files of the Althaus et al. 2009 WD cooling model
 
     Parameters
     ----------
@@ -212,16 +1220,16 @@ def _althaus09_formatter(mass_range='all'):
     # Prepare the array column dtype
     column_key = np.array(('Teff', 'logg', 'lum', 'age', 'BC', 'M_V', 'U', 'B',
                            'V', 'R', 'I', 'J', 'H', 'K', 'L', 'U-B', 'B-V',
-                           'V-K', 'V-I', 'R-I', 'J-H', 'H-K', 'K-L'))
+                           'V-R', 'V-K', 'V-I', 'R-I', 'J-H', 'H-K', 'K-L'))
     column_key_formatted = np.array(
         (r'T$_{\mathrm{eff}}$', 'log(g)', 'Luminosity', '$log(Age)$',
          '$Bolometric Correction$', r'$V$', r'$U$', r'$B$', r'$V$', r'$R$',
-         r'$I$', r'$J$', r'$H$', r'$K$', r'$L$', r'$U-B$', r'$B-V$', r'$V-K$',
-         r'$V-I$', r'$R-I$', r'$J-H$', r'$H-K$', r'$K-L$'))
+         r'$I$', r'$J$', r'$H$', r'$K$', r'$L$', r'$U-B$', r'$B-V$', r'$V-R$',
+         r'$V-K$', r'$V-I$', r'$R-I$', r'$J-H$', r'$H-K$', r'$K-L$'))
     column_key_unit = np.array(
         ('K', r'(cm/s$^2$)', r'L$_{\odot}$', '(yr)', 'mag', 'mag', 'mag',
          'mag', 'mag', 'mag', 'mag', 'mag', 'mag', 'mag', 'mag', 'mag', 'mag',
-         'mag', 'mag', 'mag', 'mag', 'mag', 'mag'))
+         'mag', 'mag', 'mag', 'mag', 'mag', 'mag', 'mag'))
     column_type = np.array(([np.float64] * len(column_key)))
     dtype = [(i, j) for i, j in zip(column_key, column_type)]
 
@@ -234,6 +1242,7 @@ def _althaus09_formatter(mass_range='all'):
     # Get the mass from the file name
     mass = np.array([i.split('.')[-2]
                      for i in filelist]).astype(np.float64) / 100000.
+    mass, filelist = _sort_by_mass(mass, filelist)
 
     if mass_range == 'all':
         pass
@@ -242,25 +1251,16 @@ def _althaus09_formatter(mass_range='all'):
         mass = mass[mask_low]
         filelist = np.array(filelist)[mask_low]
 
-    # Create an empty array for holding the cooling models
-    cooling_model = np.array(([''] * len(mass)), dtype='object')
+    loader = partial(_read_track,
+                     dtype=dtype,
+                     age_scale=1E9)
 
-    for i, filepath in enumerate(filelist):
+    return mass, filelist, loader, column_names, column_units
 
-        cooling_model[i] = np.loadtxt(filepath, skiprows=1, dtype=dtype)
 
-        # Convert the luminosity into erg/s
-        cooling_model[i]['lum'] = 10.**cooling_model[i]['lum'] * 3.826E33
-
-        # Convert the age to yr
-        cooling_model[i]['age'] *= 1E9
-
-    return mass, cooling_model, column_names, column_units
-
-
-def _althaus15_formatter(model):
+def _althaus15_catalogue(model):
     '''
-    A formatter to load the Althaus et al. 2015 WD cooling model
+    Catalogue the track files of the Althaus et al. 2015 WD cooling model
 
     Parameters
     ----------
@@ -322,27 +1322,20 @@ def _althaus15_formatter(model):
     # Get the mass from the file name
     mass = np.array([i.split('.')[-2][-5:]
                      for i in filelist]).astype(np.float64) / 100000.
+    mass, filelist = _sort_by_mass(mass, filelist)
 
-    # Create an empty array for holding the cooling models
-    cooling_model = np.array(([''] * len(mass)), dtype='object')
-
-    for i, filepath in enumerate(filelist):
+    loader = partial(_read_track,
+                     dtype=dtype,
+                     age_log=True,
+                     age_scale=1E6,
+                     age_zero=True)
 
-        cooling_model[i] = np.loadtxt(filepath, skiprows=1, dtype=dtype)
+    return mass, filelist, loader, column_names, column_units
 
-        # Convert the luminosity into erg/s
-        cooling_model[i]['lum'] = 10.**cooling_model[i]['lum'] * 3.826E33
 
-        # Convert the age to yr
-        cooling_model[i]['age'] = 10.**cooling_model[i]['age'] * 1E6
-        cooling_model[i]['age'] -= min(cooling_model[i]['age'])
-
-    return mass, cooling_model, column_names, column_units
-
-
-def _althaus17_formatter(model, mass_range='all'):
+def _althaus17_catalogue(model, mass_range='all'):
     '''
-    A formatter to load the Althaus et al. 2017 WD cooling model
+    Catalogue the track files of the Althaus et al. 2017 WD cooling model
 
     Parameters
     ----------
@@ -400,40 +1393,43 @@ def _althaus17_formatter(model, mass_range='all'):
     # Get the mass from the file name
     mass = np.array([i.split(os.sep)[-1].split('_')[0]
                      for i in filelist]).astype(np.float64)
-    wd_mass = np.zeros_like(mass)
-
-    # Create an empty array for holding the cooling models
-    cooling_model = np.array(([''] * len(mass)), dtype='object')
-
-    for i, filepath in enumerate(filelist):
-
-        cooling_model[i] = np.loadtxt(filepath, skiprows=1, dtype=dtype)
-
-        # Convert the luminosity into erg/s
-        cooling_model[i]['lum'] = 10.**cooling_model[i]['lum'] * 3.826E33
-
-        # Convert the age to yr
-        wd_mass[i] = cooling_model[i]['mass'][0]
-        cooling_model[i]['age'] = 10.**cooling_model[i]['age'] * 1E6
-        cooling_model[i]['age'] -= min(cooling_model[i]['age'])
+    mass, filelist = _sort_by_mass(mass, filelist)
 
     if mass_range == 'all':
         pass
     if mass_range == 'low':
         mask_low = mass < 0.5
-        wd_mass = wd_mass[mask_low]
-        cooling_model = cooling_model[mask_low]
+        mass = mass[mask_low]
+        filelist = filelist[mask_low]
     if mass_range == 'intermediate':
         mask_intermediate = (mass >= 0.5) & (mass <= 1.0)
-        wd_mass = wd_mass[mask_intermediate]
-        cooling_model = cooling_model[mask_intermediate]
+        mass = mass[mask_intermediate]
+        filelist = filelist[mask_intermediate]
 
-    return wd_mass, cooling_model, column_names, column_units
+    # The WD mass is taken from the first record of the track, which is
+    # within the first 2 lines after the header
+    wd_mass = np.zeros(len(filelist))
 
+    for i, filepath in enumerate(filelist):
 
-def _bedard20_formatter(model, mass_range='all'):
+        with open(filepath) as infile:
+
+            wd_mass[i] = np.loadtxt(islice(infile, 1, 3),
+                                    dtype=dtype,
+                                    ndmin=1)['mass'][0]
+
+    loader = partial(_read_track,
+                     dtype=dtype,
+                     age_log=True,
+                     age_scale=1E6,
+                     age_zero=True)
+
+    return wd_mass, filelist, loader, column_names, column_units
+
+
+def _bedard20_catalogue(model, mass_range='all'):
     '''
-    A formatter to load the Bedard et al. 2020 WD cooling model from
+    Catalogue the track files of the Bedard et al. 2020 WD cooling model from
     http://www.astro.umontreal.ca/~bergeron/CoolingModels/
 
     The thick and thin models are for DA and DB WD, respectively.
@@ -486,6 +1482,7 @@ def _bedard20_formatter(model, mass_range='all'):
     # Get the mass from the file name
     mass = np.array([i.split('_')[2]
                      for i in filelist]).astype(np.float64) / 100.
+    mass, filelist = _sort_by_mass(mass, filelist)
 
     if mass_range == 'all':
         pass
@@ -502,36 +1499,16 @@ def _bedard20_formatter(model, mass_range='all'):
         mass = mass[mask_high]
         filelist = np.array(filelist)[mask_high]
 
-    # Create an empty array for holding the cooling models
-    cooling_model = np.array(([''] * len(mass)), dtype='object')
+    loader = partial(_read_wrapped_track,
+                     dtype=dtype,
+                     skiprows=5)
 
-    for i, filepath in enumerate(filelist):
+    return mass, filelist, loader, column_names, column_units
 
-        with open(filepath) as infile:
-
-            count = -5
-            cooling_model_text = ''
-            for line_i in infile:
-
-                count += 1
-
-                if count <= 0:
-                    continue
 
-                if count % 3 != 0:
-                    cooling_model_text += line_i.rstrip('\n')
-                else:
-                    cooling_model_text += line_i
-
-        cooling_model[i] = np.loadtxt(io.StringIO(cooling_model_text),
-                                      dtype=dtype)
-
-    return mass, cooling_model, column_names, column_units
-
-
-def _camisassa17_formatter():
+def _camisassa17_catalogue():
     '''
-    A formatter to load the Camisassa et al. 2017 WD cooling model
+    Catalogue the track files of the Camisassa et al. 2017 WD cooling model
 
     The progenitor lifetime is taken off based on the extrapolation from
     Table 1
@@ -540,13 +1517,16 @@ def _camisassa17_formatter():
     '''
 
     # Y=0.4, Z=0.0005 models
-    filelist = glob.glob('wd_cooling/camisassa17/*.trk')
+    filelist = glob.glob(
+        os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                     'wd_cooling/camisassa17/*.trk'))
 
     # Prepare the array column dtype
     column_key = np.array(
         ('lum', 'Teff', 'Tc', 'Roc', 'Hc', 'Hec', 'Con_s', 'Con_c', 'age',
          'mass', 'mdot', 'model_no', 'Lpp', 'Lcno', 'LHe', 'LCC', 'logG',
-         'Lnu', 'MHtot', 'HeBuf', 'mass_Hfc', 'mass_Hefc', 'logg', 'Rsun'))
+         'Lnu', 'MHtot', 'HeBuf', 'mass_Hfc', 'mass_Hefc', 'logg', 'Rsun',
+         'LH', 'ps'))
     column_key_formatted = np.array(
         ('Luminosity', r'log(T$_{\mathrm{eff}})$', r'T$_{\mathrm{c}}$',
          r'$\rho_c$', r'X$_c$', r'Y$_c$', 'Outer Convective Zone',
@@ -561,7 +1541,8 @@ def _camisassa17_formatter():
          r'($10^6$ K)', r'M$_\odot$', r'(M$_\odot$ / yr)', '', r'L$_{\odot}$',
          r'L$_{\odot}$', r'L$_{\odot}$', r'L$_{\odot}$', r'L$_{\odot}$',
          r'L$_{\odot}$', r'M$_{\odot}$', r'M$_{\odot}$', r'M$_{\odot}$',
-         r'M$_{\odot}$', r'(cm/s$^2$)', r'R$_{\odot}$'))
+         r'M$_{\odot}$', r'(cm/s$^2$)', r'R$_{\odot}$', 'erg/s',
+         'erg/s'))
     column_type = np.array(([np.float64] * len(column_key)))
     dtype = [(i, j) for i, j in zip(column_key, column_type)]
 
@@ -574,27 +1555,20 @@ def _camisassa17_formatter():
     # Get the mass from the file name
     mass = np.array([i.split(os.sep)[-1][:3]
                      for i in filelist]).astype(np.float64) / 100.
+    mass, filelist = _sort_by_mass(mass, filelist)
 
-    # Create an empty array for holding the cooling models
-    cooling_model = np.array(([''] * len(mass)), dtype='object')
-
-    for i, filepath in enumerate(filelist):
-
-        cooling_model[i] = np.loadtxt(filepath, skiprows=1, dtype=dtype)
-
-        # Convert the luminosity into erg/s
-        cooling_model[i]['lum'] = 10.**cooling_model[i]['lum'] * 3.826E33
+    loader = partial(_read_track,
+                     dtype=dtype,
+                     age_log=True,
+                     age_scale=1E6,
+                     age_zero=True)
 
-        # Convert the age to yr
-        cooling_model[i]['age'] = 10.**cooling_model[i]['age'] * 1E6
-        cooling_model[i]['age'] -= min(cooling_model[i]['age'])
-
-    return mass, cooling_model, column_names, column_units
+    return mass, filelist, loader, column_names, column_units
 
 
-def _camisassa19_formatter(model):
+def _camisassa19_catalogue(model):
     '''
-    A formatter to load the Camisassa et al. 2019 ultramassive WD cooling model
+    Catalogue the track files of the Camisassa et al. 2019 ultramassive WD cooling model
 
     Some columns populated with 'I' are replaced with the nearest values.
 
@@ -630,8 +1604,8 @@ def _camisassa19_formatter(model):
          'Phase Separation'))
     column_key_unit = np.array(
         (r'L$_{\odot}$', '(K)', r'($10^6$ K)', r'(g/cm$^3$)', '', '', '%', '%',
-         r'M$_\odot$', r'(M$_\odot$ / yr)', r'L$_{\odot}$', r'M$_{\odot}$',
-         r'(cm/s$^2$)', r'R$_{\odot}$', 'erg/s', 'erg/s'))
+         '(yr)', r'M$_\odot$', r'(M$_\odot$ / yr)', r'L$_{\odot}$',
+         r'M$_{\odot}$', r'(cm/s$^2$)', r'R$_{\odot}$', 'erg/s', 'erg/s'))
     column_type = np.array(([np.float64] * len(column_key)))
     dtype = [(i, j) for i, j in zip(column_key, column_type)]
 
@@ -644,27 +1618,21 @@ def _camisassa19_formatter(model):
     # Get the mass from the file name
     mass = np.array([i.split(os.sep)[-1][:3]
                      for i in filelist]).astype(np.float64) / 100.
+    mass, filelist = _sort_by_mass(mass, filelist)
 
-    # Create an empty array for holding the cooling models
-    cooling_model = np.array(([''] * len(mass)), dtype='object')
+    loader = partial(_read_track,
+                     dtype=dtype,
+                     skiprows=2,
+                     age_log=True,
+                     age_scale=1E6,
+                     age_zero=True)
 
-    for i, filepath in enumerate(filelist):
-
-        cooling_model[i] = np.loadtxt(filepath, skiprows=2, dtype=dtype)
+    return mass, filelist, loader, column_names, column_units
 
-        # Convert the luminosity into erg/s
-        cooling_model[i]['lum'] = 10.**cooling_model[i]['lum'] * 3.826E33
 
-        # Convert the age to yr
-        cooling_model[i]['age'] = 10.**cooling_model[i]['age'] * 1E6
-        cooling_model[i]['age'] -= min(cooling_model[i]['age'])
-
-    return mass, cooling_model, column_names, column_units
-
-
-def _lauffer18_formatter(model):
+def _lauffer18_catalogue(model):
     '''
-    A formatter to load the Lauffer et al. 2018 WD cooling model
+    Catalogue the track files of the Lauffer et al. 2018 WD cooling model
 
     Parameters
     ----------
@@ -706,26 +1674,18 @@ def _lauffer18_formatter(model):
     # Get the mass from the file name
     mass = np.array([i.split('-M')[-1][:-4]
                      for i in filelist]).astype(np.float64)
+    mass, filelist = _sort_by_mass(mass, filelist)
 
-    # Create an empty array for holding the cooling models
-    cooling_model = np.array(([''] * len(mass)), dtype='object')
-
-    for i, filepath in enumerate(filelist):
-
-        cooling_model[i] = np.loadtxt(filepath, skiprows=1, dtype=dtype)
-
-        # Convert the luminosity into erg/s
-        cooling_model[i]['lum'] = 10.**cooling_model[i]['lum'] * 3.826E33
+    loader = partial(_read_track,
+                     dtype=dtype,
+                     age_scale=1E9)
 
-        # Convert the age to yr
-        cooling_model[i]['age'] *= 1E9
-
-    return mass, cooling_model, column_names, column_units
+    return mass, filelist, loader, column_names, column_units
 
 
-def _panei07_formatter(model):
+def _panei07_catalogue(model):
     '''
-    A formatter to load the Panei et al. 2007 WD cooling model
+    Catalogue the track files of the Panei et al. 2007 WD cooling model
 
     Parameters
     ----------
@@ -766,26 +1726,18 @@ def _panei07_formatter(model):
     # Get the mass from the file name
     mass = np.array([i.split('.')[-2][:5]
                      for i in filelist]).astype(np.float64) / 100000.
+    mass, filelist = _sort_by_mass(mass, filelist)
 
-    # Create an empty array for holding the cooling models
-    cooling_model = np.array(([''] * len(mass)), dtype='object')
+    loader = partial(_read_track,
+                     dtype=dtype,
+                     age_scale=1E9)
 
-    for i, filepath in enumerate(filelist):
+    return mass, filelist, loader, column_names, column_units
 
-        cooling_model[i] = np.loadtxt(filepath, skiprows=1, dtype=dtype)
 
-        # Convert the luminosity into erg/s
-        cooling_model[i]['lum'] = 10.**cooling_model[i]['lum'] * 3.826E33
-
-        # Convert the age to yr
-        cooling_model[i]['age'] *= 1E9
-
-    return mass, cooling_model, column_names, column_units
-
-
-def _renedo10_formatter(model):
+def _renedo10_catalogue(model):
     '''
-    A formatter to load the Renedo et al. 2010 WD cooling model from
+    Catalogue the track files of the Renedo et al. 2010 WD cooling model from
     http://evolgroup.fcaglp.unlp.edu.ar/TRACKS/tracks_cocore.html
 
     Two metallicity for DA are available: Z=0.01 and Z=0.001
@@ -834,26 +1786,18 @@ def _renedo10_formatter(model):
     # Get the mass from the file name
     mass = np.array([i.split('_')[1][-4:]
                      for i in filelist]).astype(np.float64) / 1000.
+    mass, filelist = _sort_by_mass(mass, filelist)
 
-    # Create an empty array for holding the cooling models
-    cooling_model = np.array(([''] * len(mass)), dtype='object')
-
-    for i, filepath in enumerate(filelist):
-
-        cooling_model[i] = np.loadtxt(filepath, skiprows=1, dtype=dtype)
-
-        # Convert the luminosity into erg/s
-        cooling_model[i]['lum'] = 10.**cooling_model[i]['lum'] * 3.826E33
-
-        # Convert the age to yr
-        cooling_model[i]['age'] *= 1E6
+    loader = partial(_read_track,
+                     dtype=dtype,
+                     age_scale=1E6)
 
-    return mass, cooling_model, column_names, column_units
+    return mass, filelist, loader, column_names, column_units
 
 
-def _salaris10_formatter(model, mass_range='all'):
+def _salaris10_catalogue(model, mass_range='all'):
     '''
-    A formatter to load the Salaris et al. 2010 WD cooling model from
+    Catalogue the track files of the Salaris et al. 2010 WD cooling model from
 
     Parameters
     ----------
@@ -909,6 +1853,7 @@ def _salaris10_formatter(model, mass_range='all'):
     # Get the mass from the file name
     mass = np.array([i.split('COOL')[-1][:3]
                      for i in filelist]).astype(np.float64) / 100.
+    mass, filelist = _sort_by_mass(mass, filelist)
 
     if mass_range == 'all':
         pass
@@ -921,17 +1866,153 @@ def _salaris10_formatter(model, mass_range='all'):
         mass = mass[mask_high]
         filelist = np.array(filelist)[mask_high]
 
-    # Create an empty array for holding the cooling models
-    cooling_model = np.array(([''] * len(mass)), dtype='object')
-
-    for i, filepath in enumerate(filelist):
-
-        cooling_model[i] = np.loadtxt(filepath, skiprows=1, dtype=dtype)
-
-        # Convert the luminosity into erg/s
-        cooling_model[i]['lum'] = 10.**cooling_model[i]['lum'] * 3.826E33
-
-        # Convert the age to yr
-        cooling_model[i]['age'] = 10.**cooling_model[i]['age']
+    loader = partial(_read_track,
+                     dtype=dtype,
+                     age_log=True)
+
+    return mass, filelist, loader, column_names, column_units
+
+
+# The registry of the cooling models. Each model is catalogued by
+# `catalogue`, which is called with the mass_range if `split_by_mass`, it can
+# be used in the `mass_ranges` of a WDLF, i.e. <0.5, 0.5-1.0 and >1.0 solar
+# masses, and it is published in `reference`.
+cooling_model_registry = {
+    'montreal_co_da_20': {
+        'catalogue': partial(_bedard20_catalogue, 'montreal_co_da_20'),
+        'split_by_mass': True,
+        'mass_ranges': ('low', 'intermediate', 'high'),
+        'reference': 'Bedard et al. 2020 CO DA'
+    },
+    'montreal_co_db_20': {
+        'catalogue': partial(_bedard20_catalogue, 'montreal_co_db_20'),
+        'split_by_mass': True,
+        'mass_ranges': ('low', 'intermediate', 'high'),
+        'reference': 'Bedard et al. 2020 CO DB'
+    },
+    'lpcode_he_da_07': {
+        'catalogue': partial(_panei07_catalogue, 'lpcode_he_da_07'),
+        'split_by_mass': False,
+        'mass_ranges': ('low', ),
+        'reference': 'Panei et al. 2007 He DA'
+    },
+    'lpcode_co_da_07': {
+        'catalogue': partial(_panei07_catalogue, 'lpcode_co_da_07'),
+        'split_by_mass': False,
+        'mass_ranges': ('low', ),
+        'reference': 'Panei et al. 2007 CO DA'
+    },
+    'lpcode_he_da_09': {
+        'catalogue': _althaus09_catalogue,
+        'split_by_mass': True,
+        'mass_ranges': ('low', ),
+        'reference': 'Althaus et al. 2009 He DA'
+    },
+    'lpcode_co_da_10_z001': {
+        'catalogue': partial(_renedo10_catalogue, 'lpcode_co_da_10_z001'),
+        'split_by_mass': False,
+        'mass_ranges': ('intermediate', ),
+        'reference': 'Renedo et al. 2010 CO DA Z=0.01'
+    },
+    'lpcode_co_da_10_z0001': {
+        'catalogue': partial(_renedo10_catalogue, 'lpcode_co_da_10_z0001'),
+        'split_by_mass': False,
+        'mass_ranges': ('intermediate', ),
+        'reference': 'Renedo et al. 2010 CO DA Z=0.001'
+    },
+    'lpcode_co_da_15_z00003': {
+        'catalogue': partial(_althaus15_catalogue, 'lpcode_co_da_15_z00003'),
+        'split_by_mass': False,
+        'mass_ranges': ('intermediate', ),
+        'reference': 'Althaus et al. 2015 DA Z=0.00003'
+    },
+    'lpcode_co_da_15_z0001': {
+        'catalogue': partial(_althaus15_catalogue, 'lpcode_co_da_15_z0001'),
+        'split_by_mass': False,
+        'mass_ranges': ('intermediate', ),
+        'reference': 'Althaus et al. 2015 DA Z=0.0001'
+    },
+    'lpcode_co_da_15_z0005': {
+        'catalogue': partial(_althaus15_catalogue, 'lpcode_co_da_15_z0005'),
+        'split_by_mass': False,
+        'mass_ranges': ('intermediate', ),
+        'reference': 'Althaus et al. 2015 DA Z=0.0005'
+    },
+    'lpcode_co_db_17_z00005': {
+        'catalogue': partial(_althaus17_catalogue, 'lpcode_co_db_17_z00005'),
+        'split_by_mass': True,
+        'mass_ranges': ('intermediate', ),
+        'reference': 'Althaus et al. 2017 DB Y=0.4'
+    },
+    'lpcode_co_db_17_z0001': {
+        'catalogue': partial(_althaus17_catalogue, 'lpcode_co_db_17_z0001'),
+        'split_by_mass': True,
+        'mass_ranges': ('intermediate', ),
+        'reference': 'Althaus et al. 2017 DB Y=0.4'
+    },
+    'lpcode_co_db_17': {
+        'catalogue': _camisassa17_catalogue,
+        'split_by_mass': False,
+        'mass_ranges': ('intermediate', ),
+        'reference': 'Camisassa et al. 2017 DB'
+    },
+    'basti_co_da_10': {
+        'catalogue': partial(_salaris10_catalogue, 'basti_co_da_10'),
+        'split_by_mass': True,
+        'mass_ranges': ('intermediate', 'high'),
+        'reference': 'Salari et al. 2010 CO DA'
+    },
+    'basti_co_db_10': {
+        'catalogue': partial(_salaris10_catalogue, 'basti_co_db_10'),
+        'split_by_mass': True,
+        'mass_ranges': ('intermediate', 'high'),
+        'reference': 'Salari et al. 2010 CO DB'
+    },
+    'basti_co_da_10_nps': {
+        'catalogue': partial(_salaris10_catalogue, 'basti_co_da_10_nps'),
+        'split_by_mass': True,
+        'mass_ranges': ('intermediate', 'high'),
+        'reference': 'Salari et al. 2010 CO DA, no phase separation'
+    },
+    'basti_co_db_10_nps': {
+        'catalogue': partial(_salaris10_catalogue, 'basti_co_db_10_nps'),
+        'split_by_mass': True,
+        'mass_ranges': ('intermediate', 'high'),
+        'reference': 'Salari et al. 2010 CO DB, no phase separation'
+    },
+    'lpcode_one_da_07': {
+        'catalogue': _althaus07_catalogue,
+        'split_by_mass': False,
+        'mass_ranges': ('high', ),
+        'reference': 'Althaus et al. 2007 ONe DA'
+    },
+    'lpcode_one_da_19': {
+        'catalogue': partial(_camisassa19_catalogue, 'lpcode_one_da_19'),
+        'split_by_mass': False,
+        'mass_ranges': ('high', ),
+        'reference': 'Camisassa et al. 2019 ONe DA'
+    },
+    'lpcode_one_db_19': {
+        'catalogue': partial(_camisassa19_catalogue, 'lpcode_one_db_19'),
+        'split_by_mass': False,
+        'mass_ranges': ('high', ),
+        'reference': 'Camisassa et al. 2019 ONe DB'
+    },
+    'mesa_one_da_18': {
+        'catalogue': partial(_lauffer18_catalogue, 'mesa_one_da_18'),
+        'split_by_mass': False,
+        'mass_ranges': ('high', ),
+        'reference': 'Lauffer et al. 2018 ONe DA'
+    },
+    'mesa_one_db_18': {
+        'catalogue': partial(_lauffer18_catalogue, 'mesa_one_db_18'),
+        'split_by_mass': False,
+        'mass_ranges': ('high', ),
+        'reference': 'Lauffer et al. 2018 ONe DB'
+    }
+}
 
-    return mass, cooling_model, column_names, column_units
+model_list = {
+    model: entry['reference']
+    for model, entry in cooling_model_registry.items()
+}
@@ -0,0 +1,511 @@
+from concurrent.futures import ProcessPoolExecutor
+import glob
+import numpy as np
+import os
+from scipy.interpolate import CubicSpline
+
+from .reddening import Rv_grid
+from .util import temporary_path
+
+folder_path = os.path.dirname(os.path.abspath(__file__))
+
+koester_folder = os.path.join(folder_path, 'koester_model')
+filter_folder = os.path.join(folder_path, 'filter_response')
+extinction_folder = os.path.join(folder_path, 'extinction')
+
+# The column names of the filters in the atmosphere models
+atm_key = np.array([
+    'U', 'B', 'V', 'R', 'I', 'J', 'H', 'Ks', 'Y_mko', 'J_mko', 'H_mko',
+    'K_mko', 'W1', 'W2', 'W3', 'W4', 'S36', 'S45', 'S58', 'S80', 'u_sdss',
+    'g_sdss', 'r_sdss', 'i_sdss', 'z_sdss', 'g_ps1', 'r_ps1', 'i_ps1', 'z_ps1',
+    'y_ps1', 'G2', 'G2_BP', 'G2_RP', 'G3', 'G3_BP', 'G3_RP', 'FUV', 'NUV'
+])
+# The names of the filter response files
+filter_key = np.array([
+    'Generic_Johnson.U', 'Generic_Johnson.B', 'Generic_Johnson.V',
+    'Generic_Cousins.R', 'Generic_Cousins.I', '2MASS_2MASS.J', '2MASS_2MASS.H',
+    '2MASS_2MASS.Ks', 'UKIRT_WFCAM.Y_filter', 'UKIRT_WFCAM.J_filter',
+    'UKIRT_WFCAM.H_filter', 'UKIRT_WFCAM.K', 'WISE_WISE.W1', 'WISE_WISE.W2',
+    'WISE_WISE.W3', 'WISE_WISE.W4', 'Spitzer_IRAC.I1', 'Spitzer_IRAC.I2',
+    'Spitzer_IRAC.I3', 'Spitzer_IRAC.I4', 'SLOAN_SDSS.u', 'SLOAN_SDSS.g',
+    'SLOAN_SDSS.r', 'SLOAN_SDSS.i', 'SLOAN_SDSS.z', 'PAN-STARRS_PS1.g',
+    'PAN-STARRS_PS1.r', 'PAN-STARRS_PS1.i', 'PAN-STARRS_PS1.z',
+    'PAN-STARRS_PS1.y', 'GAIA_GAIA2r.G', 'GAIA_GAIA2r.Gbp', 'GAIA_GAIA2r.Grp',
+    'GAIA_GAIA3.G', 'GAIA_GAIA3.Gbp', 'GAIA_GAIA3.Grp', 'GALEX_GALEX.FUV',
+    'GALEX_GALEX.NUV'
+])
+
+filter_name_mapping = {}
+for i, j in zip(filter_key, atm_key):
+    filter_name_mapping[i] = j
+
+# The extinction is computed in the limit of a small E(B-V), the
+# normalisation factor of the exponent 0.78 comes from Shlafly et al. 2010,
+# 1.32 also comes from them, it is the O'Donnell extinction at 1 micron
+limit = 1e-3
+norm = 0.78 * 1.32 / 2.5 * limit
+
+# The Koester spectra are extended with a black body to this wavelength
+max_wavelength = 300000.
+
+# The knots of the optical/IR spline of Fitzpatrick (1999) in inverse micron
+_f99_x_knots = np.array([
+    0.0, 1.e4 / 26500., 1.e4 / 12200., 1.e4 / 6000., 1.e4 / 5470.,
+    1.e4 / 4670., 1.e4 / 4110., 1.e4 / 2700., 1.e4 / 2600.
+])
+
+
+def _f99_uv(x, Rv):
+    '''
+    The UV extinction curve of Fitzpatrick (1999) in E(x-V)/E(B-V).
+
+    '''
+
+    c2 = -0.824 + 4.717 / Rv
+    c1 = 2.030 - 3.007 * c2
+    x2 = x * x
+    y = x2 - 4.596**2.
+    d = x2 / (y * y + x2 * 0.99**2.)
+    k = c1 + c2 * x + 3.23 * d
+    y = np.clip(x - 5.9, 0., None)
+
+    return k + 0.41 * (0.5392 * y**2. + 0.05644 * y**3.)
+
+
+def fitzpatrick99(wavelength, Rv):
+    '''
+    The Fitzpatrick (1999) extinction law, identical to
+    extinction.fitzpatrick99(wavelength, 1.0, Rv) * Rv.
+
+    Parameters
+    ----------
+    wavelength: float or array of float
+        Wavelength in Angstrom.
+    Rv: float or array of float
+        The extinction in V per unit of A_V, i.e. A_V/E(B - V).
+
+    Return
+    ------
+    The extinction at the given wavelength per unit of E(B - V),
+    i.e. A/E(B - V), in the shape of (len(Rv), len(wavelength)).
+
+    '''
+
+    x = 1.e4 / np.asarray(wavelength, dtype=np.float64).reshape(-1)
+    Rv = np.asarray(Rv, dtype=np.float64).reshape(-1)
+    uv = x >= 1.e4 / 2700.
+
+    extinction = np.zeros((len(Rv), len(x)))
+
+    for i, rv in enumerate(Rv):
+
+        k_knots = np.array([
+            -rv, 0.26469 * rv / 3.1 - rv, 0.82925 * rv / 3.1 - rv,
+            -0.422809 + 1.00270 * rv + 2.13572e-04 * rv**2. - rv,
+            -5.13540e-02 + 1.00216 * rv - 7.35778e-05 * rv**2. - rv,
+            0.700127 + 1.00184 * rv - 3.32598e-05 * rv**2. - rv,
+            1.19456 + 1.01707 * rv - 5.46959e-03 * rv**2. +
+            7.97809e-04 * rv**3. - 4.45636e-05 * rv**4. - rv,
+            *_f99_uv(_f99_x_knots[7:], rv)
+        ])
+        k = np.zeros(len(x))
+        k[~uv] = CubicSpline(_f99_x_knots, k_knots,
+                             bc_type='natural')(x[~uv])
+        k[uv] = _f99_uv(x[uv], rv)
+        extinction[i] = k + rv
+
+    return extinction
+
+
+def planck(wavelength, Teff):
+    '''
+    The shape of the black body spectrum in unit of frequency, B_nu, at
+    the given wavelength. The absolute scale is irrelevant as it is only
+    used to extend the model spectra.
+
+    Parameters
+    ----------
+    wavelength: array of float
+        Wavelength in Angstrom.
+    Teff: float
+        The temperature in K.
+
+    '''
+
+    nu = 2.99792458e18 / np.asarray(wavelength, dtype=np.float64)
+
+    # h / k_B in cgs
+    return nu**3. / np.expm1(4.799243073366221e-11 * nu / Teff)
+
+
+def _bin_edges(wavelength):
+    '''
+    The edges of the wavelength bins, halfway between the wavelengths and
+    extrapolated by half a bin at both ends.
+
+    '''
+
+    edges = np.zeros(len(wavelength) + 1)
+    edges[1:-1] = (wavelength[1:] + wavelength[:-1]) / 2.
+    edges[0] = wavelength[0] - (wavelength[1] - wavelength[0]) / 2.
+    edges[-1] = wavelength[-1] + (wavelength[-1] - wavelength[-2]) / 2.
+
+    return edges
+
+
+def resample_spectrum(new_wavelength, wavelength, flux, fill=0.):
+    '''
+    Flux conserving resampling of a spectrum onto a new wavelength grid,
+    equivalent to spectres.spectres(). The average flux over each new bin is
+    computed from the cumulative integral of the spectrum in one pass, the
+    bins outside the spectrum are filled with fill.
+
+    Parameters
+    ----------
+    new_wavelength: array of float
+        The new wavelength grid.
+    wavelength: array of float
+        The wavelength grid of the spectrum.
+    flux: array of float
+        The flux of the spectrum.
+    fill: float (Default: 0.)
+        The flux of the new bins that are not fully covered by the
+        spectrum.
+
+    '''
+
+    edges = _bin_edges(wavelength)
+    new_edges = _bin_edges(new_wavelength)
+
+    cumulative = np.concatenate(([0.], np.cumsum(np.diff(edges) * flux)))
+    new_flux = np.diff(np.interp(new_edges, edges, cumulative)) / np.diff(
+        new_edges)
+    new_flux[(new_edges[:-1] < edges[0]) | (new_edges[1:] > edges[-1])] = fill
+
+    return new_flux
+
+
+def _koester_parameters(filepath):
+    '''
+    Get the Teff and logg of a Koester spectrum from its file name, e.g.
+    da05000_650.dk.dat.txt.bz2 is 5000 K and logg 6.50.
+
+    '''
+
+    Teff, logg = os.path.basename(filepath)[2:].split('.')[0].split('_')
+
+    return float(Teff), float(logg) / 100.
+
+
+def list_koester_models(folder=None):
+    '''
+    List the Koester DA spectra in the order of the extinction tables,
+    i.e. sorted by logg and then by Teff.
+
+    Parameters
+    ----------
+    folder: str (Default: None)
+        The folder of the spectra, the default is koester_model in the
+        package.
+
+    Return
+    ------
+    The list of the paths, the array of Teff and the array of logg.
+
+    '''
+
+    if folder is None:
+
+        folder = koester_folder
+
+    filelist = glob.glob(os.path.join(folder, 'da*'))
+    Teff, logg = np.array([_koester_parameters(i) for i in filelist]).T
+
+    order = np.lexsort((Teff, logg))
+
+    return [filelist[i] for i in order], Teff[order], logg[order]
+
+
+def list_filter_responses(folder=None):
+    '''
+    List the filter response curves, keyed by the column names of the
+    filters in the atmosphere models, or by the file name if the filter is
+    not in the atmosphere models.
+
+    Parameters
+    ----------
+    folder: str (Default: None)
+        The folder of the response curves, the default is filter_response in
+        the package.
+
+    '''
+
+    if folder is None:
+
+        folder = filter_folder
+
+    responses = {}
+
+    for filepath in sorted(glob.glob(os.path.join(folder, '*.dat'))):
+
+        name = os.path.basename(filepath)[:-4]
+        responses[filter_name_mapping.get(name, name)] = filepath
+
+    return responses
+
+
+def load_filter(filepath):
+    '''
+    Load a filter response curve and weight it by the wavelength bins.
+
+    Return
+    ------
+    The wavelength and the weighted response.
+
+    '''
+
+    wavelength, response = np.loadtxt(filepath).T
+
+    wave_bin = np.zeros_like(wavelength)
+    wave_diff = np.diff(wavelength) / 2.
+    wave_bin[:-1] = wave_diff
+    wave_bin[1:] += wave_diff
+    wave_bin[0] += wave_diff[0]
+    wave_bin[-1] += wave_diff[-1]
+
+    return wavelength, response * wave_bin
+
+
+def _prepare_filters(filepaths, Rv):
+    '''
+    Load the filters and the extinction weights 10^(-A / A_1um * norm) of
+    all the Rv, as a (nRv x nwave) matrix per filter.
+
+    '''
+
+    A_1um = fitzpatrick99(10000., Rv)
+    prepared = []
+
+    for filepath in filepaths:
+
+        wavelength, weight = load_filter(filepath)
+        extinction = 10.**(-fitzpatrick99(wavelength, Rv) / A_1um * norm)
+        prepared.append((wavelength, weight, extinction))
+
+    return prepared
+
+
+def _filter_filepaths(filters):
+    '''
+    Get the paths of the response curves of the filters.
+
+    '''
+
+    responses = list_filter_responses()
+
+    for f in filters:
+
+        if f not in responses:
+
+            raise ValueError('There is no response curve of {}.'.format(f))
+
+    return [responses[f] for f in filters]
+
+
+def extended_spectrum(filepath, Teff, max_wavelength=max_wavelength):
+    '''
+    Load a Koester spectrum and extend it with a black body in steps of 1
+    Angstrom, scaled to the reddest flux of the spectrum.
+
+    Parameters
+    ----------
+    filepath: str
+        The path of the spectrum.
+    Teff: float
+        The effective temperature of the spectrum.
+    max_wavelength: float (Default: 300000.)
+        The wavelength to which the spectrum is extended.
+
+    Return
+    ------
+    The wavelength and the flux.
+
+    '''
+
+    wavelength, flux = np.loadtxt(filepath).T
+
+    # At least one step is needed to keep the width of the last bin
+    bb_wavelength = np.arange(wavelength[-1],
+                              max(max_wavelength, wavelength[-1] + 2.))
+    bb_flux = planck(bb_wavelength, Teff)
+    bb_flux *= flux[-1] / bb_flux[0]
+
+    return np.concatenate((wavelength, bb_wavelength[1:])), np.concatenate(
+        (flux, bb_flux[1:]))
+
+
+def _integrate_models(filelist, Teff, filters):
+    '''
+    Convolve a chunk of models with the filters.
+
+    Return
+    ------
+    The array of the A/E(B-V) in the shape of (nmodel, nfilter, nRv) and
+    the array of the photon counts, i.e. the integral of the flux density
+    times the wavelength and the response, in the shape of
+    (nmodel, nfilter).
+
+    '''
+
+    # Only extend the black body to where the filters need it
+    max_edge = max(_bin_edges(f[0])[-1] for f in filters)
+    extension = min(max_wavelength, np.ceil(max_edge) + 2.)
+
+    reddening = np.zeros(
+        (len(filelist), len(filters), filters[0][2].shape[0]))
+    photon = np.zeros((len(filelist), len(filters)))
+
+    for i, (filepath, t) in enumerate(zip(filelist, Teff)):
+
+        wavelength, flux = extended_spectrum(filepath, t, extension)
+
+        for j, (f_wavelength, f_weight, f_extinction) in enumerate(filters):
+
+            # The photon counts, the source flux convolves with the filter
+            # response. Converting from flux to photon is not needed because
+            # it cancels out in the normalisation.
+            SxW = resample_spectrum(f_wavelength, wavelength,
+                                    flux * wavelength) * f_weight
+            photon[i, j] = np.sum(SxW)
+            reddening[i, j] = -2.5 * np.log10(
+                (f_extinction @ SxW) / photon[i, j]) / limit
+
+    return reddening, photon
+
+
+def integrate_models(models, filepaths, n_jobs=1, Rv=Rv_grid):
+    '''
+    Convolve the Koester spectra with the filters, the spectra are
+    distributed over a pool of processes.
+
+    Parameters
+    ----------
+    models: list of str
+        The paths of the spectra.
+    filepaths: list of str
+        The paths of the response curves of the filters.
+    n_jobs: int (Default: 1)
+        The number of processes. Set to -1 to use all the available cores.
+    Rv: array of float (Default: [2.1, 2.6, 3.1, 3.6, 4.1, 4.6, 5.1])
+        The Rv at which the reddening is computed.
+
+    Return
+    ------
+    The array of the A/E(B-V) in the shape of (nmodel, nfilter, nRv) and
+    the array of the photon counts in the shape of (nmodel, nfilter).
+
+    '''
+
+    Teff = np.array([_koester_parameters(i)[0] for i in models])
+    prepared = _prepare_filters(filepaths, Rv)
+
+    if n_jobs is None or n_jobs < 1:
+
+        n_jobs = os.cpu_count()
+
+    if (n_jobs == 1) or (len(models) <= 1):
+
+        return _integrate_models(models, Teff, prepared)
+
+    # A few chunks per process to balance the load, the filters are only
+    # sent once per chunk
+    chunks = np.array_split(np.arange(len(models)),
+                            min(len(models), 4 * n_jobs))
+
+    with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+
+        output = list(
+            pool.map(_integrate_models, [[models[i] for i in c]
+                                         for c in chunks],
+                     [Teff[c] for c in chunks], [prepared] * len(chunks)))
+
+    return np.concatenate([i[0] for i in output]), np.concatenate(
+        [i[1] for i in output])
+
+
+def _atomic_savetxt(filepath, table):
+
+    tmp_path = temporary_path(filepath)
+
+    with open(tmp_path, 'wb') as f:
+
+        np.savetxt(f, table, delimiter=',')
+
+    os.replace(tmp_path, filepath)
+
+
+def generate_extinction_table(filters=None,
+                              n_jobs=1,
+                              folder=None,
+                              models=None,
+                              Rv=Rv_grid):
+    '''
+    Generate the extinction tables of the filters, i.e. the A/E(B-V) on the
+    (logg, Teff, Rv) grid of the Koester DA spectra. The filter response
+    curves and the extinction law are prepared once, the reddening of all
+    the Rv is one matrix product per filter per spectrum, and the spectra
+    are distributed over a pool of processes.
+
+    Parameters
+    ----------
+    filters: str or list of str (Default: None)
+        The filters to be generated, all the filters in filter_response are
+        generated if None.
+    n_jobs: int (Default: 1)
+        The number of processes. Set to -1 to use all the available cores.
+    folder: str (Default: None)
+        The folder to which the tables are written as <filter>.csv, the
+        default is extinction in the package. Set to False to not write the
+        tables.
+    models: list of str (Default: None)
+        The paths of the spectra, all the Koester spectra in the order of the
+        extinction tables are used if None.
+    Rv: array of float (Default: [2.1, 2.6, 3.1, 3.6, 4.1, 4.6, 5.1])
+        The Rv of the columns of the tables.
+
+    Return
+    ------
+    A dictionary of the tables in the shape of (nmodel, nRv), keyed by the
+    filters.
+
+    '''
+
+    if filters is None:
+
+        filters = list(list_filter_responses())
+
+    filters = list(np.asarray(filters).reshape(-1))
+
+    if models is None:
+
+        models, _, _ = list_koester_models()
+
+    output, _ = integrate_models(models,
+                                 _filter_filepaths(filters),
+                                 n_jobs=n_jobs,
+                                 Rv=Rv)
+
+    tables = {}
+
+    for j, f in enumerate(filters):
+
+        tables[f] = output[:, j]
+
+        if folder is not False:
+
+            _atomic_savetxt(
+                os.path.join(
+                    extinction_folder if folder is None else folder,
+                    '{}.csv'.format(f)), tables[f])
+
+    return tables
@@ -1,3 +1,4 @@
+from concurrent.futures import ThreadPoolExecutor
 import corner
 import emcee
 from functools import partial
@@ -8,7 +9,7 @@ from scipy import optimize
 import time
 
 from .atmosphere_model_reader import atm_reader
-from .reddening import reddening_vector_filter, reddening_vector_interpolated
+from .reddening import ReddeningCube, reddening_vector_interpolated
 
 plt.rc('font', size=18)
 plt.rc('legend', fontsize=12)
@@ -32,6 +33,35 @@ class WDfitter:
         self.samples = {'H': [], 'He': []}
         self.interpolated = None
         self.rv = None
+        self.reddening_filters = []
+        self.reddening_kind = 'cubic'
+        self.reddened_interpolator = {'H': {}, 'He': {}}
+        self.reddened_interpolator_key = {'H': None, 'He': None}
+        self.model_comparison = None
+        self.multistart = {'H': {}, 'He': {}}
+
+    def _map(self, function, iterable, n_jobs=1):
+        '''
+        Internal method to apply the function to every item of the iterable,
+        in a pool of n_jobs threads if n_jobs is not 1. The results are in the
+        same order as the iterable.
+
+        '''
+
+        iterable = list(iterable)
+
+        if n_jobs is None or n_jobs < 1:
+
+            n_jobs = os.cpu_count()
+
+        if (n_jobs == 1) or (len(iterable) <= 1):
+
+            return [function(i) for i in iterable]
+
+        with ThreadPoolExecutor(
+                max_workers=min(n_jobs, len(iterable))) as pool:
+
+            return list(pool.map(function, iterable))
 
     def _interp_atm(self, dependent, atmosphere, independent, logg, **kwargs):
         '''
@@ -49,6 +79,28 @@ class WDfitter:
         return _interpolator
 
     def interp_reddening(self, filters, interpolated=False, kind='cubic'):
+        '''
+        Set up the reddening of the filters, a single callable returning the
+        A/E(B-V) of all the filters is stored in self.rv. The cached
+        interpolators of the reddened magnitudes are reset.
+
+        Parameters
+        ----------
+        filters: list of str
+            The filters to be reddened.
+        interpolated: boolean (Default: False)
+            If True, the reddening is interpolated at the pivot wavelength
+            of the filters as a function of Rv. Otherwise, the reddening is
+            evaluated from the (logg, Teff, Rv) cube of the filters.
+        kind: str (Default: 'cubic')
+            The kind of the interpolation if interpolated is True.
+
+        '''
+
+        self.reddening_filters = list(np.asarray(filters).reshape(-1))
+        self.reddening_kind = kind
+        self.reddened_interpolator = {'H': {}, 'He': {}}
+        self.reddened_interpolator_key = {'H': None, 'He': None}
 
         if interpolated:
 
@@ -56,127 +108,316 @@ class WDfitter:
             rv_itp = reddening_vector_interpolated(kind=kind)
             wavelength = np.array(
                 [self.atm.column_wavelengths[i] for i in filters])
-            self.rv = [partial(rv_itp, w) for w in wavelength]
+            self.rv = partial(rv_itp, wavelength)
 
         else:
 
             self.interpolated = False
-            self.rv = [reddening_vector_filter(i) for i in filters]
+            self.rv = ReddeningCube(filters)
 
-    def _chi2_minimization(self, x, obs, errors, distance, distance_err,
-                           interpolator_filter):
+    def _reddening_of_models(self, atmosphere, filters, Rv):
         '''
-        Internal method for computing the ch2-squared value
-        (for scipy.optimize.least_square).
+        Internal method to compute the A/E(B-V) of the filters at every
+        model of the atmosphere grid, in the shape of (nmodel, nfilter).
 
         '''
 
-        dist_mod = 5. * (np.log10(distance) - 1.)
+        if any(i not in self.reddening_filters for i in filters):
 
-        mag = []
+            self.interp_reddening(filters=filters,
+                                  interpolated=self.interpolated,
+                                  kind=self.reddening_kind)
 
-        for interp in interpolator_filter:
+        if atmosphere == 'H':
 
-            mag.append(interp(x))
+            model = self.atm.model_da
 
-        mag = np.asarray(mag).reshape(-1) + dist_mod
-
-        errors_squared = np.sqrt(errors**2. + (distance_err / distance /
-                                               2.302585092994046)**2.)
+        else:
 
-        chi2 = (mag - obs)**2. / errors_squared
+            model = self.atm.model_db
 
-        if np.isfinite(chi2).all():
+        if self.interpolated:
 
-            return chi2
+            reddening = np.tile(
+                np.asarray(self.rv(Rv), dtype=np.float64).reshape(1, -1),
+                (len(model), 1))
 
         else:
 
-            return np.ones_like(obs) * np.inf
+            reddening = self.rv(model['logg'], model['Teff'], Rv)
 
-    def _chi2_minimization_summed(self, x, obs, errors, distance, distance_err,
-                                  interpolator_filter):
+        return reddening[:, [self.reddening_filters.index(i) for i in filters]]
+
+    def _interp_reddened_atm(self, filters, atmosphere, independent, logg, Rv,
+                             ebv, **kwargs):
         '''
-        Internal method for computing the ch2-squared value
-        (for scipy.optimize.minimize).
+        Internal method to interpolate the reddened magnitudes of the
+        atmosphere grid models for a fixed Rv and E(B-V), i.e. the magnitude
+        plus the A/E(B-V) times the E(B-V) of every model, so that the
+        reddening does not have to be evaluated in the fit. The interpolators
+        are cached until the configuration changes.
 
         '''
 
-        chi2 = self._chi2_minimization(x, obs, errors, distance, distance_err,
-                                       interpolator_filter)
+        key = (tuple(independent), logg, Rv, ebv, repr(sorted(kwargs.items())))
 
-        return np.sum(chi2)
+        if self.reddened_interpolator_key[atmosphere] != key:
 
-    def _log_likelihood(self, x, obs, errors, distance, distance_err,
-                        interpolator_filter):
+            self.reddened_interpolator[atmosphere] = {}
+            self.reddened_interpolator_key[atmosphere] = key
+
+        missing = [
+            i for i in filters
+            if i not in self.reddened_interpolator[atmosphere]
+        ]
+
+        if len(missing) > 0:
+
+            extinction = self._reddening_of_models(atmosphere, missing,
+                                                   Rv) * ebv
+
+            for k, i in enumerate(missing):
+
+                self.reddened_interpolator[atmosphere][i] = self._interp_atm(
+                    dependent=i,
+                    atmosphere=atmosphere,
+                    independent=independent,
+                    logg=logg,
+                    extinction=extinction[:, k],
+                    **kwargs)
+
+        return [self.reddened_interpolator[atmosphere][i] for i in filters]
+
+    def _get_interpolator_filter(self, atmosphere, filters, independent, logg,
+                                 Rv, ebv, kwargs_for_interpolator):
         '''
-        Internal method for computing the ch2-squared value (for emcee).
+        Internal method to get the interpolators of the magnitudes to be
+        fitted, they are reddened if Rv is provided.
 
         '''
 
-        return -0.5 * self._chi2_minimization_summed(
-            x, obs, errors, distance, distance_err, interpolator_filter)
+        if Rv is None:
 
-    def _chi2_minimization_red_interpolated(self, x, obs, errors, distance,
-                                            distance_err, interpolator_filter,
-                                            Rv, ebv):
+            return [self.interpolator[atmosphere][i] for i in filters]
+
+        return self._interp_reddened_atm(filters, atmosphere, independent,
+                                         logg, Rv, ebv,
+                                         **kwargs_for_interpolator)
+
+    def _get_reddening_slope(self, atmosphere, filters, independent, logg,
+                             Rv, fit_Rv, kwargs_for_interpolator):
         '''
-        Internal method for computing the ch2-squared value.
+        Internal method to get a function of the independent variables, the
+        unreddened magnitudes and the Rv, which returns the A/E(B-V) of the
+        filters, i.e. the derivative of the reddened magnitudes with respect
+        to the E(B-V), and its derivative with respect to the Rv. If the
+        gradient of the unreddened magnitudes is also given, the gradient of
+        the A/E(B-V) with respect to the independent variables is returned
+        as well. Unless the
+        reddening is interpolated, the A/E(B-V) is the difference between
+        the cached magnitudes reddened by a unit E(B-V) and the unreddened
+        magnitudes, at the fixed Rv or at the Rv of the reddening grid
+        which is then linearly interpolated as the reddening cube.
 
         '''
 
-        dist_mod = 5. * (np.log10(distance) - 1.)
+        if any(i not in self.reddening_filters for i in filters):
 
-        mag = []
+            self.interp_reddening(filters=filters,
+                                  interpolated=self.interpolated,
+                                  kind=self.reddening_kind)
 
-        for interp in interpolator_filter:
+        index = [self.reddening_filters.index(i) for i in filters]
 
-            mag.append(interp(x))
+        if self.interpolated:
 
-        Av = np.array([i(Rv) for i in self.rv]).reshape(-1) * ebv
-        mag = np.asarray(mag).reshape(-1) + dist_mod
-        errors_squared = np.sqrt(errors**2. + (distance_err / distance /
-                                               2.302585092994046)**2.)
+            def reddening_slope(x, mag, Rv, mag_gradient=None):
 
-        chi2 = (mag - obs + Av)**2. / errors_squared
+                reddening = np.asarray(self.rv(Rv)).reshape(-1)[index]
+                derivative = (np.asarray(self.rv(Rv + 1e-4)).reshape(-1) -
+                              np.asarray(self.rv(Rv - 1e-4)).reshape(-1)
+                              )[index] / 2e-4
 
-        if np.isfinite(chi2).all():
+                if mag_gradient is None:
 
-            return chi2
+                    return reddening, derivative
+
+                return reddening, derivative, np.zeros_like(mag_gradient)
+
+            return reddening_slope
+
+        if fit_Rv:
+
+            Rv_grid = self.rv.Rv
 
         else:
 
-            return np.ones_like(obs) * np.inf
+            Rv_grid = np.array([Rv])
+
+        interpolator_reddened = [
+            self._interp_atm(dependent=list(filters),
+                             atmosphere=atmosphere,
+                             independent=independent,
+                             logg=logg,
+                             extinction=self._reddening_of_models(
+                                 atmosphere, filters, r),
+                             **kwargs_for_interpolator) for r in Rv_grid
+        ]
+
+        def reddening_slope(x, mag, Rv, mag_gradient=None):
+
+            if len(Rv_grid) == 1:
+
+                k, w = 0, 0.
+
+            elif Rv_grid[0] <= Rv <= Rv_grid[-1]:
+
+                k = min(np.searchsorted(Rv_grid, Rv, side='right') - 1,
+                        len(Rv_grid) - 2)
+                w = (Rv - Rv_grid[k]) / (Rv_grid[k + 1] - Rv_grid[k])
+
+            else:
+
+                k, w = None, np.nan
+
+            if k is None:
+
+                reddening = np.full(len(mag), np.nan)
+                derivative = np.full(len(mag), np.nan)
+                gradient = np.full((len(mag), len(x)), np.nan)
+
+            elif len(Rv_grid) == 1:
 
-    def _chi2_minimization_red_filter(self, x, obs, errors, distance,
-                                      distance_err, interpolator_filter,
-                                      interpolator_teff, logg_pos, Rv, ebv):
+                derivative = np.zeros(len(mag))
+
+                if mag_gradient is None:
+
+                    reddened = interpolator_reddened[0](*x)
+
+                else:
+
+                    reddened, reddened_gradient = interpolator_reddened[
+                        0].value_and_gradient(*x)
+                    gradient = np.asarray(reddened_gradient).reshape(
+                        len(mag), len(x)) - mag_gradient
+
+                reddening = np.asarray(reddened).reshape(-1) - mag
+
+            else:
+
+                if mag_gradient is None:
+
+                    lower = interpolator_reddened[k](*x)
+                    upper = interpolator_reddened[k + 1](*x)
+
+                else:
+
+                    lower, lower_gradient = interpolator_reddened[
+                        k].value_and_gradient(*x)
+                    upper, upper_gradient = interpolator_reddened[
+                        k + 1].value_and_gradient(*x)
+                    gradient = (1. - w) * np.asarray(lower_gradient).reshape(
+                        len(mag), len(x)) + w * np.asarray(
+                            upper_gradient).reshape(len(mag),
+                                                    len(x)) - mag_gradient
+
+                lower = np.asarray(lower).reshape(-1)
+                upper = np.asarray(upper).reshape(-1)
+                reddening = (1. - w) * lower + w * upper - mag
+                derivative = (upper - lower) / (Rv_grid[k + 1] - Rv_grid[k])
+
+            if mag_gradient is None:
+
+                return reddening, derivative
+
+            return reddening, derivative, gradient
+
+        return reddening_slope
+
+    def _reddened_magnitudes(self,
+                             x,
+                             distance,
+                             interpolator_filter,
+                             reddening_slope,
+                             n_independent,
+                             Rv,
+                             fit_Rv,
+                             gradient=False):
         '''
-        Internal method for computing the ch2-squared value.
+        Internal method to unpack the parameters when the E(B-V), and the Rv
+        if fit_Rv is True, are fitted. The parameters are the independent
+        variables, the E(B-V), the Rv and the distance if it is not provided.
+
+        Return
+        ------
+        The reddened magnitudes at the distance, and their derivatives with
+        respect to the E(B-V) and the Rv. If gradient is True, their
+        gradient with respect to the independent variables is also returned.
 
         '''
 
+        x_independent = x[:n_independent]
+        ebv = x[n_independent]
+
+        if fit_Rv:
+
+            Rv = x[n_independent + 1]
+
+        if distance is None:
+
+            distance = x[-1]
+
         dist_mod = 5. * (np.log10(distance) - 1.)
 
-        mag = []
+        if not gradient:
 
-        for interp in interpolator_filter:
+            mag = np.asarray([interp(*x_independent)
+                              for interp in interpolator_filter]).reshape(-1)
+            reddening, reddening_derivative = reddening_slope(
+                x_independent, mag, Rv)
 
-            mag.append(interp(x))
+            return mag + dist_mod + ebv * reddening, reddening, (
+                ebv * reddening_derivative)
+
+        mag, mag_gradient = self._magnitude_and_gradient(x_independent,
+                                                         interpolator_filter,
+                                                         unpack=True)
+        reddening, reddening_derivative, reddening_gradient = reddening_slope(
+            x_independent, mag, Rv, mag_gradient)
+
+        return mag + dist_mod + ebv * reddening, reddening, (
+            ebv * reddening_derivative), (mag_gradient +
+                                          ebv * reddening_gradient)
+
+    def _chi2_minimization_reddening(self, x, obs, errors, distance,
+                                     distance_err, interpolator_filter,
+                                     reddening_slope, n_independent, Rv,
+                                     fit_Rv):
+        '''
+        Internal method for computing the ch2-squared value when the E(B-V)
+        is fitted (for scipy.optimize.least_square).
 
-        teff = float(interpolator_teff(x))
+        '''
 
-        if not np.isfinite(teff):
+        if (distance is None) and (x[-1] <= 0.):
 
             return np.ones_like(obs) * np.inf
 
-        logg = x[logg_pos]
-        Av = np.array([i([logg, teff, Rv]) for i in self.rv]).reshape(-1) * ebv
-        mag = np.asarray(mag).reshape(-1) + dist_mod
-        errors_squared = np.sqrt(errors**2. + (distance_err / distance /
-                                               2.302585092994046)**2.)
+        mag, _, _ = self._reddened_magnitudes(x, distance,
+                                              interpolator_filter,
+                                              reddening_slope, n_independent,
+                                              Rv, fit_Rv)
 
-        chi2 = (mag - obs + Av)**2. / errors_squared
+        if distance is None:
+
+            errors_squared = errors**2.
+
+        else:
+
+            errors_squared = np.sqrt(errors**2. + (
+                distance_err / distance / 2.302585092994046)**2.)
+
+        chi2 = (mag - obs)**2. / errors_squared
 
         if np.isfinite(chi2).all():
 
@@ -186,13 +427,93 @@ class WDfitter:
 
             return np.ones_like(obs) * np.inf
 
-    def _chi2_minimization_red_filter_fixed_logg(self, x, obs, errors,
-                                                 distance, distance_err,
+    def _chi2_minimization_reddening_jac(self, x, obs, errors, distance,
+                                         distance_err, interpolator_filter,
+                                         reddening_slope, n_independent, Rv,
+                                         fit_Rv):
+        '''
+        Internal method for computing the Jacobian of the ch2-squared values
+        when the E(B-V) is fitted (for scipy.optimize.least_square).
+
+        '''
+
+        x = np.asarray(x, dtype=np.float64)
+        mag, reddening, reddening_derivative, mag_gradient = (
+            self._reddened_magnitudes(x,
+                                      distance,
+                                      interpolator_filter,
+                                      reddening_slope,
+                                      n_independent,
+                                      Rv,
+                                      fit_Rv,
+                                      gradient=True))
+
+        # The derivatives of the magnitudes
+        derivative = np.zeros((len(obs), len(x)))
+        derivative[:, :n_independent] = mag_gradient
+        derivative[:, n_independent] = reddening
+
+        if fit_Rv:
+
+            derivative[:, n_independent + 1] = reddening_derivative
+
+        if distance is None:
+
+            derivative[:, -1] = 5. / x[-1] / 2.302585092994046
+            errors_squared = errors**2.
+
+        else:
+
+            errors_squared = np.sqrt(errors**2. + (
+                distance_err / distance / 2.302585092994046)**2.)
+
+        jac = 2. * ((mag - obs) / errors_squared)[:, None] * derivative
+
+        if np.isfinite(jac).all():
+
+            return jac
+
+        else:
+
+            return np.zeros_like(jac)
+
+    def _chi2_minimization_reddening_summed(self, x, obs, errors, distance,
+                                            distance_err, interpolator_filter,
+                                            reddening_slope, n_independent,
+                                            Rv, fit_Rv):
+        '''
+        Internal method for computing the ch2-squared value when the E(B-V)
+        is fitted (for scipy.optimize.minimize).
+
+        '''
+
+        chi2 = self._chi2_minimization_reddening(x, obs, errors, distance,
+                                                 distance_err,
                                                  interpolator_filter,
-                                                 interpolator_teff, logg, Rv,
-                                                 ebv):
+                                                 reddening_slope,
+                                                 n_independent, Rv, fit_Rv)
+
+        return np.sum(chi2)
+
+    def _log_likelihood_reddening(self, x, obs, errors, distance,
+                                  distance_err, interpolator_filter,
+                                  reddening_slope, n_independent, Rv,
+                                  fit_Rv):
         '''
-        Internal method for computing the ch2-squared value.
+        Internal method for computing the log-likelihood value when the
+        E(B-V) is fitted (for emcee).
+
+        '''
+
+        return -0.5 * self._chi2_minimization_reddening_summed(
+            x, obs, errors, distance, distance_err, interpolator_filter,
+            reddening_slope, n_independent, Rv, fit_Rv)
+
+    def _chi2_minimization(self, x, obs, errors, distance, distance_err,
+                           interpolator_filter):
+        '''
+        Internal method for computing the ch2-squared value
+        (for scipy.optimize.least_square).
 
         '''
 
@@ -204,13 +525,12 @@ class WDfitter:
 
             mag.append(interp(x))
 
-        teff = float(interpolator_teff(x))
-        Av = np.array([i([logg, teff, Rv]) for i in self.rv]).reshape(-1) * ebv
         mag = np.asarray(mag).reshape(-1) + dist_mod
+
         errors_squared = np.sqrt(errors**2. + (distance_err / distance /
                                                2.302585092994046)**2.)
 
-        chi2 = (mag - obs + Av)**2. / errors_squared
+        chi2 = (mag - obs)**2. / errors_squared
 
         if np.isfinite(chi2).all():
 
@@ -220,72 +540,92 @@ class WDfitter:
 
             return np.ones_like(obs) * np.inf
 
-    def _chi2_minimization_red(self, x, obs, errors, distance, distance_err,
-                               interpolator_filter, interpolator_teff, logg,
-                               Rv, ebv):
+    def _magnitude_and_gradient(self, x, interpolator_filter, unpack=False):
         '''
-        Internal method for computing the ch2-squared value
+        Internal method to evaluate the interpolated magnitudes and their
+        gradient with respect to the independent variables, in the shape of
+        (nfilter, ) and (nfilter, nindependent). Set unpack to True to call
+        the interpolators with the independent variables as separate
+        arguments.
+
+        '''
+
+        mag = []
+        gradient = []
+
+        for interp in interpolator_filter:
+
+            if unpack:
+
+                value, derivative = interp.value_and_gradient(*x)
+
+            else:
+
+                value, derivative = interp.value_and_gradient(x)
+
+            mag.append(np.asarray(value).reshape(-1))
+            gradient.append(np.asarray(derivative).reshape(-1, len(x)))
+
+        return np.concatenate(mag), np.vstack(gradient)
+
+    def _chi2_minimization_jac(self, x, obs, errors, distance, distance_err,
+                               interpolator_filter):
+        '''
+        Internal method for computing the Jacobian of the ch2-squared values
+        from the gradient of the interpolators
         (for scipy.optimize.least_square).
 
         '''
 
-        if self.interpolated:
+        x = np.asarray(x, dtype=np.float64)
+        dist_mod = 5. * (np.log10(distance) - 1.)
 
-            chi2 = self._chi2_minimization_red_interpolated(
-                x, obs, errors, distance, distance_err, interpolator_filter,
-                Rv, ebv)
+        mag, derivative = self._magnitude_and_gradient(x, interpolator_filter)
+        mag = mag + dist_mod
 
-        else:
+        errors_squared = np.sqrt(errors**2. + (distance_err / distance /
+                                               2.302585092994046)**2.)
 
-            if logg is None:
+        jac = 2. * ((mag - obs) / errors_squared)[:, None] * derivative
 
-                logg_pos = int(
-                    np.argwhere(
-                        np.array(self.fitting_params['independent']) ==
-                        'logg'))
-                chi2 = self._chi2_minimization_red_filter(
-                    x, obs, errors, distance, distance_err,
-                    interpolator_filter, interpolator_teff, logg_pos, Rv, ebv)
+        if np.isfinite(jac).all():
 
-            else:
+            return jac
 
-                chi2 = self._chi2_minimization_red_filter_fixed_logg(
-                    x, obs, errors, distance, distance_err,
-                    interpolator_filter, interpolator_teff, logg, Rv, ebv)
+        else:
 
-        return chi2
+            return np.zeros_like(jac)
 
-    def _chi2_minimization_red_summed(self, x, obs, errors, distance,
-                                      distance_err, interpolator_filter,
-                                      interpolator_teff, logg, Rv, ebv):
+    def _chi2_minimization_summed(self, x, obs, errors, distance, distance_err,
+                                  interpolator_filter):
         '''
         Internal method for computing the ch2-squared value
         (for scipy.optimize.minimize).
 
         '''
 
-        chi2 = self._chi2_minimization_red(x, obs, errors, distance,
-                                           distance_err, interpolator_filter,
-                                           interpolator_teff, logg, Rv, ebv)
+        chi2 = self._chi2_minimization(x, obs, errors, distance, distance_err,
+                                       interpolator_filter)
 
         return np.sum(chi2)
 
-    def _log_likelihood_red(self, x, obs, errors, distance, distance_err,
-                            interpolator_filter, interpolator_teff, logg, Rv,
-                            ebv):
+    def _log_likelihood(self, x, obs, errors, distance, distance_err,
+                        interpolator_filter):
         '''
-        Internal method for computing the log-likelihood value (for emcee).
+        Internal method for computing the ch2-squared value (for emcee).
 
         '''
 
-        return -0.5 * self._chi2_minimization_red_summed(
-            x, obs, errors, distance, distance_err, interpolator_filter,
-            interpolator_teff, logg, Rv, ebv)
+        return -0.5 * self._chi2_minimization_summed(
+            x, obs, errors, distance, distance_err, interpolator_filter)
 
-    def _chi2_minimization_distance(self, x, obs, errors, interpolator_filter):
+    def _chi2_minimization_distance(self, x, obs, errors, interpolator_filter,
+                                    n_independent):
         '''
         Internal method for computing the ch2-squared value in cases when
-        the distance is not provided (for scipy.optimize.least_square).
+        the distance is not provided (for scipy.optimize.least_square). The
+        parameters are the n_independent independent variables followed by
+        the distance.
 
         '''
 
@@ -299,7 +639,7 @@ class WDfitter:
 
         for interp in interpolator_filter:
 
-            mag.append(interp(x[:2]))
+            mag.append(interp(x[:n_independent]))
 
         mag = np.asarray(mag).reshape(-1) + dist_mod
         errors_squared = errors**2.
@@ -314,8 +654,37 @@ class WDfitter:
 
             return np.ones_like(obs) * np.inf
 
+    def _chi2_minimization_distance_jac(self, x, obs, errors,
+                                        interpolator_filter, n_independent):
+        '''
+        Internal method for computing the Jacobian of the ch2-squared values
+        from the gradient of the interpolators in cases when the distance is
+        not provided (for scipy.optimize.least_square).
+
+        '''
+
+        x = np.asarray(x, dtype=np.float64)
+        dist_mod = 5. * (np.log10(x[-1]) - 1.)
+
+        mag, mag_gradient = self._magnitude_and_gradient(
+            x[:n_independent], interpolator_filter)
+        mag = mag + dist_mod
+        errors_squared = errors**2.
+
+        derivative = np.column_stack(
+            (mag_gradient, np.full(len(obs), 5. / x[-1] / 2.302585092994046)))
+        jac = 2. * ((mag - obs) / errors_squared)[:, None] * derivative
+
+        if np.isfinite(jac).all():
+
+            return jac
+
+        else:
+
+            return np.zeros_like(jac)
+
     def _chi2_minimization_distance_summed(self, x, obs, errors,
-                                           interpolator_filter):
+                                           interpolator_filter, n_independent):
         '''
         Internal method for computing the ch2-squared value in cases when
         the distance is not provided (for scipy.optimize.minimize).
@@ -323,11 +692,13 @@ class WDfitter:
         '''
 
         chi2 = self._chi2_minimization_distance(x, obs, errors,
-                                                interpolator_filter)
+                                                interpolator_filter,
+                                                n_independent)
 
         return np.sum(chi2)
 
-    def _log_likelihood_distance(self, x, obs, errors, interpolator_filter):
+    def _log_likelihood_distance(self, x, obs, errors, interpolator_filter,
+                                 n_independent):
         '''
         Internal method for computing the log-likelihood value in cases when
         the distance is not provided (for emcee).
@@ -335,179 +706,493 @@ class WDfitter:
         '''
 
         return -0.5 * self._chi2_minimization_distance_summed(
-            x, obs, errors, interpolator_filter)
+            x, obs, errors, interpolator_filter, n_independent)
 
-    def _chi2_minimization_distance_red_interpolated(self, x, obs, errors,
-                                                     interpolator_filter, Rv,
-                                                     ebv):
+    def _fit_atmosphere(self,
+                        atmosphere,
+                        fitting_params,
+                        interpolator_filters=None,
+                        pos=None):
         '''
-        Internal method for computing the ch2-squared value in cases when
-        the distance is not provided.
+        Internal method to fit a single atmosphere, the results are stored
+        under the atmosphere in self.results, self.best_fit_params,
+        self.sampler and self.samples, so that the atmospheres can be fitted
+        concurrently. The interpolators of the interpolator_filters are built
+        first if provided.
+
+        Parameters
+        ----------
+        atmosphere: str
+            'H' or 'He'.
+        fitting_params: dict
+            The fitting parameters, see self.fitting_params.
+        interpolator_filters: list of str (Default: None)
+            The filters of which the interpolators are to be built.
+        pos: array of float (Default: None)
+            The initial positions of the walkers (emcee method only).
+
+        Return
+        ------
+        The chi2 at the best fit parameters.
 
         '''
 
-        if (x[-1] <= 0.):
+        j = atmosphere
+        filters = fitting_params['filters']
+        mags = fitting_params['mags']
+        mag_errors = fitting_params['mag_errors']
+        distance = fitting_params['distance']
+        distance_err = fitting_params['distance_err']
+        independent = fitting_params['independent']
+        initial_guess = fitting_params['initial_guess']
+        logg = fitting_params['logg']
+        Rv = fitting_params['Rv']
+        ebv = fitting_params['ebv']
+        fit_ebv = fitting_params['fit_ebv']
+        fit_Rv = fitting_params['fit_Rv']
+        method = fitting_params['method']
+        kwargs_for_interpolator = fitting_params['kwargs_for_interpolator']
+
+        if interpolator_filters is not None:
+
+            for i in list(interpolator_filters) + [
+                    'Teff', 'mass', 'Mbol', 'age'
+            ]:
+
+                # Organise the interpolators by atmosphere type
+                # and filter, note that the logg is not used
+                # if independent list contains 'logg'
+                self.interpolator[j][i] = self._interp_atm(
+                    dependent=i,
+                    atmosphere=j,
+                    independent=independent,
+                    logg=logg,
+                    **kwargs_for_interpolator)
+
+        interpolator_filter = self._get_interpolator_filter(
+            j, filters, independent, logg, None if fit_ebv else Rv, ebv,
+            kwargs_for_interpolator)
+
+        # If the E(B-V) is fitted, with or without the distance
+        if fit_ebv:
+
+            args = (mags, mag_errors, distance, distance_err,
+                    interpolator_filter,
+                    self._get_reddening_slope(j, filters, independent, logg,
+                                              Rv, fit_Rv,
+                                              kwargs_for_interpolator),
+                    len(independent), Rv, fit_Rv)
+            chi2_function = self._chi2_minimization_reddening
+            jac_function = self._chi2_minimization_reddening_jac
+            chi2_summed_function = self._chi2_minimization_reddening_summed
+            log_likelihood_function = self._log_likelihood_reddening
+
+        # If distance is not provided, fit for the photometric
+        # distance simultaneously using an assumed logg as provided
+        elif distance is None:
+
+            args = (mags, mag_errors, interpolator_filter, len(independent))
+            chi2_function = self._chi2_minimization_distance
+            jac_function = self._chi2_minimization_distance_jac
+            chi2_summed_function = self._chi2_minimization_distance_summed
+            log_likelihood_function = self._log_likelihood_distance
+
+        # If distance is provided, fit here.
+        else:
 
-            return np.ones_like(obs) * np.inf
+            args = (mags, mag_errors, distance, distance_err,
+                    interpolator_filter)
+            chi2_function = self._chi2_minimization
+            jac_function = self._chi2_minimization_jac
+            chi2_summed_function = self._chi2_minimization_summed
+            log_likelihood_function = self._log_likelihood
 
-        dist_mod = 5. * (np.log10(x[-1]) - 1.)
+        # If using the scipy.optimize.minimize()
+        if method == 'minimize':
 
-        mag = []
+            self.results[j] = optimize.minimize(
+                chi2_summed_function,
+                initial_guess,
+                args=args,
+                **fitting_params['kwargs_for_minimize'])
 
-        for interp in interpolator_filter:
+        # If using scipy.optimize.least_square
+        elif method == 'least_square':
 
-            mag.append(interp(x[:2]))
+            self.results[j] = optimize.least_squares(
+                chi2_function,
+                initial_guess,
+                args=args,
+                **{
+                    'jac': jac_function,
+                    **fitting_params['kwargs_for_least_square']
+                })
 
-        Av = np.array([i(Rv) for i in self.rv]).reshape(-1) * ebv
-        mag = np.asarray(mag).reshape(-1) + dist_mod
-        errors_squared = errors**2.
+        # If starting scipy.optimize.minimize() from many points
+        elif method == 'multistart':
 
-        chi2 = (mag - obs + Av)**2. / errors_squared
+            self.results[j], self.multistart[j] = self._multistart(
+                j, fitting_params, args, chi2_summed_function)
 
-        if np.isfinite(chi2).all():
+        if method in ['minimize', 'least_square', 'multistart']:
 
-            return chi2
+            # Store the chi2
+            self.best_fit_params[j]['chi2'] = self.results[j].fun
 
-        else:
+            # Save the best fit results
+            if len(independent) == 1:
 
-            return np.ones_like(obs) * np.inf
+                self.best_fit_params[j][independent[0]] = self.results[j].x[:1]
+                self.best_fit_params[j]['logg'] = logg
 
-    def _chi2_minimization_distance_red_filter(self, x, obs, errors,
-                                               interpolator_filter,
-                                               interpolator_teff, logg_pos, Rv,
-                                               ebv):
-        '''
-        Internal method for computing the ch2-squared value in cases when
-        the distance is not provided.
+            else:
 
-        '''
+                for k in range(len(independent)):
 
-        if (x[-1] <= 0.):
+                    self.best_fit_params[j][
+                        independent[k]] = self.results[j].x[k]
 
-            return np.ones_like(obs) * np.inf
+            if fit_ebv:
 
-        dist_mod = 5. * (np.log10(x[-1]) - 1.)
+                self.best_fit_params[j]['ebv'] = self.results[j].x[len(
+                    independent)]
 
-        mag = []
+            if fit_Rv:
 
-        for interp in interpolator_filter:
+                self.best_fit_params[j]['Rv'] = self.results[j].x[
+                    len(independent) + 1]
 
-            mag.append(interp(x[:2]))
+            # Get the fitted parameters, the content of results vary
+            # depending on the choise of minimizer.
+            for i in filters:
 
-        teff = float(interpolator_teff(x[:2]))
-        logg = x[logg_pos]
-        Av = np.array([i([logg, teff, Rv]) for i in self.rv]).reshape(-1) * ebv
-        mag = np.asarray(mag).reshape(-1) + dist_mod
-        errors_squared = errors**2.
+                # Only the independent variables, i.e. the intrinsic
+                # absolute magnitudes without the reddening
+                self.best_fit_params[j][i] = float(self.interpolator[j][i](
+                    self.results[j].x[:len(independent)]))
 
-        chi2 = (mag - obs + Av)**2. / errors_squared
+                if distance is None:
 
-        if np.isfinite(chi2).all():
+                    self.best_fit_params[j]['distance'] =\
+                        self.results[j].x[-1]
 
-            return chi2
+                else:
+
+                    self.best_fit_params[j]['distance'] = distance
+
+                self.best_fit_params[j]['dist_mod'] = 5. * (
+                    np.log10(self.best_fit_params[j]['distance']) - 1)
+
+            return float(chi2_summed_function(self.results[j].x, *args))
+
+        # If using emcee
+        self.sampler[j] = emcee.EnsembleSampler(
+            len(pos), len(initial_guess), log_likelihood_function, args=args,
+            **fitting_params['kwargs_for_emcee'])
+        self.sampler[j].run_mcmc(pos,
+                                 fitting_params['nsteps'],
+                                 progress=fitting_params['progress'])
+        self.samples[j] = self.sampler[j].get_chain(
+            discard=fitting_params['nburns'], flat=True)
+
+        # Save the best fit results
+        if len(independent) == 1:
+
+            self.best_fit_params[j][independent[0]] = np.percentile(
+                self.samples[j][:, 0], [50])
+            self.best_fit_params[j]['logg'] = logg
 
         else:
 
-            return np.ones_like(obs) * np.inf
+            for k in range(len(independent)):
+
+                self.best_fit_params[j][independent[k]] = np.percentile(
+                    self.samples[j][:, k], [50])
+
+        x = np.percentile(self.samples[j], 50, axis=0)
+
+        # Refine the minimum of this atmosphere only, within the bounds
+        # given by the percentiles of the samples
+        if fitting_params['refine']:
+
+            self._fit_atmosphere(
+                j, {
+                    **fitting_params, 'method': 'minimize',
+                    'initial_guess': x,
+                    'kwargs_for_minimize': {
+                        'bounds':
+                        np.percentile(self.samples[j],
+                                      fitting_params['refine_bounds'],
+                                      axis=0).T
+                    }
+                })
+            x[:len(independent)] = self.results[j].x[:len(independent)]
+
+        if fit_ebv:
 
-    def _chi2_minimization_distance_red_filter_fixed_logg(
-            self, x, obs, errors, interpolator_filter, interpolator_teff, logg,
-            Rv, ebv):
+            self.best_fit_params[j]['ebv'] = np.percentile(
+                self.samples[j][:, len(independent)], [50])
+
+        if fit_Rv:
+
+            self.best_fit_params[j]['Rv'] = np.percentile(
+                self.samples[j][:, len(independent) + 1], [50])
+
+        # Get the fitted parameters, the content of results vary
+        # depending on the choise of minimizer.
+        for i in filters:
+
+            if len(independent) == 1:
+
+                self.best_fit_params[j][i] = float(self.interpolator[j][i](
+                    self.best_fit_params[j][independent[0]]))
+
+            else:
+
+                self.best_fit_params[j][i] = float(self.interpolator[j][i](
+                    self.best_fit_params[j][independent[0]],
+                    self.best_fit_params[j][independent[1]]))
+
+            if distance is None:
+
+                self.best_fit_params[j]['distance'] =\
+                    np.percentile(self.samples[j][:, -1], [50])
+
+            else:
+
+                self.best_fit_params[j]['distance'] = distance
+
+            self.best_fit_params[j]['dist_mod'] = 5. * (
+                np.log10(self.best_fit_params[j]['distance']) - 1)
+
+        return float(chi2_summed_function(x, *args))
+
+    def _multistart_bounds(self, atmosphere, independent, fit_ebv, fit_Rv):
         '''
-        Internal method for computing the ch2-squared value in cases when
-        the distance is not provided.
+        Internal method to get the default bounds of the Latin hypercube of
+        the multistart method: the range of the independent variables in the
+        atmosphere grid, [0, 2] for the E(B-V) and the range of the Rv of the
+        reddening.
 
         '''
 
-        if (x[-1] <= 0.):
+        if atmosphere == 'H':
 
-            return np.ones_like(obs) * np.inf
+            model = self.atm.model_da
 
-        dist_mod = 5. * (np.log10(x[-1]) - 1.)
+        else:
 
-        mag = []
+            model = self.atm.model_db
 
-        for interp in interpolator_filter:
+        bounds = []
 
-            mag.append(interp(x[:2]))
+        for i in independent:
 
-        teff = float(interpolator_teff(x))
-        Av = np.array([i([logg, teff, Rv]) for i in self.rv]).reshape(-1) * ebv
-        mag = np.asarray(mag).reshape(-1) + dist_mod
-        errors_squared = errors**2.
+            values = np.asarray(model[i], dtype=np.float64)
+            values = values[np.isfinite(values)]
+            bounds.append([np.min(values), np.max(values)])
 
-        chi2 = (mag - obs + Av)**2. / errors_squared
+        if fit_ebv:
 
-        if np.isfinite(chi2).all():
+            bounds.append([0., 2.])
 
-            return chi2
+        if fit_Rv:
 
-        else:
+            if self.interpolated:
 
-            return np.ones_like(obs) * np.inf
+                bounds.append([2.1, 5.1])
 
-    def _chi2_minimization_distance_red(self, x, obs, errors,
-                                        interpolator_filter, interpolator_teff,
-                                        logg, Rv, ebv):
+            else:
+
+                bounds.append([np.min(self.rv.Rv), np.max(self.rv.Rv)])
+
+        return np.array(bounds, dtype=np.float64)
+
+    def _chi2_batch(self, x, fitting_params, args):
         '''
-        Internal method for computing the ch2-squared value in cases when
-        the distance is not provided (for scipy.optimize.least_square).
+        Internal method to compute the chi2 of many sets of parameters in the
+        shape of (n, nparameter) without the distance. If the distance is not
+        provided, the distance minimising the chi2 of each set is found
+        analytically. The magnitudes of all the sets are interpolated at once
+        unless the E(B-V) is fitted.
+
+        Return
+        ------
+        The parameters with the distance appended if it is fitted, and the
+        chi2, which is infinite outside the atmosphere grid.
 
         '''
 
-        if self.interpolated:
+        mags = fitting_params['mags']
+        mag_errors = fitting_params['mag_errors']
+        distance = fitting_params['distance']
+        distance_err = fitting_params['distance_err']
+        n_independent = len(fitting_params['independent'])
+
+        # The interpolators follow the magnitudes, their errors, and the
+        # distance and its error if the distance is in the args
+        if (distance is None) and (not fitting_params['fit_ebv']):
 
-            chi2 = self._chi2_minimization_distance_red_interpolated(
-                x, obs, errors, interpolator_filter, Rv, ebv)
+            interpolator_filter = args[2]
 
         else:
 
-            if logg is None:
+            interpolator_filter = args[4]
 
-                logg_pos = int(
-                    np.argwhere(
-                        np.array(self.fitting_params['independent']) ==
-                        'logg'))
-                chi2 = self._chi2_minimization_distance_red_filter(
-                    x, obs, errors, interpolator_filter, interpolator_teff,
-                    logg_pos, Rv, ebv)
+        if fitting_params['fit_ebv']:
 
-            else:
+            # The absolute magnitudes, i.e. at 10 pc
+            mag = np.array([
+                self._reddened_magnitudes(i, 10., interpolator_filter,
+                                          args[-4], n_independent, args[-2],
+                                          args[-1])[0] for i in x
+            ])
 
-                chi2 = self._chi2_minimization_distance_red_filter_fixed_logg(
-                    x, obs, errors, interpolator_filter, interpolator_teff,
-                    logg, Rv, ebv)
+        elif n_independent == 1:
 
-        return chi2
+            mag = np.column_stack([
+                np.asarray(interp(x[:, 0])).reshape(-1)
+                for interp in interpolator_filter
+            ])
 
-    def _chi2_minimization_distance_red_summed(self, x, obs, errors,
-                                               interpolator_filter,
-                                               interpolator_teff, logg, Rv,
-                                               ebv):
+        else:
+
+            mag = np.column_stack([
+                np.asarray(interp(x[:, :2])).reshape(-1)
+                for interp in interpolator_filter
+            ])
+
+        if distance is None:
+
+            # The weighted mean of the distance moduli of the filters
+            weight = 1. / mag_errors**2.
+            dist_mod = np.sum(
+                (mags - mag) * weight, axis=1) / np.sum(weight)
+            x = np.column_stack((x, 10.**(dist_mod / 5. + 1.)))
+            errors_squared = mag_errors**2.
+
+        else:
+
+            dist_mod = np.full(len(x), 5. * (np.log10(distance) - 1.))
+            errors_squared = np.sqrt(mag_errors**2. + (
+                distance_err / distance / 2.302585092994046)**2.)
+
+        chi2 = np.sum((mag + dist_mod[:, None] - mags)**2. / errors_squared,
+                      axis=1)
+        chi2[~np.isfinite(chi2)] = np.inf
+
+        return x, chi2
+
+    def _multistart(self, atmosphere, fitting_params, args,
+                    chi2_summed_function):
         '''
-        Internal method for computing the ch2-squared value in cases when
-        the distance is not provided (for scipy.optimize.minimize).
+        Internal method to search for the global minimum of the chi2 of an
+        atmosphere. The chi2 is evaluated at the initial guess and at the
+        nstarts points of a Latin hypercube within the multistart_bounds,
+        then scipy.optimize.minimize() is run with the kwargs_for_minimize
+        from the nbest points of the lowest chi2, in n_jobs threads. The
+        distance is not sampled, the distance which minimises the chi2 of
+        each point is used as its starting distance.
+
+        Return
+        ------
+        The result of the minimizer of the lowest chi2, and a dictionary of
+        the diagnostics: the 'starts' and their 'chi2_starts', the 'x', the
+        'chi2' and the 'success' of each minimizer, the total number of
+        function evaluations 'nfev' and the number of minimizers which reach
+        the lowest chi2 within 1E-3 'n_at_best'.
 
         '''
 
-        chi2 = self._chi2_minimization_distance_red(x, obs, errors,
-                                                    interpolator_filter,
-                                                    interpolator_teff, logg,
-                                                    Rv, ebv)
+        independent = fitting_params['independent']
+        fit_ebv = fitting_params['fit_ebv']
+        fit_Rv = fitting_params['fit_Rv']
+        nstarts = int(fitting_params['nstarts'])
 
-        return np.sum(chi2)
+        if fitting_params['multistart_bounds'] is None:
+
+            bounds = self._multistart_bounds(atmosphere, independent, fit_ebv,
+                                             fit_Rv)
 
-    def _log_likelihood_distance_red(self, x, obs, errors, interpolator_filter,
-                                     interpolator_teff, logg, Rv, ebv):
+        else:
+
+            bounds = np.array(fitting_params['multistart_bounds'],
+                              dtype=np.float64).reshape(-1, 2)
+
+        ndim = len(bounds)
+
+        # Latin hypercube: one point in each of the nstarts intervals of
+        # every parameter, paired randomly across the parameters
+        sample = (np.argsort(np.random.random((ndim, nstarts)), axis=1).T +
+                  np.random.random((nstarts, ndim))) / nstarts
+        starts = np.vstack(
+            (np.asarray(fitting_params['initial_guess'],
+                        dtype=np.float64).reshape(-1)[:ndim],
+             bounds[:, 0] + sample * (bounds[:, 1] - bounds[:, 0])))
+
+        starts, chi2_starts = self._chi2_batch(starts, fitting_params, args)
+        best_starts = np.argsort(chi2_starts)[:int(fitting_params['nbest'])]
+
+        results = self._map(
+            partial(optimize.minimize,
+                    chi2_summed_function,
+                    args=args,
+                    **fitting_params['kwargs_for_minimize']),
+            starts[best_starts], fitting_params['n_jobs'])
+
+        chi2 = np.array([i.fun for i in results], dtype=np.float64)
+        chi2[~np.isfinite(chi2)] = np.inf
+        best = int(np.argmin(chi2))
+
+        diagnostics = {
+            'starts': starts,
+            'chi2_starts': chi2_starts,
+            'x': np.array([i.x for i in results]),
+            'chi2': chi2,
+            'success': np.array([i.success for i in results]),
+            'nfev': int(np.sum([i.nfev for i in results])) + len(starts),
+            'n_at_best': int(
+                np.sum(np.isclose(chi2, chi2[best], rtol=1e-3, atol=1e-3)))
+        }
+
+        return results[best], diagnostics
+
+    def _compare_models(self, atmosphere, chi2, n_parameters, n_data):
         '''
-        Internal method for computing the log-likelihood value in cases when
-        the distance is not provided (for emcee).
+        Internal method to compare the fits of the atmospheres by their
+        chi2 and the Bayesian information criterion,
+        BIC = chi2 + n_parameters * ln(n_data). The probability of each
+        atmosphere is the normalised exp(-BIC / 2), i.e. an approximation of
+        the relative evidence assuming equal prior probabilities.
+
+        Return
+        ------
+        A dictionary of the 'chi2', the 'BIC' and the 'probability' keyed by
+        the atmosphere, and the 'best_atmosphere' of the lowest BIC.
 
         '''
 
-        return -0.5 * self._chi2_minimization_distance_red_summed(
-            x, obs, errors, interpolator_filter, interpolator_teff, logg, Rv,
-            ebv)
+        chi2 = np.asarray(chi2, dtype=np.float64)
+        bic = chi2 + n_parameters * np.log(n_data)
+
+        if np.isfinite(bic).any():
+
+            relative_evidence = np.exp(-0.5 * (bic - np.nanmin(bic)))
+            relative_evidence[~np.isfinite(relative_evidence)] = 0.
+            probability = relative_evidence / np.sum(relative_evidence)
+            best_atmosphere = atmosphere[int(np.nanargmin(bic))]
+
+        else:
+
+            probability = np.full(len(atmosphere), np.nan)
+            best_atmosphere = None
+
+        return {
+            'chi2': dict(zip(atmosphere, chi2.tolist())),
+            'BIC': dict(zip(atmosphere, bic.tolist())),
+            'probability': dict(zip(atmosphere, probability.tolist())),
+            'best_atmosphere': best_atmosphere
+        }
 
     def list_atmosphere_parameters(self):
         '''
@@ -530,6 +1215,8 @@ class WDfitter:
             kind='cubic',
             Rv=None,
             ebv=None,
+            fit_ebv=False,
+            fit_Rv=False,
             independent=['Mbol', 'logg'],
             initial_guess=[10.0, 8.0],
             logg=8.0,
@@ -551,7 +1238,11 @@ class WDfitter:
             kwargs_for_least_square={
                 'method': 'lm',
             },
-            kwargs_for_emcee={}):
+            kwargs_for_emcee={},
+            nstarts=256,
+            nbest=8,
+            multistart_bounds=None,
+            n_jobs=1):
         '''
         The method to execute a photometric fit. Pure hydrogen and helium
         atmospheres fitting are supported. See `atmosphere_model_reader` for
@@ -597,7 +1288,18 @@ class WDfitter:
         Rv: float (Default: None)
             The choice of Rv, only used if a numerical value is provided.
         ebv: float (Default: None)
-            The magnitude of the E(B-V).
+            The magnitude of the E(B-V). It is the initial guess if fit_ebv
+            is True, 0.1 is used if None.
+        fit_ebv: bool (Default: False)
+            Set to True to fit the E(B-V) as a free parameter, which follows
+            the independent variables in the fitted parameters. The Rv is
+            fixed at 3.1 if it is not fitted and not provided. The best fit
+            magnitudes of the filters in self.best_fit_params are always the
+            intrinsic absolute magnitudes, i.e. without the reddening.
+        fit_Rv: bool (Default: False)
+            Set to True to fit the Rv as well, which follows the E(B-V) in the
+            fitted parameters, Rv is then the initial guess, 3.1 is used if
+            None. Only used if fit_ebv is True.
         independent: list of str (Default: ['Mbol', 'logg']
             Independent variables to be interpolated in the atmosphere model,
             these are parameters to be fitted for.
@@ -614,7 +1316,9 @@ class WDfitter:
         method: str (Default: 'minimize')
             Choose from 'minimize', 'least_square' and 'emcee' for using the
             `scipy.optimize.minimize`, `scipy.optimize.least_square` or the
-            `emcee` respectively.
+            `emcee` respectively. Choose 'multistart' to run the
+            `scipy.optimize.minimize` from the best starting points of a
+            Latin hypercube, see _multistart().
         nwalkers: int (Default: 50)
             Number of walkers (emcee method only).
         nsteps: int (Default: 500)
@@ -636,9 +1340,28 @@ class WDfitter:
             Keyword argument for the minimizer, see `scipy.optimize.minimize`.
         kwargs_for_least_square: dict (Default: {})
             keywprd argument for the minimizer,
-            see `scipy.optimize.least_square`.
+            see `scipy.optimize.least_square`. The Jacobian is computed
+            from the gradient of the interpolators unless 'jac' is provided.
         kwargs_for_emcee: dict (Default: {})
             Keyword argument for the emcee walker.
+        nstarts: int (Default: 256)
+            Number of the starting points of the Latin hypercube (multistart
+            method only).
+        nbest: int (Default: 8)
+            Number of the starting points with the lowest chi2 from which
+            the minimizer is run (multistart method only).
+        multistart_bounds: list of list of float (Default: None)
+            The (lower, upper) bounds of the Latin hypercube of the
+            independent variables, followed by those of the E(B-V) and the Rv
+            if they are fitted (multistart method only). The range of the
+            atmosphere grid, [0, 2] and the range of the Rv of the reddening
+            are used if None. The distance is not sampled, see _multistart().
+        n_jobs: int (Default: 1)
+            The number of threads to fit the atmospheres concurrently, the
+            interpolators are also built in the threads. It is also the number
+            of threads of the minimizers of the multistart method. Set to -1
+            to use all the available cores. The comparison of the atmospheres
+            is stored in self.model_comparison, see _compare_models().
 
         '''
 
@@ -663,13 +1386,30 @@ class WDfitter:
 
             initial_guess = list(initial_guess)
 
-        if (Rv is not None) and (self.rv is None) and (self.interpolated !=
-                                                       interpolated):
+        fit_Rv = fit_ebv and fit_Rv
+
+        if ((Rv is not None) or fit_ebv) and (self.rv is None) and (
+                self.interpolated != interpolated):
 
             self.interp_reddening(filters=filters,
                                   interpolated=interpolated,
                                   kind=kind)
 
+        # The E(B-V) and the Rv are not added if they are already in the
+        # initial guess, e.g. when refining the emcee samples
+        if fit_ebv and (len(initial_guess) == len(independent)):
+
+            initial_guess = initial_guess + [0.1 if ebv is None else ebv]
+
+            if fit_Rv:
+
+                initial_guess = initial_guess + [3.1 if Rv is None else Rv]
+
+        # The Rv is fixed at 3.1 if the E(B-V) is fitted without the Rv
+        if fit_ebv and (Rv is None):
+
+            Rv = 3.1
+
         if distance is None:
 
             initial_guess = initial_guess + [10.]
@@ -678,28 +1418,17 @@ class WDfitter:
 
             distance = None
 
-        # Reuse the interpolator if instructed or possible
+        # Reuse the interpolator if instructed or possible, otherwise they
+        # are built with the fit of each atmosphere
         # The +4 is to account for ['Teff', 'mass', 'Mbol', 'age']
         if reuse_interpolator & (self.interpolator[atmosphere[0]] != []) & (
                 len(self.interpolator[atmosphere[0]]) == (len(filters) + 4)):
 
-            pass
+            interpolator_filters = None
 
         else:
 
-            for j in atmosphere:
-
-                for i in list(filters) + ['Teff', 'mass', 'Mbol', 'age']:
-
-                    # Organise the interpolators by atmosphere type
-                    # and filter, note that the logg is not used
-                    # if independent list contains 'logg'
-                    self.interpolator[j][i] = self._interp_atm(
-                        dependent=i,
-                        atmosphere=j,
-                        independent=independent,
-                        logg=logg,
-                        **kwargs_for_interpolator)
+            interpolator_filters = list(filters)
 
         # Mask the data and interpolator if set to detect None
         if allow_none:
@@ -716,6 +1445,21 @@ class WDfitter:
             mag_errors = np.array(mag_errors, dtype=float)
             filters = np.array(filters)
 
+        if method not in ['minimize', 'least_square', 'emcee', 'multistart']:
+
+            raise ValueError('Unknown method. Please choose from minimize, '
+                             'least_square, emcee and multistart.')
+
+        # Set up the reddening of all the filters before the atmospheres are
+        # fitted, so that the concurrent fits do not set it up at the same
+        # time
+        if ((Rv is not None) or fit_ebv) and any(
+                i not in self.reddening_filters for i in filters):
+
+            self.interp_reddening(filters=filters,
+                                  interpolated=self.interpolated,
+                                  kind=self.reddening_kind)
+
         # Store the fitting params
         self.fitting_params = {
             'atmosphere': atmosphere,
@@ -731,6 +1475,8 @@ class WDfitter:
             'kind': kind,
             'Rv': Rv,
             'ebv': ebv,
+            'fit_ebv': fit_ebv,
+            'fit_Rv': fit_Rv,
             'reuse_interpolator': reuse_interpolator,
             'method': method,
             'nwalkers': nwalkers,
@@ -742,434 +1488,36 @@ class WDfitter:
             'kwargs_for_interpolator': kwargs_for_interpolator,
             'kwargs_for_minimize': kwargs_for_minimize,
             'kwargs_for_least_square': kwargs_for_least_square,
-            'kwargs_for_emcee': kwargs_for_emcee
+            'kwargs_for_emcee': kwargs_for_emcee,
+            'nstarts': nstarts,
+            'nbest': nbest,
+            'multistart_bounds': multistart_bounds,
+            'n_jobs': n_jobs
         }
 
-        interpolator_teff = None
-
-        # If using the scipy.optimize.minimize()
-        if method == 'minimize':
-
-            # Iterative through the list of atmospheres
-            for j in atmosphere:
-
-                if not interpolated:
-
-                    interpolator_teff = self.interpolator[j]['Teff']
-
-                # If distance is not provided, fit for the photometric
-                # distance simultaneously using an assumed logg as provided
-                if distance is None:
-
-                    if Rv is None:
-
-                        self.results[j] = optimize.minimize(
-                            self._chi2_minimization_distance_summed,
-                            initial_guess,
-                            args=(mags, mag_errors,
-                                  [self.interpolator[j][i] for i in filters]),
-                            **kwargs_for_minimize)
-
-                    else:
-
-                        if 'logg' in independent:
-
-                            self.results[j] = optimize.minimize(
-                                self._chi2_minimization_distance_red_summed,
-                                initial_guess,
-                                args=(mags, mag_errors, [
-                                    self.interpolator[j][i] for i in filters
-                                ], interpolator_teff, None, Rv, ebv),
-                                **kwargs_for_minimize)
-
-                        else:
-
-                            self.results[j] = optimize.minimize(
-                                self._chi2_minimization_distance_red_summed,
-                                initial_guess,
-                                args=(mags, mag_errors, [
-                                    self.interpolator[j][i] for i in filters
-                                ], interpolator_teff, logg, Rv, ebv),
-                                **kwargs_for_minimize)
-
-                # If distance is provided, fit here.
-                else:
-
-                    if Rv is None:
-
-                        self.results[j] = optimize.minimize(
-                            self._chi2_minimization_summed,
-                            initial_guess,
-                            args=(mags, mag_errors, distance, distance_err,
-                                  [self.interpolator[j][i] for i in filters]),
-                            **kwargs_for_minimize)
-
-                    else:
-
-                        if 'logg' in independent:
-
-                            self.results[j] = optimize.minimize(
-                                self._chi2_minimization_red_summed,
-                                initial_guess,
-                                args=(mags, mag_errors, distance, distance_err,
-                                      [
-                                          self.interpolator[j][i]
-                                          for i in filters
-                                      ], interpolator_teff, None, Rv, ebv),
-                                **kwargs_for_minimize)
-
-                        else:
-
-                            self.results[j] = optimize.minimize(
-                                self._chi2_minimization_red_summed,
-                                initial_guess,
-                                args=(mags, mag_errors, distance, distance_err,
-                                      [
-                                          self.interpolator[j][i]
-                                          for i in filters
-                                      ], interpolator_teff, logg, Rv, ebv),
-                                **kwargs_for_minimize)
-
-                # Store the chi2
-                self.best_fit_params[j]['chi2'] = self.results[j].fun
-
-                # Save the best fit results
-                if len(independent) == 1:
-
-                    self.best_fit_params[j][independent[0]] = self.results[j].x
-                    self.best_fit_params[j]['logg'] = logg
-
-                else:
-
-                    for k in range(len(independent)):
-
-                        self.best_fit_params[j][
-                            independent[k]] = self.results[j].x[k]
-
-                # Get the fitted parameters, the content of results vary
-                # depending on the choise of minimizer.
-                for i in filters:
-
-                    # the [:2] is to separate the distance from the filters
-                    self.best_fit_params[j][i] = float(self.interpolator[j][i](
-                        self.results[j].x[:2]))
-
-                    if distance is None:
-
-                        self.best_fit_params[j]['distance'] =\
-                            self.results[j].x[-1]
-
-                    else:
-
-                        self.best_fit_params[j]['distance'] = distance
-
-                    self.best_fit_params[j]['dist_mod'] = 5. * (
-                        np.log10(self.best_fit_params[j]['distance']) - 1)
-
-        # If using scipy.optimize.least_square
-        elif method == 'least_square':
-
-            # Iterative through the list of atmospheres
-            for j in atmosphere:
-
-                if not interpolated:
-
-                    interpolator_teff = self.interpolator[j]['Teff']
-
-                # If distance is not provided, fit for the photometric
-                # distance simultaneously using an assumed logg as provided
-                if distance is None:
-
-                    if Rv is None:
-
-                        self.results[j] = optimize.least_squares(
-                            self._chi2_minimization_distance,
-                            initial_guess,
-                            args=(mags, mag_errors,
-                                  [self.interpolator[j][i] for i in filters]),
-                            **kwargs_for_least_square)
-
-                    else:
-
-                        if 'logg' in independent:
-
-                            self.results[j] = optimize.least_squares(
-                                self._chi2_minimization_distance_red,
-                                initial_guess,
-                                args=(mags, mag_errors, [
-                                    self.interpolator[j][i] for i in filters
-                                ], interpolator_teff, None, Rv, ebv),
-                                **kwargs_for_least_square)
-
-                        else:
-
-                            self.results[j] = optimize.least_squares(
-                                self._chi2_minimization_distance_red,
-                                initial_guess,
-                                args=(mags, mag_errors, [
-                                    self.interpolator[j][i] for i in filters
-                                ], interpolator_teff, logg, Rv, ebv),
-                                **kwargs_for_least_square)
-
-                # If distance is provided, fit here.
-                else:
-
-                    if Rv is None:
-
-                        self.results[j] = optimize.least_squares(
-                            self._chi2_minimization,
-                            initial_guess,
-                            args=(mags, mag_errors, distance, distance_err,
-                                  [self.interpolator[j][i] for i in filters]),
-                            **kwargs_for_least_square)
-
-                    else:
-
-                        if 'logg' in independent:
-
-                            self.results[j] = optimize.least_squares(
-                                self._chi2_minimization_red,
-                                initial_guess,
-                                args=(mags, mag_errors, distance, distance_err,
-                                      [
-                                          self.interpolator[j][i]
-                                          for i in filters
-                                      ], interpolator_teff, None, Rv, ebv),
-                                **kwargs_for_least_square)
-
-                        else:
-
-                            self.results[j] = optimize.least_squares(
-                                self._chi2_minimization_red,
-                                initial_guess,
-                                args=(mags, mag_errors, distance, distance_err,
-                                      [
-                                          self.interpolator[j][i]
-                                          for i in filters
-                                      ], interpolator_teff, logg, Rv, ebv),
-                                **kwargs_for_least_square)
-
-                # Store the chi2
-                self.best_fit_params[j]['chi2'] = self.results[j].fun
-
-                # Save the best fit results
-                if len(independent) == 1:
-
-                    self.best_fit_params[j][independent[0]] = self.results[j].x
-                    self.best_fit_params[j]['logg'] = logg
-
-                else:
-
-                    for k in range(len(independent)):
-
-                        self.best_fit_params[j][
-                            independent[k]] = self.results[j].x[k]
-
-                # Get the fitted parameters, the content of results vary
-                # depending on the choise of minimizer.
-                for i in filters:
-
-                    # the [:2] is to separate the distance from the filters
-                    self.best_fit_params[j][i] = float(self.interpolator[j][i](
-                        self.results[j].x[:2]))
-
-                    if distance is None:
-
-                        self.best_fit_params[j]['distance'] =\
-                            self.results[j].x[-1]
-
-                    else:
-
-                        self.best_fit_params[j]['distance'] = distance
-
-                    self.best_fit_params[j]['dist_mod'] = 5. * (
-                        np.log10(self.best_fit_params[j]['distance']) - 1)
-
-        # If using emcee
-        elif method == 'emcee':
+        if method == 'emcee':
 
             _initial_guess = np.array(initial_guess)
-            ndim = len(_initial_guess)
-            nwalkers = int(nwalkers)
             pos = np.random.random(
-                (nwalkers, ndim)) * np.sqrt(_initial_guess) + _initial_guess
-
-            # Iterative through the list of atmospheres
-            for j in atmosphere:
-
-                if not interpolated:
-
-                    interpolator_teff = self.interpolator[j]['Teff']
-
-                # If distance is not provided, fit for the photometric
-                # distance simultaneously using an assumed logg as provided
-                if distance is None:
-
-                    if Rv is None:
-
-                        self.sampler[j] = emcee.EnsembleSampler(
-                            nwalkers,
-                            ndim,
-                            self._log_likelihood_distance,
-                            args=(mags, mag_errors,
-                                  [self.interpolator[j][i] for i in filters]),
-                            **kwargs_for_emcee)
-
-                    else:
+                (int(nwalkers), len(_initial_guess))) * np.sqrt(
+                    _initial_guess) + _initial_guess
 
-                        if 'logg' in independent:
-
-                            self.sampler[j] = emcee.EnsembleSampler(
-                                nwalkers,
-                                ndim,
-                                self._log_likelihood_distance_red,
-                                args=(mags, mag_errors, [
-                                    self.interpolator[j][i] for i in filters
-                                ], interpolator_teff, None, Rv, ebv),
-                                **kwargs_for_emcee)
-
-                        else:
-
-                            self.sampler[j] = emcee.EnsembleSampler(
-                                nwalkers,
-                                ndim,
-                                self._log_likelihood_distance_red,
-                                args=(mags, mag_errors, [
-                                    self.interpolator[j][i] for i in filters
-                                ], interpolator_teff, logg, Rv, ebv),
-                                **kwargs_for_emcee)
-
-                # If distance is provided, fit here.
-                else:
-
-                    if Rv is None:
-
-                        self.sampler[j] = emcee.EnsembleSampler(
-                            nwalkers,
-                            ndim,
-                            self._log_likelihood,
-                            args=(mags, mag_errors, distance, distance_err,
-                                  [self.interpolator[j][i] for i in filters]),
-                            **kwargs_for_emcee)
-
-                    else:
-
-                        self.sampler[j] = emcee.EnsembleSampler(
-                            nwalkers,
-                            ndim,
-                            self._log_likelihood_red,
-                            args=(mags, mag_errors, distance, distance_err,
-                                  [self.interpolator[j][i] for i in filters
-                                   ], interpolator_teff, logg, Rv, ebv),
-                            **kwargs_for_emcee)
-
-                self.sampler[j].run_mcmc(pos, nsteps, progress=progress)
-                self.samples[j] = self.sampler[j].get_chain(discard=nburns,
-                                                            flat=True)
-
-                # Save the best fit results
-                if len(independent) == 1:
-
-                    self.best_fit_params[j][independent[0]] = np.percentile(
-                        self.samples[j][:, 0], [50])
-                    self.best_fit_params[j]['logg'] = logg
-
-                else:
-
-                    for k in range(len(independent)):
-
-                        self.best_fit_params[j][
-                            independent[k]] = np.percentile(
-                                self.samples[j][:, k], [50])
-
-                if refine:
-
-                    if distance is None:
-
-                        # setting distance to infinity so that it will be
-                        # turned back to None after the line appending to the
-                        # intial_guess when distance has to be found
-                        self.fit(filters=filters,
-                                 mags=mags,
-                                 mag_errors=mag_errors,
-                                 allow_none=allow_none,
-                                 atmosphere=atmosphere,
-                                 logg=logg,
-                                 independent=independent,
-                                 reuse_interpolator=True,
-                                 method='minimize',
-                                 distance=np.inf,
-                                 distance_err=None,
-                                 initial_guess=np.percentile(self.samples[j],
-                                                             [50],
-                                                             axis=0),
-                                 Rv=Rv,
-                                 ebv=ebv,
-                                 kwargs_for_minimize={
-                                     'bounds':
-                                     np.percentile(self.samples[j],
-                                                   refine_bounds,
-                                                   axis=0).T
-                                 })
-
-                    else:
-
-                        self.fit(filters=filters,
-                                 mags=mags,
-                                 mag_errors=mag_errors,
-                                 allow_none=allow_none,
-                                 atmosphere=atmosphere,
-                                 logg=logg,
-                                 independent=independent,
-                                 reuse_interpolator=True,
-                                 method='minimize',
-                                 distance=distance,
-                                 distance_err=distance_err,
-                                 initial_guess=np.percentile(self.samples[j],
-                                                             [50],
-                                                             axis=0),
-                                 Rv=Rv,
-                                 ebv=ebv,
-                                 kwargs_for_minimize={
-                                     'bounds':
-                                     np.percentile(self.samples[j],
-                                                   refine_bounds,
-                                                   axis=0).T
-                                 })
-
-                # Get the fitted parameters, the content of results vary
-                # depending on the choise of minimizer.
-                for i in filters:
-
-                    if len(independent) == 1:
-
-                        self.best_fit_params[j][i] = float(
-                            self.interpolator[j][i](
-                                self.best_fit_params[j][independent[0]]))
-
-                    else:
-
-                        self.best_fit_params[j][i] = float(
-                            self.interpolator[j][i](
-                                self.best_fit_params[j][independent[0]],
-                                self.best_fit_params[j][independent[1]]))
-
-                    if distance is None:
-
-                        self.best_fit_params[j]['distance'] =\
-                            np.percentile(self.samples[j][:, -1], [50])
-
-                    else:
+        else:
 
-                        self.best_fit_params[j]['distance'] = distance
+            pos = None
 
-                    self.best_fit_params[j]['dist_mod'] = 5. * (
-                        np.log10(self.best_fit_params[j]['distance']) - 1)
+        fit_atmosphere = partial(self._fit_atmosphere,
+                                 fitting_params=dict(self.fitting_params),
+                                 interpolator_filters=interpolator_filters,
+                                 pos=pos)
 
-        else:
+        # The atmospheres are fitted in threads because the interpolators
+        # cannot be sent to other processes
+        chi2 = self._map(fit_atmosphere, atmosphere, n_jobs)
 
-            ValueError('Unknown method. Please choose from minimize, '
-                       'least_square and emcee.')
+        self.model_comparison = self._compare_models(atmosphere, chi2,
+                                                     len(initial_guess),
+                                                     len(mags))
 
         # Save the pivot wavelength and magnitude for each filter
         self.pivot_wavelengths = []
@@ -1254,6 +1602,14 @@ class WDfitter:
 
             labels = self.fitting_params['independent']
 
+            if self.fitting_params['fit_ebv']:
+
+                labels = labels + ['ebv']
+
+            if self.fitting_params['fit_Rv']:
+
+                labels = labels + ['Rv']
+
             if self.fitting_params['distance'] is None:
 
                 labels = labels + ['distance']
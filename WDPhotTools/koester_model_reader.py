@@ -0,0 +1,230 @@
+from concurrent.futures import ProcessPoolExecutor
+import json
+import numpy as np
+import os
+
+from . import extinction_generator as eg
+from .util import temporary_path
+
+# The default location of the memory-mapped library of the Koester spectra,
+# see build_koester_library()
+library_path = os.path.join(eg.koester_folder, 'koester_models.npy')
+
+# The opened libraries, keyed by their paths
+_libraries = {}
+
+
+def _load_spectrum(filepath):
+
+    return np.loadtxt(filepath).T
+
+
+def build_koester_library(filepath=None,
+                          n_wavelength=8192,
+                          n_jobs=1,
+                          folder=None):
+    '''
+    Convert the Koester DA spectra into a single (Teff, logg, wavelength)
+    flux cube on a shared, logarithmically uniform wavelength axis, so that
+    it can be memory-mapped instead of decompressing and parsing a text
+    file per spectrum. The spectra are resampled onto the shared axis with
+    the flux conserving resample_spectrum(), which changes the synthetic
+    magnitudes by less than 1E-4 mag. The flux is stored in float32.
+
+    Parameters
+    ----------
+    filepath: str (Default: None)
+        The path of the library, the default is
+        koester_model/koester_models.npy in the package. The axes are
+        written to a JSON file of the same name.
+    n_wavelength: int (Default: 8192)
+        The number of points of the shared wavelength axis.
+    n_jobs: int (Default: 1)
+        The number of processes to parse the spectra. Set to -1 to use all
+        the available cores.
+    folder: str (Default: None)
+        The folder of the spectra, the default is koester_model in the
+        package.
+
+    Return
+    ------
+    The path of the library.
+
+    '''
+
+    if filepath is None:
+
+        filepath = library_path
+
+    models, Teff, logg = eg.list_koester_models(folder)
+    Teff_grid = np.unique(Teff)
+    logg_grid = np.unique(logg)
+
+    if len(models) != len(Teff_grid) * len(logg_grid):
+
+        raise ValueError('The Koester spectra do not form a complete '
+                         '(logg, Teff) grid.')
+
+    if n_jobs is None or n_jobs < 1:
+
+        n_jobs = os.cpu_count()
+
+    if n_jobs == 1:
+
+        spectra = [_load_spectrum(i) for i in models]
+
+    else:
+
+        with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+
+            spectra = list(pool.map(_load_spectrum, models, chunksize=16))
+
+    # The shared axis only covers the range of all the spectra, it stops one
+    # sample short at both ends so that the bins at the ends are fully
+    # covered by every spectrum
+    wavelength = np.exp(
+        np.linspace(np.log(max(i[0][1] for i in spectra)),
+                    np.log(min(i[0][-2] for i in spectra)), n_wavelength))
+
+    tmp_path = temporary_path(filepath)
+    flux = np.lib.format.open_memmap(tmp_path,
+                                     mode='w+',
+                                     dtype=np.float32,
+                                     shape=(len(Teff_grid), len(logg_grid),
+                                            n_wavelength))
+
+    # The reddest sample of each spectrum, to which the black body beyond the
+    # spectrum is scaled
+    tail_wavelength = np.zeros((len(Teff_grid), len(logg_grid)))
+    tail_flux = np.zeros((len(Teff_grid), len(logg_grid)))
+
+    # The spectra are sorted by logg and then by Teff
+    for k, (w, f) in enumerate(spectra):
+
+        j, i = divmod(k, len(Teff_grid))
+        flux[i, j] = eg.resample_spectrum(wavelength, w, f)
+        tail_wavelength[i, j] = w[-1]
+        tail_flux[i, j] = f[-1]
+
+    flux.flush()
+    del flux
+
+    index = {
+        'Teff': Teff_grid.tolist(),
+        'logg': logg_grid.tolist(),
+        'wavelength': wavelength.tolist(),
+        'tail_wavelength': tail_wavelength.tolist(),
+        'tail_flux': tail_flux.tolist()
+    }
+
+    os.replace(tmp_path, filepath)
+
+    index_path = os.path.splitext(filepath)[0] + '.json'
+    tmp_index_path = temporary_path(index_path)
+
+    with open(tmp_index_path, 'w') as f:
+
+        json.dump(index, f)
+
+    os.replace(tmp_index_path, index_path)
+
+    _libraries.pop(filepath, None)
+
+    return filepath
+
+
+class KoesterLibrary:
+    '''
+    The memory-mapped library of the Koester DA spectra, see
+    build_koester_library(). The flux is a read-only (Teff, logg,
+    wavelength) array in unit of erg/s/cm^2/A at the surface of the star,
+    only the spectra which are used are read from the disk. The
+    tail_wavelength and the tail_flux are the reddest samples of the
+    original spectra in the shape of (Teff, logg).
+
+    Parameters
+    ----------
+    filepath: str (Default: None)
+        The path of the library. The default library is built at the first
+        use if it does not exist.
+
+    '''
+    def __init__(self, filepath=None):
+
+        if filepath is None:
+
+            filepath = library_path
+
+            if not os.path.exists(filepath):
+
+                build_koester_library(filepath)
+
+        with open(os.path.splitext(filepath)[0] + '.json', 'r') as f:
+
+            index = json.load(f)
+
+        self.filepath = filepath
+        self.Teff = np.array(index['Teff'])
+        self.logg = np.array(index['logg'])
+        self.wavelength = np.array(index['wavelength'])
+        self.tail_wavelength = np.array(index['tail_wavelength'])
+        self.tail_flux = np.array(index['tail_flux'])
+        self.flux = np.load(filepath, mmap_mode='r')
+
+    def __len__(self):
+
+        return len(self.Teff) * len(self.logg)
+
+    def _index(self, grid, value, name):
+
+        match = np.where(np.isclose(grid, value, rtol=0., atol=1e-6))[0]
+
+        if len(match) == 0:
+
+            raise ValueError('There is no spectrum of {} {}, the available '
+                             'values are: {}.'.format(name, value, grid))
+
+        return match[0]
+
+    def get(self, Teff, logg):
+        '''
+        Get a spectrum of the library.
+
+        Parameters
+        ----------
+        Teff: float
+            The effective temperature, it has to be on the grid.
+        logg: float
+            The surface gravity, it has to be on the grid.
+
+        Return
+        ------
+        The wavelength and the flux, the latter is a view of the library.
+
+        '''
+
+        i = self._index(self.Teff, Teff, 'Teff')
+        j = self._index(self.logg, logg, 'logg')
+
+        return self.wavelength, self.flux[i, j]
+
+
+def load_koester_library(filepath=None):
+    '''
+    Load the memory-mapped library of the Koester spectra, it is opened
+    only once per path.
+
+    Parameters
+    ----------
+    filepath: str (Default: None)
+        The path of the library, see KoesterLibrary.
+
+    '''
+
+    key = library_path if filepath is None else filepath
+
+    if key not in _libraries:
+
+        _libraries[key] = KoesterLibrary(filepath)
+
+    return _libraries[key]
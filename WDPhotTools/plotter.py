@@ -5,7 +5,7 @@ import os
 from .atmosphere_model_reader import atm_reader
 from .cooling_model_reader import list_cooling_model as lcm
 from .cooling_model_reader import list_cooling_parameters as lcp
-from .cooling_model_reader import get_cooling_model
+from .cooling_model_reader import get_cooling_tracks
 
 
 class Dummy:
@@ -328,17 +328,18 @@ def plot_cooling_model(model='montreal_co_da_20',
         8. 'lpcode_co_da_15_z00003' - Althaus et al. 2015 DA Z=0.00003
         9. 'lpcode_co_da_15_z0001' - Althaus et al. 2015 DA Z=0.0001
         10. 'lpcode_co_da_15_z0005' - Althaus et al. 2015 DA Z=0.0005
-        11. 'lpcode_co_da_17_y04' - Althaus et al. 2017 DB Y=0.4
-        12. 'lpcode_co_db_17' - Camisassa et al. 2017 DB
-        13. 'basti_co_da_10' - Salari et al. 2010 CO DA
-        14. 'basti_co_db_10' - Salari et al. 2010 CO DB
-        15. 'basti_co_da_10_nps' - Salari et al. 2010 CO DA, no phase separation
-        16. 'basti_co_db_10_nps' - Salari et al. 2010 CO DB, no phase separation
-        17. 'lpcode_one_da_07' - Althaus et al. 2007 ONe DA
-        18. 'lpcode_one_da_19' - Camisassa et al. 2019 ONe DA
-        19. 'lpcode_one_db_19' - Camisassa et al. 2019 ONe DB
-        20. 'mesa_one_da_18' - Lauffer et al. 2018 ONe DA
-        21. 'mesa_one_db_18' - Lauffer et al. 2018 ONe DB
+        11. 'lpcode_co_db_17_z00005' - Althaus et al. 2017 DB Y=0.4
+        12. 'lpcode_co_db_17_z0001' - Althaus et al. 2017 DB Y=0.4
+        13. 'lpcode_co_db_17' - Camisassa et al. 2017 DB
+        14. 'basti_co_da_10' - Salari et al. 2010 CO DA
+        15. 'basti_co_db_10' - Salari et al. 2010 CO DB
+        16. 'basti_co_da_10_nps' - Salari et al. 2010 CO DA, no phase separation
+        17. 'basti_co_db_10_nps' - Salari et al. 2010 CO DB, no phase separation
+        18. 'lpcode_one_da_07' - Althaus et al. 2007 ONe DA
+        19. 'lpcode_one_da_19' - Camisassa et al. 2019 ONe DA
+        20. 'lpcode_one_db_19' - Camisassa et al. 2019 ONe DB
+        21. 'mesa_one_da_18' - Lauffer et al. 2018 ONe DA
+        22. 'mesa_one_db_18' - Lauffer et al. 2018 ONe DB
 
         The naming convention follows this format:
         [model]_[core composition]_[atmosphere]_[publication year]
@@ -354,9 +355,9 @@ def plot_cooling_model(model='montreal_co_da_20',
         Set to True to log the abscissa.
     log_y: bool (Default: True)
         Set to True to log the ordinate.
-    mass_range: str (Default: 'all')
-        The mass range in which the cooling model should return.
-        The ranges are defined as <0.5, 0.5-1.0 and >1.0 solar masses.
+    mass: str, float or list of float (Default: 'all')
+        The masses of the tracks to be plotted, or 'all'. Only the tracks
+        of the given masses are parsed.
     figsize: array of size 2 (Default: (8, 8))
         Set the dimension of the figure.
     invert_xaxis: bool (Default: False)
@@ -385,8 +386,9 @@ def plot_cooling_model(model='montreal_co_da_20',
 
     '''
 
-    _mass_list, cooling_model, column_names, column_units = get_cooling_model(
-        model)
+    cooling_tracks = get_cooling_tracks(model)
+    column_names = cooling_tracks.column_names
+    column_units = cooling_tracks.column_units
 
     x_name = column_names[x]
 
@@ -412,24 +414,16 @@ def plot_cooling_model(model='montreal_co_da_20',
 
         fig, ax = _preset_figure(x_name, y_name, title, figsize)
 
-    if mass == 'all':
-
-        mass_list = _mass_list
-
-    else:
-
-        mass_list = mass
-
-    x_out = []
-    y_out = []
+    # Only parse the tracks and the columns to be plotted
+    mass_list, offsets, tracks = cooling_tracks.get_flat(
+        mass=mass, columns=list(dict.fromkeys([x, y])))
 
     for i, m in enumerate(mass_list):
 
-        x_out.append(cooling_model[i][x])
-        y_out.append(cooling_model[i][y])
+        track = tracks[offsets[i]:offsets[i + 1]]
 
         label = 'Mass = {:.2f}'.format(m)
-        ax.plot(x_out[i], y_out[i], label=label, **kwargs_for_plot)
+        ax.plot(track[x], track[y], label=label, **kwargs_for_plot)
 
     if log_x:
 
@@ -1,9 +1,10 @@
+import glob
 import itertools
 import numpy as np
 import os
 from scipy.interpolate import RegularGridInterpolator
 
-from .util import GlobalSpline2D
+from .util import GlobalSpline2D, temporary_path
 
 folder_path = os.path.dirname(os.path.abspath(__file__))
 
@@ -26,6 +27,304 @@ def reddening_vector_interpolated(kind='cubic'):
     return GlobalSpline2D(x, y, z, kind=kind)
 
 
+# The grid of the extinction tables of the filters
+Teff_grid = np.array([
+    5000., 5250., 5500., 5750., 6000., 6250., 6500., 6750., 7000., 7250.,
+    7500., 7750., 8000., 8250., 8500., 8750., 9000., 9250., 9500., 9750.,
+    10000., 10250., 10500., 10750., 11000., 11250., 11500., 11750., 12000.,
+    12250., 12500., 12750., 13000., 13250., 13500., 13750., 14000., 14250.,
+    14500., 14750., 15000., 15250., 15500., 15750., 16000., 16250., 16500.,
+    16750., 17000., 17250., 17500., 17750., 18000., 18250., 18500., 18750.,
+    19000., 19250., 19500., 19750., 20000., 21000., 22000., 23000., 24000.,
+    25000., 26000., 27000., 28000., 29000., 30000., 32000., 34000., 35000.,
+    36000., 38000., 40000., 45000., 50000., 60000., 70000., 80000.
+])
+logg_grid = np.array(
+    [6.5, 6.75, 7., 7.25, 7.5, 7.75, 8., 8.25, 8.5, 8.75, 9., 9.25, 9.5])
+Rv_grid = np.array([2.1, 2.6, 3.1, 3.6, 4.1, 4.6, 5.1])
+
+reddening_cube_path = os.path.join(folder_path, 'extinction',
+                                   'reddening_cube.npz')
+
+_reddening_cubes = {}
+
+
+def _list_extinction_tables():
+    '''
+    List the filters of which the extinction table is available.
+
+    '''
+
+    return sorted(
+        os.path.basename(i)[:-4]
+        for i in glob.glob(os.path.join(folder_path, 'extinction', '*.csv'))
+        if os.path.basename(i) != 'schlafly12.csv')
+
+
+def build_reddening_cube(filepath=None):
+    '''
+    Pack the extinction tables of all the filters into a single
+    (filter, logg, Teff, Rv) cube and save it as a binary npz file, so that
+    it can be loaded in one read instead of parsing a CSV file per filter.
+
+    Parameters
+    ----------
+    filepath: str (Default: None)
+        The path of the cube, the default is extinction/reddening_cube.npz
+        in the package.
+
+    Return
+    ------
+    The path of the cube.
+
+    '''
+
+    if filepath is None:
+
+        filepath = reddening_cube_path
+
+    filters = _list_extinction_tables()
+    shape = (len(logg_grid), len(Teff_grid), len(Rv_grid))
+    data = np.zeros((len(filters), ) + shape)
+
+    for i, f in enumerate(filters):
+
+        data[i] = np.loadtxt(os.path.join(folder_path, 'extinction',
+                                          '{}.csv'.format(f)),
+                             delimiter=',').reshape(shape)
+
+    tmp_path = temporary_path(filepath)
+
+    with open(tmp_path, 'wb') as f:
+
+        np.savez(f,
+                 filters=np.array(filters),
+                 logg=logg_grid,
+                 Teff=Teff_grid,
+                 Rv=Rv_grid,
+                 data=data)
+
+    os.replace(tmp_path, filepath)
+    _reddening_cubes.pop(filepath, None)
+
+    return filepath
+
+
+def append_to_reddening_cube(filter, table, filepath=None):
+    '''
+    Append the extinction table of a filter to the cube without rebuilding
+    the other filters, the filter is replaced if it is already in the cube.
+
+    Parameters
+    ----------
+    filter: str
+        The name of the filter.
+    table: array of float
+        The A/E(B-V) in the shape of (nlogg * nTeff, nRv), in the order of
+        the extinction tables.
+    filepath: str (Default: None)
+        The path of the cube, the default is extinction/reddening_cube.npz
+        in the package. It is built from the extinction tables first if it
+        does not exist.
+
+    '''
+
+    if filepath is None:
+
+        filepath = reddening_cube_path
+
+    if not os.path.exists(filepath):
+
+        build_reddening_cube(filepath)
+
+    with np.load(filepath) as npz:
+
+        cube = {k: npz[k] for k in npz.files}
+
+    table = np.asarray(table, dtype=np.float64).reshape(
+        1, len(cube['logg']), len(cube['Teff']), len(cube['Rv']))
+    keep = cube['filters'] != filter
+    cube['filters'] = np.append(cube['filters'][keep], filter)
+    cube['data'] = np.concatenate((cube['data'][keep], table))
+
+    tmp_path = temporary_path(filepath)
+
+    with open(tmp_path, 'wb') as f:
+
+        np.savez(f, **cube)
+
+    os.replace(tmp_path, filepath)
+    _reddening_cubes.pop(filepath, None)
+
+    return filepath
+
+
+def _reddening_cube_is_stale(filepath):
+    '''
+    Check if the cube is missing or older than any of the extinction
+    tables.
+
+    '''
+
+    if not os.path.exists(filepath):
+
+        return True
+
+    mtime = os.path.getmtime(filepath)
+
+    return any(
+        os.path.getmtime(
+            os.path.join(folder_path, 'extinction', '{}.csv'.format(f))) >
+        mtime for f in _list_extinction_tables())
+
+
+class ReddeningCube:
+    '''
+    The A/E(B-V) of the filters on the (logg, Teff, Rv) grid of the
+    extinction tables, held in a single (filter, logg, Teff, Rv) cube. The
+    cube is evaluated for all the filters and any number of (logg, Teff, Rv)
+    points in one call with a vectorised trilinear interpolation, which is
+    identical to the RegularGridInterpolator of reddening_vector_filter().
+
+    Parameters
+    ----------
+    filters: list of str (Default: None)
+        The filters to be evaluated, in the order of the output. All the
+        available filters are used if None.
+    filepath: str (Default: None)
+        The path of the binary cube, see build_reddening_cube(). The cube
+        is (re)built if it is missing or older than the extinction tables.
+
+    '''
+    def __init__(self, filters=None, filepath=None):
+
+        if filepath is None:
+
+            filepath = reddening_cube_path
+
+        if _reddening_cube_is_stale(filepath):
+
+            try:
+
+                build_reddening_cube(filepath)
+
+            except OSError:
+
+                # Build it in memory if the path is read-only
+                filepath = None
+
+        if filepath is None:
+
+            filters_all = _list_extinction_tables()
+            data = {
+                'filters': np.array(filters_all),
+                'logg': logg_grid,
+                'Teff': Teff_grid,
+                'Rv': Rv_grid,
+                'data': np.array([
+                    reddening_vector_filter(f).values for f in filters_all
+                ])
+            }
+
+        else:
+
+            if filepath not in _reddening_cubes:
+
+                with np.load(filepath) as npz:
+
+                    _reddening_cubes[filepath] = {
+                        k: npz[k]
+                        for k in npz.files
+                    }
+
+            data = _reddening_cubes[filepath]
+
+        self.logg = data['logg']
+        self.Teff = data['Teff']
+        self.Rv = data['Rv']
+
+        if filters is None:
+
+            self.filters = list(data['filters'])
+            self.data = data['data']
+
+        else:
+
+            self.filters = list(np.asarray(filters).reshape(-1))
+            filters_all = list(data['filters'])
+
+            for f in self.filters:
+
+                if f not in filters_all:
+
+                    raise ValueError(
+                        'There is no extinction table of {}.'.format(f))
+
+            self.data = data['data'][[
+                filters_all.index(f) for f in self.filters
+            ]]
+
+    def __len__(self):
+
+        return len(self.filters)
+
+    def __call__(self, logg, Teff, Rv):
+        '''
+        Evaluate the A/E(B-V) of all the filters.
+
+        Parameters
+        ----------
+        logg: float or array of float
+            The surface gravity.
+        Teff: float or array of float
+            The effective temperature.
+        Rv: float or array of float
+            The extinction in V per unit of A_V, i.e. A_V/E(B - V).
+
+        Return
+        ------
+        The A/E(B-V) in the broadcasted shape of the input with the filters
+        along the last axis, NaN outside the grid.
+
+        '''
+
+        logg, Teff, Rv = np.broadcast_arrays(
+            np.asarray(logg, dtype=np.float64),
+            np.asarray(Teff, dtype=np.float64),
+            np.asarray(Rv, dtype=np.float64))
+        shape = logg.shape
+
+        index = []
+        weight = []
+        inside = np.ones(logg.size, dtype=bool)
+
+        for x, grid in zip((logg, Teff, Rv), (self.logg, self.Teff, self.Rv)):
+
+            x = x.reshape(-1)
+            i = np.clip(
+                np.searchsorted(grid, x, side='right') - 1, 0,
+                len(grid) - 2)
+            index.append(i)
+            weight.append((x - grid[i]) / (grid[i + 1] - grid[i]))
+            inside &= (x >= grid[0]) & (x <= grid[-1])
+
+        i, j, k = index
+        u, v, w = weight
+        data = self.data
+
+        output = (1. - u) * (
+            (1. - v) * ((1. - w) * data[:, i, j, k] + w * data[:, i, j, k + 1])
+            + v * ((1. - w) * data[:, i, j + 1, k] +
+                   w * data[:, i, j + 1, k + 1])) + u * (
+                       (1. - v) * ((1. - w) * data[:, i + 1, j, k] +
+                                   w * data[:, i + 1, j, k + 1]) + v *
+                       ((1. - w) * data[:, i + 1, j + 1, k] +
+                        w * data[:, i + 1, j + 1, k + 1]))
+        output[:, ~inside] = np.nan
+
+        return output.T.reshape(shape + (len(self.filters), ))
+
+
 def reddening_vector_filter(filter):
 
     filepath = os.path.join(folder_path,
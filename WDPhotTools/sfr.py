@@ -0,0 +1,260 @@
+from abc import ABC, abstractmethod
+import math
+import numpy as np
+
+
+class SFR(ABC):
+    '''
+    The base class of the star formation rate (SFR) as a function of the
+    lookback time in unit of year (i.e. today is 0, age of the universe is
+    ~13.8E9). The SFR can be evaluated on a float or an array of any shape,
+    integrated over any lookback time intervals, and it reports the times at
+    which it is not smooth so that the integrator can put its sampling points
+    there. Two SFRs can be added together to form a composite SFR.
+
+    A subclass has to implement _evaluate(), the SFR on an array of lookback
+    times, and _antiderivative(), the integral of the SFR from the lookback
+    time 0 on an array of lookback times.
+
+    '''
+
+    # The lookback times at which the SFR (or its derivatives) is
+    # discontinuous
+    breakpoints = np.array(())
+
+    def __call__(self, time):
+
+        if np.ndim(time) == 0:
+
+            return self._evaluate_scalar(float(time))
+
+        return self._evaluate(np.asarray(time, dtype=np.float64))
+
+    def __add__(self, other):
+
+        return CompositeSFR([self, other])
+
+    def _evaluate_scalar(self, time):
+
+        return float(self._evaluate(np.array([time]))[0])
+
+    @abstractmethod
+    def _evaluate(self, time):
+
+        pass
+
+    @abstractmethod
+    def _antiderivative(self, time):
+
+        pass
+
+    def integral(self, t1, t2):
+        '''
+        Integrate the SFR between two lookback times.
+
+        Parameters
+        ----------
+        t1: float or array of float
+            The lower limit of the lookback time.
+        t2: float or array of float
+            The upper limit of the lookback time.
+
+        Return
+        ------
+        The integrated SFR, in the broadcasted shape of t1 and t2.
+
+        '''
+
+        t1 = np.asarray(t1, dtype=np.float64)
+        t2 = np.asarray(t2, dtype=np.float64)
+
+        return self._antiderivative(t2) - self._antiderivative(t1)
+
+
+class TophatSFR(SFR):
+    '''
+    A constant star formation rate between the two lookback times, zero
+    otherwise.
+
+    >>>    SFR
+    >>>    ^                x-------x
+    >>>    |                |       |
+    >>>    |                |       |
+    >>>    |    x-----------x       x-----------------x
+    >>>                  t_end     t_start
+    >>>                Lookback Time
+
+    Parameters
+    ----------
+    t_start: float
+        The lookback time of the beginning of the star formation.
+    t_end: float (Default: 0.)
+        The lookback time of the end of the star formation.
+    rate: float (Default: 1.)
+        The star formation rate.
+
+    '''
+    def __init__(self, t_start, t_end=0., rate=1.):
+
+        if t_end > t_start:
+
+            raise ValueError('t_end has to be more recent than t_start, i.e. '
+                             'a smaller lookback time.')
+
+        self.t_start = float(t_start)
+        self.t_end = float(t_end)
+        self.rate = float(rate)
+        self.breakpoints = np.array((self.t_end, self.t_start))
+
+    def _evaluate_scalar(self, time):
+
+        if self.t_end <= time <= self.t_start:
+
+            return self.rate
+
+        return 0.
+
+    def _evaluate(self, time):
+
+        return np.where((time >= self.t_end) & (time <= self.t_start),
+                        self.rate, 0.)
+
+    def _antiderivative(self, time):
+
+        return self.rate * (np.clip(time, self.t_end, self.t_start) -
+                            self.t_end)
+
+
+class ExponentialSFR(SFR):
+    '''
+    An exponentially decaying star formation rate which started at the
+    lookback time `age`, zero before that.
+
+    Parameters
+    ----------
+    age: float
+        The lookback time of the beginning of the star formation.
+    mean_lifetime: float (Default: 3E9)
+        The SFR drops by a factor of e after every mean_lifetime.
+    rate: float (Default: 1.)
+        The initial star formation rate.
+
+    '''
+    def __init__(self, age, mean_lifetime=3e9, rate=1.):
+
+        self.age = float(age)
+        self.mean_lifetime = float(mean_lifetime)
+        self.rate = float(rate)
+        self.breakpoints = np.array((0., self.age))
+
+    def _evaluate_scalar(self, time):
+
+        if 0. <= time <= self.age:
+
+            return self.rate * math.exp((time - self.age) / self.mean_lifetime)
+
+        return 0.
+
+    def _evaluate(self, time):
+
+        mask = (time >= 0.) & (time <= self.age)
+        sfr = np.zeros_like(time)
+        sfr[mask] = self.rate * np.exp(
+            (time[mask] - self.age) / self.mean_lifetime)
+
+        return sfr
+
+    def _antiderivative(self, time):
+
+        return self.rate * self.mean_lifetime * np.exp(
+            (np.clip(time, 0., self.age) - self.age) / self.mean_lifetime)
+
+
+class TabulatedSFR(SFR):
+    '''
+    A star formation rate linearly interpolated from a table, zero outside
+    the tabulated range.
+
+    Parameters
+    ----------
+    time: array of float
+        The lookback times.
+    sfr: array of float
+        The star formation rate at the given lookback times.
+
+    '''
+    def __init__(self, time, sfr):
+
+        time = np.asarray(time, dtype=np.float64).reshape(-1)
+        sfr = np.asarray(sfr, dtype=np.float64).reshape(-1)
+
+        if len(time) != len(sfr):
+
+            raise ValueError('time and sfr have to be of the same size.')
+
+        order = np.argsort(time)
+        self.time = time[order]
+        self.sfr = sfr[order]
+        self.breakpoints = self.time
+
+        # Cumulative integral at the tabulated times
+        self._cumulative = np.concatenate(
+            ([0.],
+             np.cumsum(
+                 np.diff(self.time) * (self.sfr[1:] + self.sfr[:-1]) / 2.)))
+
+    def _evaluate(self, time):
+
+        return np.interp(time, self.time, self.sfr, left=0., right=0.)
+
+    def _antiderivative(self, time):
+
+        time = np.clip(time, self.time[0], self.time[-1])
+        idx = np.clip(
+            np.searchsorted(self.time, time, side='right') - 1, 0,
+            len(self.time) - 2)
+        dt = time - self.time[idx]
+        slope = (self.sfr[idx + 1] - self.sfr[idx]) / (self.time[idx + 1] -
+                                                       self.time[idx])
+
+        return self._cumulative[idx] + self.sfr[idx] * dt + slope * dt**2. / 2.
+
+
+class CompositeSFR(SFR):
+    '''
+    The sum of a list of star formation rates, e.g. a series of bursts.
+
+    Parameters
+    ----------
+    components: list of SFR
+        The star formation rates to be summed.
+
+    '''
+    def __init__(self, components):
+
+        self.components = []
+
+        for c in components:
+
+            if isinstance(c, CompositeSFR):
+
+                self.components += c.components
+
+            else:
+
+                self.components.append(c)
+
+        self.breakpoints = np.unique(
+            np.concatenate([c.breakpoints for c in self.components]))
+
+    def _evaluate_scalar(self, time):
+
+        return sum(c._evaluate_scalar(time) for c in self.components)
+
+    def _evaluate(self, time):
+
+        return sum(c._evaluate(time) for c in self.components)
+
+    def _antiderivative(self, time):
+
+        return sum(c._antiderivative(time) for c in self.components)
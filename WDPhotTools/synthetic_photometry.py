@@ -0,0 +1,471 @@
+import numpy as np
+import os
+
+from . import extinction_generator as eg
+from .koester_model_reader import load_koester_library
+from .reddening import append_to_reddening_cube
+from .util import temporary_path
+
+folder_path = os.path.dirname(os.path.abspath(__file__))
+
+# The default location of the synthetic magnitudes of the Koester spectra
+synthetic_photometry_path = os.path.join(folder_path, 'wd_photometry',
+                                         'synthetic_photometry.npz')
+
+# The speed of light in Angstrom per second
+c = 2.99792458e18
+
+# The nominal solar mass parameter and the parsec in cgs
+GM_sun = 1.3271244e26
+pc = 3.0856775814913673e18
+
+
+def ab_magnitude(photon, wavelength, weight):
+    '''
+    Convert the photon counts of a spectrum through a filter into the AB
+    magnitude, i.e. -2.5 log10 of the photon weighted mean flux density in
+    unit of erg/s/cm^2/Hz minus 48.60.
+
+    Parameters
+    ----------
+    photon: float or array of float
+        The integral of the flux density in unit of erg/s/cm^2/A times the
+        wavelength and the response of the filter.
+    wavelength: array of float
+        The wavelength of the response curve.
+    weight: array of float
+        The response weighted by the wavelength bins, see
+        extinction_generator.load_filter().
+
+    '''
+
+    return -2.5 * np.log10(
+        np.asarray(photon) / np.sum(weight * c / wavelength)) - 48.60
+
+
+def absolute_magnitude(magnitude, mass, logg):
+    '''
+    Convert the synthetic surface magnitudes into the absolute magnitudes
+    of a white dwarf of the given mass and surface gravity, i.e. of a star
+    of radius sqrt(G M / g) at 10 pc.
+
+    Parameters
+    ----------
+    magnitude: float or array of float
+        The synthetic surface magnitude.
+    mass: float or array of float
+        The mass in unit of solar mass.
+    logg: float or array of float
+        The surface gravity in cgs.
+
+    '''
+
+    radius = np.sqrt(GM_sun * np.asarray(mass) / 10.**np.asarray(logg))
+
+    return np.asarray(magnitude) - 5. * np.log10(radius / (10. * pc))
+
+
+def pivot_wavelength(wavelength, weight):
+    '''
+    The pivot wavelength of a filter, sqrt(int(R lambda) / int(R / lambda)).
+
+    Parameters
+    ----------
+    wavelength: array of float
+        The wavelength of the response curve.
+    weight: array of float
+        The response weighted by the wavelength bins, see
+        extinction_generator.load_filter().
+
+    '''
+
+    return np.sqrt(np.sum(weight * wavelength) / np.sum(weight / wavelength))
+
+
+def load_synthetic_photometry(filepath=None):
+    '''
+    Load the synthetic surface magnitudes of the Koester spectra.
+
+    Parameters
+    ----------
+    filepath: str (Default: None)
+        The path of the synthetic photometry, the default is
+        wd_photometry/synthetic_photometry.npz in the package.
+
+    Return
+    ------
+    A dictionary of the 'filters', their 'pivot_wavelength', the 'logg',
+    the 'Teff' and the magnitudes 'data' in the shape of
+    (nfilter, nlogg, nTeff), None if there is no synthetic photometry.
+
+    '''
+
+    if filepath is None:
+
+        filepath = synthetic_photometry_path
+
+    if not os.path.exists(filepath):
+
+        return None
+
+    with np.load(filepath) as npz:
+
+        return {k: npz[k] for k in npz.files}
+
+
+def _save_synthetic_photometry(photometry, filepath):
+
+    tmp_path = temporary_path(filepath)
+
+    with open(tmp_path, 'wb') as f:
+
+        np.savez(f, **photometry)
+
+    os.replace(tmp_path, filepath)
+
+
+def append_synthetic_photometry(filter,
+                                magnitude,
+                                logg,
+                                Teff,
+                                filepath=None,
+                                wavelength=0.):
+    '''
+    Append the synthetic surface magnitudes of a filter to the synthetic
+    photometry without recomputing the other filters, the filter is
+    replaced if it is already there.
+
+    Parameters
+    ----------
+    filter: str
+        The name of the filter.
+    magnitude: array of float
+        The magnitudes in the shape of (nlogg, nTeff).
+    logg: array of float
+        The logg grid.
+    Teff: array of float
+        The Teff grid.
+    filepath: str (Default: None)
+        The path of the synthetic photometry, see
+        load_synthetic_photometry().
+    wavelength: float (Default: 0.)
+        The pivot wavelength of the filter.
+
+    '''
+
+    if filepath is None:
+
+        filepath = synthetic_photometry_path
+
+    magnitude = np.asarray(magnitude, dtype=np.float64).reshape(
+        1, len(logg), len(Teff))
+    photometry = load_synthetic_photometry(filepath)
+
+    if photometry is None:
+
+        photometry = {
+            'filters': np.array([filter]),
+            'pivot_wavelength': np.array([wavelength], dtype=np.float64),
+            'logg': np.asarray(logg, dtype=np.float64),
+            'Teff': np.asarray(Teff, dtype=np.float64),
+            'data': magnitude
+        }
+
+    else:
+
+        if not (np.array_equal(photometry['logg'], logg)
+                and np.array_equal(photometry['Teff'], Teff)):
+
+            raise ValueError('The grid of the magnitudes does not match the '
+                             'grid of the synthetic photometry.')
+
+        keep = photometry['filters'] != filter
+        photometry['filters'] = np.append(photometry['filters'][keep], filter)
+        photometry['pivot_wavelength'] = np.append(
+            photometry['pivot_wavelength'][keep], wavelength)
+        photometry['data'] = np.concatenate(
+            (photometry['data'][keep], magnitude))
+
+    _save_synthetic_photometry(photometry, filepath)
+
+    return filepath
+
+
+def add_filter(filter,
+               filepath=None,
+               zero_point=0.,
+               n_jobs=1,
+               folder=None,
+               reddening_cube_filepath=None,
+               synthetic_photometry_filepath=None):
+    '''
+    Add a new passband from its response curve. Only the new filter is
+    computed: the Koester spectra are convolved with the response curve
+    once, from which both the extinction table and the synthetic surface
+    magnitudes are derived. The extinction table is written to
+    extinction/<filter>.csv and appended to the reddening cube, and the
+    magnitudes are appended to the synthetic photometry.
+
+    Parameters
+    ----------
+    filter: str
+        The name of the filter.
+    filepath: str (Default: None)
+        The path of the response curve (wavelength in Angstrom and the
+        response in two columns). If None, the filter is looked up in
+        filter_response by its name, see
+        extinction_generator.list_filter_responses().
+    zero_point: float (Default: 0.)
+        The magnitudes are in the AB system minus zero_point, e.g. set it
+        to the AB magnitude of Vega in the filter for Vega magnitudes.
+    n_jobs: int (Default: 1)
+        The number of processes. Set to -1 to use all the available cores.
+    folder: str (Default: None)
+        The folder to which the extinction table is written, the default is
+        extinction in the package.
+    reddening_cube_filepath: str (Default: None)
+        The path of the reddening cube, see reddening.ReddeningCube.
+    synthetic_photometry_filepath: str (Default: None)
+        The path of the synthetic photometry, see
+        load_synthetic_photometry().
+
+    Return
+    ------
+    The extinction table in the shape of (nlogg * nTeff, nRv) and the
+    synthetic surface magnitudes in the shape of (nlogg, nTeff).
+
+    '''
+
+    if filepath is None:
+
+        filepath = eg._filter_filepaths([filter])[0]
+
+    models, Teff, logg = eg.list_koester_models()
+    Teff_grid = np.unique(Teff)
+    logg_grid = np.unique(logg)
+
+    if len(models) != len(Teff_grid) * len(logg_grid):
+
+        raise ValueError('The Koester spectra do not form a complete '
+                         '(logg, Teff) grid.')
+
+    reddening, photon = eg.integrate_models(models, [filepath],
+                                            n_jobs=n_jobs)
+
+    table = reddening[:, 0]
+    wavelength, weight = eg.load_filter(filepath)
+    magnitude = (ab_magnitude(photon[:, 0], wavelength, weight) -
+                 zero_point).reshape(len(logg_grid), len(Teff_grid))
+
+    eg._atomic_savetxt(
+        os.path.join(eg.extinction_folder if folder is None else folder,
+                     '{}.csv'.format(filter)), table)
+    append_to_reddening_cube(filter, table, reddening_cube_filepath)
+    append_synthetic_photometry(filter,
+                                magnitude,
+                                logg_grid,
+                                Teff_grid,
+                                filepath=synthetic_photometry_filepath,
+                                wavelength=pivot_wavelength(
+                                    wavelength, weight))
+
+    return table, magnitude
+
+
+def resampling_weights(new_wavelength, wavelength, weight):
+    '''
+    The transpose of the flux conserving resampling, i.e. the weights v on
+    the wavelength grid of the spectra such that v @ flux is equal to
+    weight @ resample_spectrum(new_wavelength, wavelength, flux) for any
+    flux. A filter is then a single vector on the grid of the spectra.
+
+    Parameters
+    ----------
+    new_wavelength: array of float
+        The wavelength grid of the filter.
+    wavelength: array of float
+        The wavelength grid of the spectra.
+    weight: array of float
+        The weights on the grid of the filter, in the shape of
+        (nweight, len(new_wavelength)).
+
+    Return
+    ------
+    The weights in the shape of (nweight, len(wavelength)).
+
+    '''
+
+    weight = np.atleast_2d(weight)
+    edges = eg._bin_edges(wavelength)
+    new_edges = eg._bin_edges(new_wavelength)
+
+    # The mean over the new bins, the bins outside the spectra are zero
+    a = weight / np.diff(new_edges)
+    a[:, (new_edges[:-1] < edges[0]) | (new_edges[1:] > edges[-1])] = 0.
+
+    # Transpose of the difference of the cumulative flux at the new edges
+    b = np.zeros((len(weight), len(new_edges)))
+    b[:, :-1] -= a
+    b[:, 1:] += a
+
+    # Transpose of the linear interpolation of the cumulative flux, which
+    # is clamped at both ends as np.interp
+    k = np.clip(
+        np.searchsorted(edges, new_edges, side='right') - 1, 0,
+        len(edges) - 2)
+    t = np.clip((new_edges - edges[k]) / (edges[k + 1] - edges[k]), 0., 1.)
+    d = np.zeros((len(weight), len(edges)))
+    np.add.at(d, (slice(None), k), b * (1. - t))
+    np.add.at(d, (slice(None), k + 1), b * t)
+
+    # Transpose of the cumulative sum of the flux times the bin widths
+    return np.diff(edges) * np.cumsum(d[:, :0:-1], axis=1)[:, ::-1]
+
+
+def synthesise_photometry(filters=None, Rv=None, library=None):
+    '''
+    Compute the synthetic surface AB magnitudes, and optionally the
+    reddening, of the whole Koester grid through any set of filters in one
+    batched operation. Every filter (and every Rv) is reduced to a weight
+    vector on the shared wavelength axis of the spectral library, so the
+    photon counts of all the spectra are a single matrix product. The black
+    body extension beyond the spectra only depends on Teff, so it is
+    integrated once per Teff and scaled to each spectrum.
+
+    Parameters
+    ----------
+    filters: str or list of str (Default: None)
+        The filters, all the filters in filter_response are used if None.
+    Rv: array of float (Default: None)
+        The Rv at which the reddening is computed, it is not computed if
+        None.
+    library: KoesterLibrary (Default: None)
+        The library of the spectra, the default library is used if None.
+
+    Return
+    ------
+    A dictionary of the 'filters', their 'pivot_wavelength', the 'logg',
+    the 'Teff' and the magnitudes 'data' in the shape of
+    (nfilter, nlogg, nTeff), as load_synthetic_photometry(). If Rv is
+    provided, the 'Rv' and the A/E(B-V) 'reddening' in the shape of
+    (nfilter, nlogg, nTeff, nRv) are included.
+
+    '''
+
+    if library is None:
+
+        library = load_koester_library()
+
+    if filters is None:
+
+        filters = list(eg.list_filter_responses())
+
+    filters = list(np.asarray(filters).reshape(-1))
+    filepaths = eg._filter_filepaths(filters)
+    n_Rv = 0 if Rv is None else len(np.asarray(Rv).reshape(-1))
+
+    # Extend the shared axis with the same logarithmic step as far as the
+    # filters need it
+    loaded = [eg.load_filter(i) for i in filepaths]
+    max_edge = max(eg._bin_edges(i[0])[-1] for i in loaded)
+    step = np.log(library.wavelength[-1] / library.wavelength[-2])
+    n_extension = max(
+        int(
+            np.ceil(
+                np.log(
+                    min(eg.max_wavelength, max_edge) /
+                    library.wavelength[-1]) / step)) + 2, 2)
+    extension = library.wavelength[-1] * np.exp(
+        step * np.arange(1, n_extension + 1))
+    wavelength = np.concatenate((library.wavelength, extension))
+
+    # The weights of all the filters and all the Rv, the first row of each
+    # filter is unreddened
+    weights = []
+    denominator = []
+    pivot = []
+
+    if n_Rv > 0:
+
+        prepared = eg._prepare_filters(filepaths, Rv)
+
+    for i, (f_wavelength, f_weight) in enumerate(loaded):
+
+        rows = [f_weight]
+
+        if n_Rv > 0:
+
+            rows += list(f_weight * prepared[i][2])
+
+        weights.append(resampling_weights(f_wavelength, wavelength, rows))
+        denominator.append(np.sum(f_weight * c / f_wavelength))
+        pivot.append(pivot_wavelength(f_wavelength, f_weight))
+
+    weights = np.concatenate(weights) * wavelength
+    n_lib = len(library.wavelength)
+
+    n_Teff, n_logg = len(library.Teff), len(library.logg)
+    flux = np.asarray(library.flux, dtype=np.float64).reshape(-1, n_lib)
+    photon = flux @ weights[:, :n_lib].T
+
+    # The black body extension, scaled to the reddest sample of each
+    # original spectrum as extinction_generator.extended_spectrum()
+    bb = np.array([eg.planck(extension, t) for t in library.Teff])
+    scale = (library.tail_flux /
+             eg.planck(library.tail_wavelength, library.Teff[:, None]))
+    photon += (bb @ weights[:, n_lib:].T).repeat(
+        n_logg, axis=0) * scale.reshape(-1, 1)
+
+    # (nfilter, nrow, nlogg, nTeff)
+    photon = photon.reshape(n_Teff, n_logg, len(filters),
+                            n_Rv + 1).transpose(2, 3, 1, 0)
+
+    output = {
+        'filters': np.array(filters),
+        'pivot_wavelength': np.array(pivot),
+        'logg': library.logg,
+        'Teff': library.Teff,
+        'data': -2.5 * np.log10(
+            photon[:, 0] / np.array(denominator)[:, None, None]) - 48.60
+    }
+
+    if n_Rv > 0:
+
+        output['Rv'] = np.asarray(Rv, dtype=np.float64).reshape(-1)
+        output['reddening'] = (-2.5 * np.log10(photon[:, 1:] / photon[:, :1]) /
+                               eg.limit).transpose(0, 2, 3, 1)
+
+    return output
+
+
+def build_synthetic_photometry(filters=None, filepath=None, library=None):
+    '''
+    Compute the synthetic surface magnitudes of the filters with
+    synthesise_photometry() and save them as the synthetic photometry,
+    which can be added to the atmosphere models with
+    atm_reader.add_synthetic_photometry().
+
+    Parameters
+    ----------
+    filters: str or list of str (Default: None)
+        The filters, all the filters in filter_response are used if None.
+    filepath: str (Default: None)
+        The path of the synthetic photometry, see
+        load_synthetic_photometry().
+    library: KoesterLibrary (Default: None)
+        The library of the spectra, the default library is used if None.
+
+    Return
+    ------
+    The path of the synthetic photometry.
+
+    '''
+
+    if filepath is None:
+
+        filepath = synthetic_photometry_path
+
+    photometry = synthesise_photometry(filters=filters, library=library)
+    _save_synthetic_photometry(photometry, filepath)
+
+    return filepath
@@ -1,15 +1,21 @@
+from collections import OrderedDict
+import copy
 import glob
 import numpy as np
 from scipy import optimize, integrate
 from scipy.interpolate import interp1d
 from scipy.interpolate import CloughTocher2DInterpolator
 from matplotlib import pyplot as plt
+import hashlib
 import os
 import pkg_resources
 import warnings
 
 from . import cooling_model_reader as cmr
 from . import atmosphere_model_reader as amr
+from . import sfr
+from . import wdlf_store
+from .util import UniformGridInterpolator2D
 
 
 class WDLF:
@@ -27,6 +33,10 @@ class WDLF:
     For conversion, we use (1) M_sun = 1.98847E30 and (2) L_sun = 3.826E33.
 
     '''
+    # The resampled cooling grids, shared by all the instances, keyed by the
+    # cooling models and the grid size
+    _cooling_grid_cache = {}
+
     def __init__(self,
                  imf_model='C03',
                  ifmr_model='C08',
@@ -36,26 +46,30 @@ class WDLF:
                  ms_model='C16'):
 
         self.cooling_interpolator = None
+        self.cooling_grid = None
+        self.cooling_grid_params = None
+
+        # The cooling models and the grid from which the cooling
+        # interpolators are built, see compute_cooling_age_interpolator()
+        self.cooling_interpolator_config = None
+        self.da_fraction = None
+        self.number_density_err = None
+        self.integration_report = None
+
+        # In-memory LRU cache of compute_density()
+        self.cache_size = 32
+        self._cache = OrderedDict()
+
+        # The cooling models available in each mass range, None to leave the
+        # mass range empty
+        self.low_mass_cooling_model_list =\
+            cmr.list_cooling_model_names('low') + [None]
 
-        self.low_mass_cooling_model_list = [
-            'montreal_co_da_20', 'montreal_co_db_20', 'lpcode_he_da_07',
-            'lpcode_co_da_07', 'lpcode_he_da_09', None
-        ]
-
-        self.intermediate_mass_cooling_model_list = [
-            'montreal_co_da_20', 'montreal_co_db_20', 'lpcode_co_da_10_z001',
-            'lpcode_co_da_10_z0001', 'lpcode_co_da_15_z00003',
-            'lpcode_co_da_15_z0001', 'lpcode_co_da_15_z0005',
-            'lpcode_co_da_17_y04', 'lpcode_co_db_17', 'basti_co_da_10',
-            'basti_co_db_10', 'basti_co_da_10_nps', 'basti_co_db_10_nps', None
-        ]
-
-        self.high_mass_cooling_model_list = [
-            'montreal_co_da_20', 'montreal_co_db_20', 'lpcode_one_da_07',
-            'lpcode_one_da_19', 'lpcode_one_db_19', 'basti_co_da_10',
-            'basti_co_db_10', 'basti_co_da_10_nps', 'basti_co_db_10_nps',
-            'mesa_one_da_18', 'mesa_one_db_18', None
-        ]
+        self.intermediate_mass_cooling_model_list =\
+            cmr.list_cooling_model_names('intermediate') + [None]
+
+        self.high_mass_cooling_model_list =\
+            cmr.list_cooling_model_names('high') + [None]
 
         # The IFMR, WD cooling and MS lifetime models are required to
         # initialise the object.
@@ -230,9 +244,9 @@ class WDLF:
                 m[m < 0.5088] = 0.5088
 
         elif self.ifmr_model == 'S09b':
-            m = 0.134 * M[M < 4.0] + 0.331
+            m = 0.134 * M + 0.331
             if (M >= 4.0).any():
-                m = 0.047 * M[M >= 4.0] + 0.679
+                m[M >= 4.0] = 0.047 * M[M >= 4.0] + 0.679
 
             if (m < 0.3823).any():
                 m[m < 0.3823] = 0.3823
@@ -361,6 +375,98 @@ class WDLF:
 
             return M**2.
 
+    def _formation_time(self, M, Mag):
+        '''
+        The lookback time at which a MS star of mass M has to be formed in
+        order to be observed as a WD at the given magnitude today, i.e. the
+        sum of the MS lifetime and the WD cooling time.
+
+        Parameters
+        ----------
+        M: float or array of float
+            MS mass.
+        Mag: float
+            Absolute magnitude in a given passband.
+
+        Return
+        ------
+        The lookback time of formation, NaN if the WD is outside the
+        atmosphere grid.
+
+        '''
+
+        M = np.asarray(M, dtype=np.float64).reshape(-1)
+
+        # Get the WD mass
+        m = self._ifmr(M)
+
+        # Get the bolometric magnitude
+        Mbol = np.asarray(self.Mag_to_Mbol_itp(m, Mag)).reshape(-1)
+        logL = (4.75 - Mbol) / 2.5 + 33.582744965691276
+
+        # Get the cooling time and the MS lifetime
+        with np.errstate(invalid='ignore', over='ignore'):
+
+            time = np.asarray(self.cooling_interpolator(logL, m)).reshape(
+                -1) + self._ms_age(M)
+
+        time[~np.isfinite(Mbol)] = np.nan
+
+        return time
+
+    def _sfr_breakpoint_masses(self, Mag, M_min, M_max, n_scan=200):
+        '''
+        Find the MS masses at which the formation time of a WD at the given
+        magnitude crosses the breakpoints of the SFR, i.e. where the
+        integrand is discontinuous. The formation time is evaluated on a
+        logarithmic grid of masses, every crossing is then refined with
+        Brent's method.
+
+        Parameters
+        ----------
+        Mag: float
+            Absolute magnitude in a given passband.
+        M_min: float
+            The lower limit of the MS mass.
+        M_max: float
+            The upper limit of the MS mass.
+        n_scan: int (Default: 200)
+            The number of masses to scan for crossings.
+
+        Return
+        ------
+        Sorted array of MS masses, or None if the SFR does not provide its
+        breakpoints.
+
+        '''
+
+        breakpoints = getattr(self.sfr, 'breakpoints', None)
+
+        if breakpoints is None:
+
+            return None
+
+        breakpoints = np.asarray(breakpoints, dtype=np.float64).reshape(-1)
+
+        M = 10.**np.linspace(np.log10(M_min), np.log10(M_max), n_scan)
+        time = self._formation_time(M, Mag)
+
+        masses = []
+
+        for t_break in breakpoints:
+
+            diff = time - t_break
+            crossing = np.where(diff[:-1] * diff[1:] < 0.)[0]
+
+            for j in crossing:
+
+                masses.append(
+                    optimize.brentq(
+                        lambda x: self._formation_time(x, Mag)[0] - t_break,
+                        M[j], M[j + 1]))
+
+        return np.unique(masses)
+
     def _integrand(self, M, Mag):
         '''
         The integrand of the number density computation based on the
@@ -394,7 +500,36 @@ class WDLF:
             return 0.
 
         Mbol = self.Mag_to_Mbol_itp(m, Mag)
+
+        # Get the MS lifetime
+        t_ms = self._ms_age(M)
+
+        return self._integrand_bolometric(m, MF, t_ms, Mbol)
+
+    def _integrand_bolometric(self, m, MF, t_ms, Mbol):
+        '''
+        The part of the integrand that depends on the bolometric magnitude,
+        i.e. everything after the passband has been mapped to Mbol.
+
+        Parameters
+        ----------
+        m: float
+            WD mass
+        MF: float
+            Initial mass function at the MS mass
+        t_ms: float
+            MS lifetime
+        Mbol: float
+            Bolometric magnitude
+
+        Return
+        ------
+        The product for integrating to the number density.
+
+        '''
+
         if not np.isfinite(Mbol):
+
             return 0.
 
         logL = (4.75 - Mbol) / 2.5 + 33.582744965691276
@@ -402,9 +537,6 @@ class WDLF:
         # Get the WD cooling time
         t_cool = self.cooling_interpolator(logL, m)
 
-        # Get the MS lifetime
-        t_ms = self._ms_age(M)
-
         # Get the time since star formation
         time = t_cool + t_ms
 
@@ -430,6 +562,832 @@ class WDLF:
 
             return 0.
 
+    def _integrand_mixed(self, M, Mag):
+        '''
+        The integrand of a mixed population of DA and DB. The IFMR, IMF and
+        MS lifetime are only evaluated once, while the mapping from the
+        passband to the bolometric magnitude is evaluated per atmosphere and
+        weighted by the DA fraction at the corresponding Teff.
+
+        Parameters
+        ----------
+        M: float
+            Main sequence stellar mass
+        Mag: float
+            Absolute magnitude in a given passband
+
+        Return
+        ------
+        The product for integrating to the number density.
+
+        '''
+
+        # Get the WD mass
+        m = self._ifmr(M)
+
+        # Get the mass function
+        MF = self._imf(M)
+
+        if MF < 0.:
+
+            return 0.
+
+        # Get the MS lifetime
+        t_ms = self._ms_age(M)
+
+        density = 0.
+
+        for atmosphere, itp in self.Mag_to_Mbol_itp_mixed.items():
+
+            Mbol, Teff = np.asarray(itp(m, Mag)).reshape(-1)
+
+            if not np.isfinite(Teff):
+
+                continue
+
+            fraction = self._da_fraction(Teff)
+
+            if atmosphere == 'He':
+
+                fraction = 1. - fraction
+
+            if fraction > 0.:
+
+                density += fraction * self._integrand_bolometric(
+                    m, MF, t_ms, Mbol)
+
+        return density
+
+    def _integrand_passbands(self, M, Mag, M_min):
+        '''
+        The integrand of multiple passbands at the same magnitude, evaluated
+        on an array of MS masses at once. The IFMR, IMF and MS lifetime are
+        evaluated once for all the passbands, and the cooling time, the SFR
+        and the cooling rate are evaluated in one vectorised call for all
+        the passbands (and atmospheres), so only the mapping from the
+        passband to the bolometric magnitude is evaluated per passband.
+
+        Parameters
+        ----------
+        M: array of float
+            Main sequence stellar masses
+        Mag: float
+            Absolute magnitude in the passbands
+        M_min: array of float
+            The lower limit of the MS mass of each passband, below which the
+            integrand of the passband is zero.
+
+        Return
+        ------
+        The products for integrating to the number densities, in the shape
+        of (len(M), number of passbands).
+
+        '''
+
+        M = np.asarray(M, dtype=np.float64).reshape(-1)
+        n_band = len(self.Mag_to_Mbol_itp_passbands)
+
+        # Get the WD mass, the mass function and the MS lifetime
+        m = np.asarray(self._ifmr(M), dtype=np.float64).reshape(-1)
+        MF = np.asarray(self._imf(M), dtype=np.float64).reshape(-1)
+        t_ms = np.asarray(self._ms_age(M), dtype=np.float64).reshape(-1)
+
+        # The passband, the bolometric magnitude and the weight of each
+        # atmosphere of each passband
+        band = []
+        Mbol = []
+        weight = []
+
+        for i, itp in enumerate(self.Mag_to_Mbol_itp_passbands):
+
+            for atmosphere, itp_atmosphere in itp.items():
+
+                if self.da_fraction is None:
+
+                    Mbol_i = np.asarray(itp_atmosphere(m, Mag)).reshape(-1)
+                    fraction = np.ones(len(M))
+
+                else:
+
+                    Mbol_i, Teff = np.asarray(itp_atmosphere(
+                        m, Mag)).reshape(-1, 2).T
+                    fraction = self._da_fraction(Teff)
+
+                    if atmosphere == 'He':
+
+                        fraction = 1. - fraction
+
+                    fraction[~np.isfinite(Teff)] = 0.
+
+                fraction[M < M_min[i]] = 0.
+
+                band.append(np.full(len(M), i))
+                Mbol.append(Mbol_i)
+                weight.append(fraction)
+
+        band = np.concatenate(band)
+        Mbol = np.concatenate(Mbol)
+        weight = np.concatenate(weight)
+        index = np.tile(np.arange(len(M)), len(band) // len(M))
+        mass = m[index]
+
+        valid = np.isfinite(Mbol) & (weight > 0.) & (MF[index] >= 0.)
+        logL = (4.75 - Mbol) / 2.5 + 33.582744965691276
+
+        # Get the time since star formation
+        time = np.full(len(Mbol), np.nan)
+        time[valid] = np.asarray(
+            self.cooling_interpolator(logL[valid], mass[valid])).reshape(
+                -1) + t_ms[index][valid]
+        valid[valid] = time[valid] >= 0.
+
+        # Get the SFR, the free-form SFR may not be vectorised
+        rate = np.zeros(len(Mbol))
+
+        if isinstance(self.sfr, sfr.SFR):
+
+            rate[valid] = self.sfr(time[valid])
+
+        else:
+
+            rate[valid] = [self.sfr(t) for t in time[valid]]
+
+        valid[valid] = rate[valid] > 0.
+
+        # Get the cooling rate
+        dLdt = np.zeros(len(Mbol))
+        dLdt[valid] = np.asarray(
+            self.cooling_rate_interpolator(logL[valid],
+                                           mass[valid])).reshape(-1)
+
+        value = np.zeros(len(Mbol))
+        value[valid] = MF[index][valid] * rate[valid] * dLdt[valid] *\
+            weight[valid]
+        value[~np.isfinite(value)] = 0.
+
+        density = np.zeros((len(M), n_band))
+        np.add.at(density, (index, band), value)
+
+        return density
+
+    def _da_fraction(self, Teff):
+        '''
+        Compute the fraction of DA among all the WDs at the given Teff.
+
+        Parameters
+        ----------
+        Teff: float or array of float
+            Effective temperature
+
+        Return
+        ------
+        The DA fraction, clipped between 0 and 1.
+
+        '''
+
+        if callable(self.da_fraction):
+
+            fraction = self.da_fraction(Teff)
+
+        else:
+
+            fraction = self.da_fraction * np.ones_like(Teff)
+
+        return np.clip(fraction, 0., 1.)
+
+    def _integrate_density(self, integrand, Mag, M_min, M_max, points, limit,
+                           epsabs, epsrel):
+        '''
+        Integrate the density at one magnitude and keep the diagnostics
+        from the integrator.
+
+        Parameters
+        ----------
+        integrand: callable function
+            The integrand, either _integrand() or _integrand_mixed().
+        Mag: float
+            Absolute magnitude in the given passband.
+        M_min: float
+            The lower limit of the MS mass.
+        M_max: float
+            The upper limit of the MS mass.
+        points: array of float
+            The break points of the integration.
+        limit: int
+            The maximum number of steps of integration.
+        epsabs: float
+            The absolute tolerance of the integration step.
+        epsrel: float
+            The relative tolerance of the integration step.
+
+        Return
+        ------
+        The density, the error estimate, the number of function evaluations
+        and the warning message (empty if converged).
+
+        '''
+
+        result = integrate.quad(integrand,
+                                M_min,
+                                M_max,
+                                args=[Mag],
+                                limit=limit,
+                                points=points,
+                                epsabs=epsabs,
+                                epsrel=epsrel,
+                                full_output=1)
+
+        if len(result) > 3:
+
+            message = result[3]
+
+        else:
+
+            message = ''
+
+        return result[0], result[1], result[2]['neval'], message
+
+    def _integrate_density_passbands(self, Mag, M_min, M_max, points, limit,
+                                     epsabs, epsrel, n_nodes=7):
+        '''
+        Integrate the densities of multiple passbands at one magnitude with
+        an adaptive Gauss-Legendre quadrature, in which all the nodes of
+        each step of refinement are evaluated in a single vectorised call
+        of _integrand_passbands(). The error of an interval is the
+        difference between its integral and the sum of the integrals of its
+        two halves. The integrand is also evaluated at the ends of each
+        half, a half in which the integrand of a passband is zero only in
+        part (e.g. at the edge of the cooling or atmosphere grid) is
+        discontinuous, so the error of its integral can be as large as its
+        width times the largest value of the integrand in it. The intervals
+        with the largest errors are bisected until the sum of the errors is
+        within the tolerance, which is controlled on the largest of the
+        densities, as in integrate.quad.
+
+        Parameters
+        ----------
+        Mag: float
+            Absolute magnitude in the passbands.
+        M_min: array of float
+            The lower limit of the MS mass of each passband.
+        M_max: float
+            The upper limit of the MS mass.
+        points: array of float
+            The break points of the integration.
+        limit: int
+            The maximum number of intervals.
+        epsabs: float
+            The absolute tolerance of the integration.
+        epsrel: float
+            The relative tolerance of the integration.
+        n_nodes: int (Default: 7)
+            The number of Gauss-Legendre nodes in each interval.
+
+        Return
+        ------
+        The array of the densities, the array of their error estimates, the
+        number of function evaluations and the warning message (empty if
+        converged).
+
+        '''
+
+        x, w = np.polynomial.legendre.leggauss(n_nodes)
+        x = np.concatenate(([-1.], x, [1.]))
+        neval = 0
+
+        def gauss(a, b):
+
+            nonlocal neval
+
+            half = (b - a) / 2.
+            nodes = ((a + b) / 2.)[:, None] + half[:, None] * x
+            neval += nodes.size
+            f = self._integrand_passbands(nodes.reshape(-1), Mag,
+                                          M_min).reshape(
+                                              nodes.shape + (len(M_min), ))
+
+            # The error bound of an interval in which the integrand is
+            # discontinuous between zero and non-zero
+            zero = (f == 0.)
+            partial = zero.any(axis=1) & ~zero.all(axis=1)
+            bound = partial * np.max(np.abs(f), axis=1) * (2. * half)[:, None]
+
+            return np.einsum('ink,n,i->ik', f[:, 1:-1], w, half), bound
+
+        edges = np.unique(np.concatenate(([M_min.min()], points, [M_max])))
+        a = edges[:-1]
+        b = edges[1:]
+        mid = (a + b) / 2.
+        whole = gauss(a, b)[0]
+        halves, bound = gauss(np.concatenate((a, mid)),
+                              np.concatenate((mid, b)))
+        left, right = np.split(halves, 2)
+        bound = np.sum(np.split(bound, 2), axis=0)
+        message = ''
+
+        while True:
+
+            error = np.abs(whole - left - right) + bound
+            total = np.sum(left + right, axis=0)
+            tolerance = max(epsabs, epsrel * np.max(np.abs(total)))
+
+            if np.sum(np.max(error, axis=1)) <= tolerance:
+
+                break
+
+            if len(a) >= limit:
+
+                message = 'The maximum number of subdivisions ({}) has ' \
+                    'been achieved.'.format(limit)
+                break
+
+            # Bisect the intervals with more than their share of the error
+            refine = np.max(error, axis=1) > tolerance / len(a)
+            refine[np.argmax(np.max(error, axis=1))] = True
+
+            mid = (a[refine] + b[refine]) / 2.
+            a_new = np.concatenate((a[refine], mid))
+            b_new = np.concatenate((mid, b[refine]))
+            mid_new = (a_new + b_new) / 2.
+            whole_new = np.concatenate((left[refine], right[refine]))
+            halves, bound_new = gauss(np.concatenate((a_new, mid_new)),
+                                      np.concatenate((mid_new, b_new)))
+            left_new, right_new = np.split(halves, 2)
+            bound_new = np.sum(np.split(bound_new, 2), axis=0)
+
+            a = np.concatenate((a[~refine], a_new))
+            b = np.concatenate((b[~refine], b_new))
+            whole = np.concatenate((whole[~refine], whole_new))
+            left = np.concatenate((left[~refine], left_new))
+            right = np.concatenate((right[~refine], right_new))
+            bound = np.concatenate((bound[~refine], bound_new))
+
+        return total, np.sum(error, axis=0), neval, message
+
+    def _integration_limits(self, Mag, Mag_to_Mbol_itp, M_upper_bound, M_max,
+                            n_points):
+        '''
+        Find the lower limit of the MS mass of the integration at one
+        magnitude, and the break points of the integration.
+
+        Parameters
+        ----------
+        Mag: float
+            Absolute magnitude in the given passband.
+        Mag_to_Mbol_itp: list of callable functions
+            The interpolators from the passband to the bolometric magnitude,
+            one for each atmosphere.
+        M_upper_bound: float
+            The upper bound of the lower mass limit, i.e. the lower mass
+            limit at the previous magnitude.
+        M_max: float
+            The upper limit of the MS mass.
+        n_points: int
+            The number of break points if the SFR does not provide its
+            breakpoints.
+
+        Return
+        ------
+        The lower limit of the MS mass and the break points.
+
+        '''
+
+        # The lower mass limit of a mixed population is the lower of the two
+        # atmospheres
+        M_min = M_upper_bound
+
+        for itp in Mag_to_Mbol_itp:
+
+            self.Mag_to_Mbol_itp = itp
+            M_min = min(
+                M_min,
+                optimize.fminbound(self._find_M_min,
+                                   0.5,
+                                   M_upper_bound,
+                                   args=[Mag],
+                                   xtol=1e-5,
+                                   maxfun=10000))
+
+        # Break the integral at the masses where the SFR is discontinuous, so
+        # that short star bursts are not missed by the integrator
+        points = []
+
+        for itp in Mag_to_Mbol_itp:
+
+            self.Mag_to_Mbol_itp = itp
+            breakpoint_masses = self._sfr_breakpoint_masses(Mag, M_min, M_max)
+
+            if breakpoint_masses is None:
+
+                points = None
+                break
+
+            points.append(breakpoint_masses)
+
+        # Note that the points are needed because it can fail to integrate
+        # if the star burst is too short
+        if points is None:
+
+            points = 10.**np.linspace(np.log10(M_min), np.log10(M_max),
+                                      n_points)
+
+        else:
+
+            points = np.unique(np.concatenate(points))
+            points = points[(points > M_min) & (points < M_max)]
+
+        return M_min, points
+
+    def _integrate_passband(self, Mag, passband, atmosphere, da_fraction,
+                            M_max, limit, n_points, epsabs, epsrel,
+                            adaptive_tolerance, max_refinement):
+        '''
+        Integrate the unnormalised number density at each of the magnitudes
+        in a single passband.
+
+        See compute_density() for the description of the parameters.
+
+        Return
+        ------
+        The number density, its error estimate and the integration report.
+
+        '''
+
+        number_density = np.zeros_like(Mag)
+        number_density_err = np.zeros_like(Mag)
+        neval = np.zeros(len(Mag), dtype=int)
+        message = np.array([''] * len(Mag), dtype='object')
+        bin_epsabs = np.full(len(Mag), float(epsabs))
+        bin_epsrel = np.full(len(Mag), float(epsrel))
+        integration_limits = []
+
+        if da_fraction is None:
+
+            Mag_to_Mbol_itp = {
+                atmosphere:
+                self.atm_reader.interp_atm(dependent='Mbol',
+                                           atmosphere=atmosphere,
+                                           independent=['mass', passband])
+            }
+            integrand = self._integrand
+
+        else:
+
+            Mag_to_Mbol_itp = {}
+            self.Mag_to_Mbol_itp_mixed = {}
+
+            for atm in ['H', 'He']:
+
+                Mag_to_Mbol_itp[atm] = self.atm_reader.interp_atm(
+                    dependent='Mbol',
+                    atmosphere=atm,
+                    independent=['mass', passband])
+                self.Mag_to_Mbol_itp_mixed[atm] =\
+                    self.atm_reader.interp_atm(
+                        dependent=['Mbol', 'Teff'],
+                        atmosphere=atm,
+                        independent=['mass', passband])
+
+            integrand = self._integrand_mixed
+
+        M_upper_bound = M_max
+
+        for i, Mag_i in enumerate(Mag):
+
+            M_min, points = self._integration_limits(
+                Mag_i, list(Mag_to_Mbol_itp.values()), M_upper_bound, M_max,
+                n_points)
+
+            integration_limits.append((M_min, points))
+
+            number_density[i], number_density_err[i], neval[i], message[i] =\
+                self._integrate_density(integrand, Mag_i, M_min, M_max,
+                                        points, limit, epsabs, epsrel)
+
+            M_upper_bound = M_min
+
+        # Tighten the tolerances only for the bins of which the error is
+        # significant relative to the normalised density
+        if adaptive_tolerance is not None:
+
+            for _ in range(max_refinement):
+
+                significant = number_density_err >\
+                    adaptive_tolerance * np.nansum(number_density)
+
+                if not significant.any():
+
+                    break
+
+                for i in np.where(significant)[0]:
+
+                    bin_epsabs[i] /= 10.
+                    bin_epsrel[i] = max(bin_epsrel[i] / 10.,
+                                        50. * np.finfo(np.float64).eps)
+                    M_min, points = integration_limits[i]
+
+                    number_density[i], number_density_err[i], neval[i],\
+                        message[i] = self._integrate_density(
+                            integrand, Mag[i], M_min, M_max, points, limit,
+                            bin_epsabs[i], bin_epsrel[i])
+
+        for Mag_i, message_i in zip(Mag, message):
+
+            if message_i != '':
+
+                warnings.warn(
+                    'The integration at Mag = {} may not have converged: '
+                    '{}'.format(Mag_i, message_i), integrate.IntegrationWarning)
+
+        return number_density, number_density_err, {
+            'error': number_density_err,
+            'neval': neval,
+            'message': message,
+            'epsabs': bin_epsabs,
+            'epsrel': bin_epsrel
+        }
+
+    def _integrate_passbands(self, Mag, passband, atmosphere, da_fraction,
+                             M_max, limit, n_points, epsabs, epsrel,
+                             adaptive_tolerance, max_refinement):
+        '''
+        Integrate the unnormalised number densities at each of the
+        magnitudes in multiple passbands together. At each magnitude, the
+        densities of all the passbands are one vector-valued integral over
+        the MS mass, so the IFMR, IMF, MS lifetime, cooling time, SFR and
+        cooling rate are evaluated once for all the passbands, see
+        _integrand_passbands(). The integration range is the widest of
+        the passbands, and it is broken at the break points of all the
+        passbands.
+
+        See compute_density() for the description of the parameters.
+
+        Return
+        ------
+        Dictionaries of the number density, its error estimate and the
+        integration report, with the passbands as the keys.
+
+        '''
+
+        number_density = np.zeros((len(Mag), len(passband)))
+        number_density_err = np.zeros((len(Mag), len(passband)))
+        neval = np.zeros(len(Mag), dtype=int)
+        message = np.array([''] * len(Mag), dtype='object')
+        bin_epsabs = np.full(len(Mag), float(epsabs))
+        bin_epsrel = np.full(len(Mag), float(epsrel))
+        integration_limits = []
+
+        if da_fraction is None:
+
+            atmospheres = [atmosphere]
+
+        else:
+
+            atmospheres = ['H', 'He']
+
+        # The interpolators to find the integration limits of each passband
+        Mag_to_Mbol_itp = [[
+            self.atm_reader.interp_atm(dependent='Mbol',
+                                       atmosphere=atm,
+                                       independent=['mass', p])
+            for atm in atmospheres
+        ] for p in passband]
+
+        # The interpolators of the integrand, which also give the Teff for
+        # the DA fraction of a mixed population
+        if da_fraction is None:
+
+            self.Mag_to_Mbol_itp_passbands = [{
+                atmosphere: itp[0]
+            } for itp in Mag_to_Mbol_itp]
+
+        else:
+
+            self.Mag_to_Mbol_itp_passbands = [{
+                atm: self.atm_reader.interp_atm(dependent=['Mbol', 'Teff'],
+                                                atmosphere=atm,
+                                                independent=['mass', p])
+                for atm in atmospheres
+            } for p in passband]
+
+        M_upper_bound = np.full(len(passband), float(M_max))
+
+        for i, Mag_i in enumerate(Mag):
+
+            M_min = np.zeros(len(passband))
+            points = []
+
+            for j, itp in enumerate(Mag_to_Mbol_itp):
+
+                M_min[j], points_j = self._integration_limits(
+                    Mag_i, itp, M_upper_bound[j], M_max, n_points)
+                points.append(points_j)
+
+            # The integrand of a passband is zero below its own lower mass
+            # limit, which is a break point of the other passbands
+            points = np.unique(np.concatenate(points + [M_min]))
+            points = points[(points > M_min.min()) & (points < M_max)]
+
+            integration_limits.append((M_min, points))
+
+            number_density[i], number_density_err[i], neval[i], message[i] =\
+                self._integrate_density_passbands(Mag_i, M_min, M_max,
+                                                  points, limit, epsabs,
+                                                  epsrel)
+
+            M_upper_bound = M_min
+
+        # Tighten the tolerances only for the bins of which the error is
+        # significant relative to the normalised density in any passband
+        if adaptive_tolerance is not None:
+
+            for _ in range(max_refinement):
+
+                significant = (number_density_err > adaptive_tolerance *
+                               np.nansum(number_density, axis=0)).any(axis=1)
+
+                if not significant.any():
+
+                    break
+
+                for i in np.where(significant)[0]:
+
+                    bin_epsabs[i] /= 10.
+                    bin_epsrel[i] = max(bin_epsrel[i] / 10.,
+                                        50. * np.finfo(np.float64).eps)
+                    M_min, points = integration_limits[i]
+
+                    number_density[i], number_density_err[i], neval[i],\
+                        message[i] = self._integrate_density_passbands(
+                            Mag[i], M_min, M_max, points, limit,
+                            bin_epsabs[i], bin_epsrel[i])
+
+        for Mag_i, message_i in zip(Mag, message):
+
+            if message_i != '':
+
+                warnings.warn(
+                    'The integration at Mag = {} may not have converged: '
+                    '{}'.format(Mag_i, message_i), integrate.IntegrationWarning)
+
+        number_density = {
+            p: number_density[:, j].copy()
+            for j, p in enumerate(passband)
+        }
+        number_density_err = {
+            p: number_density_err[:, j].copy()
+            for j, p in enumerate(passband)
+        }
+        integration_report = {
+            p: {
+                'error': number_density_err[p],
+                'neval': neval,
+                'message': message,
+                'epsabs': bin_epsabs,
+                'epsrel': bin_epsrel
+            }
+            for p in passband
+        }
+
+        return number_density, number_density_err, integration_report
+
+    def _function_identity(self, function):
+        '''
+        Identify a user-supplied function by its module, qualified name and
+        a hash of its code (including the constants, the default arguments
+        and the closure variables), so that a redefined function with the
+        same name is identified as a different one. The SFR objects are
+        identified by their parameters. Other callables are identified by
+        their name and their id, which is only valid within a session.
+
+        Parameters
+        ----------
+        function: callable function
+            The function to be identified.
+
+        Return
+        ------
+        A string identifying the function, None if the function is None.
+
+        '''
+
+        if function is None:
+
+            return None
+
+        name = '{}.{}'.format(
+            getattr(function, '__module__', None),
+            getattr(function, '__qualname__',
+                    type(function).__qualname__))
+
+        if isinstance(function, sfr.SFR):
+
+            if isinstance(function, sfr.CompositeSFR):
+
+                parameters = [
+                    self._function_identity(c) for c in function.components
+                ]
+
+            else:
+
+                parameters = {
+                    k: np.asarray(v).tolist()
+                    for k, v in vars(function).items()
+                    if not k.startswith('_')
+                }
+
+            return '{}({})'.format(name, parameters)
+
+        code = getattr(function, '__code__', None)
+
+        if code is None:
+
+            return '{}@{}'.format(name, id(function))
+
+        sha1 = hashlib.sha1(code.co_code)
+        sha1.update(repr(code.co_consts).encode())
+        sha1.update(repr(getattr(function, '__defaults__', None)).encode())
+
+        for cell in getattr(function, '__closure__', None) or ():
+
+            try:
+
+                value = cell.cell_contents
+
+            except ValueError:
+
+                continue
+
+            if isinstance(value, np.ndarray):
+
+                sha1.update(value.tobytes())
+
+            else:
+
+                sha1.update(repr(value).encode())
+
+        return '{}:{}'.format(name, sha1.hexdigest())
+
+    def _model_config(self, **kwargs):
+        '''
+        Collect the full model configuration of the WDLF, i.e. the MS,
+        IMF, IFMR, cooling and SFR models, together with the given settings
+        of the computation (e.g. the passband and the tolerances). The
+        cooling models are the ones from which the cooling interpolators
+        are built by compute_cooling_age_interpolator(), which are the
+        ones used by compute_density().
+
+        Parameters
+        ----------
+        **kwargs: dict
+            The settings of the computation.
+
+        Return
+        ------
+        A JSON serialisable dictionary.
+
+        '''
+
+        config = {
+            'ms_model': self.ms_model,
+            'ms_function': self._function_identity(self.ms_function),
+            'imf_model': self.imf_model,
+            'imf_function': self._function_identity(self.imf_function),
+            'ifmr_model': self.ifmr_model,
+            'ifmr_function': self._function_identity(self.ifmr_function),
+            'sfr_mode': self.sfr_mode,
+            'sfr_params': self.sfr_params
+        }
+
+        # The cooling models from which the cooling interpolators are built,
+        # rather than the ones which are set
+        if self.cooling_interpolator_config is None:
+
+            config.update({
+                'low_mass_cooling_model': None,
+                'intermediate_mass_cooling_model': None,
+                'high_mass_cooling_model': None,
+                'cooling_grid': None
+            })
+
+        else:
+
+            config.update(self.cooling_interpolator_config)
+
+        for key, value in kwargs.items():
+
+            if callable(value):
+
+                value = self._function_identity(value)
+
+            elif isinstance(value, np.ndarray):
+
+                value = value.tolist()
+
+            config[key] = value
+
+        return config
+
     def set_sfr_model(self,
                       mode='constant',
                       age=10E9,
@@ -447,16 +1405,23 @@ class WDLF:
 
             - t1 is the beginning of the star burst
             - t2 is the end
-            - t0 and t3 are tiny deviations from t1 and t2 required for interpolation
 
         >>>    SFR
         >>>    ^                x-------x
         >>>    |                |       |
         >>>    |                |       |
         >>>    |    x-----------x       x-----------------x
-        >>>        -30E9   0   t3/t2    t1/t0   13.8E9   30E9
+        >>>                0     t2       t1   13.8E9
         >>>                Lookback Time
 
+        The built-in forms are the piecewise-analytic SFR objects from
+        `WDPhotTools.sfr`, which are vectorised, can be integrated exactly
+        with `self.sfr.integral(t1, t2)` and report the lookback times at
+        which they are discontinuous in `self.sfr.breakpoints`. Sums of
+        bursts or tabulated SFRs can be built with the same objects and
+        supplied with the 'manual' mode, e.g.
+        `sfr.TophatSFR(10E9, 9E9) + sfr.TophatSFR(2E9, 1.9E9)`.
+
         Parameters
         ----------
         mode: str (Default: 'constant')
@@ -475,55 +1440,36 @@ class WDLF:
 
         '''
 
-        if mode == 'constant':
+        self.sfr_params = {'age': age}
 
-            t1 = age
-            t0 = t1 + 1.
-            # current time = 0.
-            t2 = 0.
-            t3 = t2 - 1.
+        if mode == 'constant':
 
-            self.sfr = interp1d(np.array((30E9, t0, t1, t2, t3, -30E9)),
-                                np.array((0., 0., 1., 1., 0., 0.)),
-                                fill_value='extrapolate')
+            self.sfr = sfr.TophatSFR(age, 0.)
 
         elif mode == 'burst':
 
-            t1 = age
-            t0 = t1 + 1.
-            t2 = t1 - duration
-            t3 = t2 - 1.
-
-            self.sfr = interp1d(np.array((30E9, t0, t1, t2, t3, -30E9)),
-                                np.array((0., 0., 1., 1., 0., 0.)),
-                                fill_value='extrapolate')
+            self.sfr = sfr.TophatSFR(age, age - duration)
+            self.sfr_params['duration'] = duration
 
         elif mode == 'decay':
 
-            t = 10.**np.linspace(0, np.log10(age), 10000)
-            sfr = np.exp((t - age) / mean_lifetime)
-
-            self.sfr = interp1d(t, sfr, bounds_error=False, fill_value=0.)
+            self.sfr = sfr.ExponentialSFR(age, mean_lifetime)
+            self.sfr_params['mean_lifetime'] = mean_lifetime
 
         elif mode == 'manual':
 
             if callable(sfr_model):
 
                 self.sfr = sfr_model
+                self.sfr_params['sfr_model'] = self._function_identity(
+                    sfr_model)
 
             else:
 
                 warnings.warn('The sfr_model provided is not callable, '
                               'None is applied, i.e. constant star fomration.')
-                t1 = age
-                t0 = t1 + 1.
-                # current time = 0.
-                t2 = 0.
-                t3 = t2 - 1.
 
-                self.sfr = interp1d(np.array((30E9, t0, t1, t2, t3, -30E9)),
-                                    np.array((0., 0., 1., 1., 0., 0.)),
-                                    fill_value='extrapolate')
+                self.sfr = sfr.TophatSFR(age, 0.)
 
         else:
 
@@ -618,6 +1564,8 @@ class WDLF:
             4. 'lpcode_co_da_07' - Panei et al. 2007 CO DA
             5. 'lpcode_he_da_09' - Althaus et al. 2009 He DA
 
+            Set to None to leave the mass range empty.
+
             The naming convention follows this format:
             [model]_[core composition]_[atmosphere]_[publication year]
             where a few models continue to have extra property description
@@ -648,12 +1596,15 @@ class WDLF:
             5. 'lpcode_co_da_15_z00003' - Althaus et al. 2015 DA Z=0.00003
             6. 'lpcode_co_da_15_z0001' - Althaus et al. 2015 DA Z=0.0001
             7. 'lpcode_co_da_15_z0005' - Althaus et al. 2015 DA Z=0.0005
-            8. 'lpcode_co_da_17_y04' - Althaus et al. 2017 DB Y=0.4
-            9. 'lpcode_co_db_17' - Camisassa et al. 2017 DB
-            10. 'basti_co_da_10' - Salari et al. 2010 CO DA
-            11. 'basti_co_db_10' - Salari et al. 2010 CO DB
-            12. 'basti_co_da_10_nps' - Salari et al. 2010 CO DA, no phase separation
-            13. 'basti_co_db_10_nps' - Salari et al. 2010 CO DB, no phase separation
+            8. 'lpcode_co_db_17_z00005' - Althaus et al. 2017 DB Y=0.4
+            9. 'lpcode_co_db_17_z0001' - Althaus et al. 2017 DB Y=0.4
+            10. 'lpcode_co_db_17' - Camisassa et al. 2017 DB
+            11. 'basti_co_da_10' - Salari et al. 2010 CO DA
+            12. 'basti_co_db_10' - Salari et al. 2010 CO DB
+            13. 'basti_co_da_10_nps' - Salari et al. 2010 CO DA, no phase separation
+            14. 'basti_co_db_10_nps' - Salari et al. 2010 CO DB, no phase separation
+
+            Set to None to leave the mass range empty.
 
             The naming convention follows this format:
             [model]_[core composition]_[atmosphere]_[publication year]
@@ -690,6 +1641,8 @@ class WDLF:
             10. 'mesa_one_da_18' - Lauffer et al. 2018 ONe DA
             11. 'mesa_one_db_18' - Lauffer et al. 2018 ONe DB
 
+            Set to None to leave the mass range empty.
+
             The naming convention follows this format:
             [model]_[core composition]_[atmosphere]_[publication year]
             where a few models continue to have extra property description
@@ -704,103 +1657,109 @@ class WDLF:
         else:
             raise ValueError('Please provide a valid model.')
 
-    def compute_cooling_age_interpolator(self):
+    def compute_cooling_age_interpolator(self,
+                                         n_jobs=1,
+                                         backend='thread',
+                                         resample=False,
+                                         n_logL=1000,
+                                         n_mass=200):
         '''
         Compute the callable CloughTocher2DInterpolator of the cooling time
         of WDs. It needs to use float64 or it runs into float-point error
         at very faint lumnosity.
 
-        '''
+        Alternatively, the cooling tracks can be resampled onto a uniform
+        log(luminosity) x mass grid (see
+        `cooling_model_reader.resample_cooling_tracks`), which is cached for
+        the set of cooling models, and then the cooling time and the cooling
+        rate are interpolated bilinearly on the grid, which is much faster
+        to evaluate.
 
-        # Set the low mass cooling model, i.e. M < 0.5 M_sun
-        mass_low, cooling_model_low, _, _ = cmr.get_cooling_model(
-            self.low_mass_cooling_model, mass_range='low')
+        Parameters
+        ----------
+        n_jobs: int (Default: 1)
+            The number of workers to parse the cooling track files
+            concurrently. Set to -1 to use all the available cores.
+        backend: str (Default: 'thread')
+            Choose from 'thread' and 'process' for the pool of workers.
+        resample: boolean (Default: False)
+            Set to True to interpolate on the resampled uniform grid instead
+            of the scattered points of the tracks.
+        n_logL: int (Default: 1000)
+            The number of grid points in log(luminosity) if resample is True.
+        n_mass: int (Default: 200)
+            The number of grid points in mass if resample is True.
 
-        # Set the intermediate mass cooling model, i.e. 0.5 < M < 1.0 M_sun
-        mass_intermediate, cooling_model_intermediate, _, _ =\
-            cmr.get_cooling_model(
+        '''
+
+        # Only the age and the luminosity are needed from the cooling tracks
+        loader_kwargs = {
+            'columns': ['age', 'lum'],
+            'n_jobs': n_jobs,
+            'backend': backend
+        }
+
+        # The tracks of the low (M < 0.5 M_sun), intermediate
+        # (0.5 < M < 1.0 M_sun) and high (1.0 < M M_sun) mass cooling models
+        # in the flat representation, the mass ranges without a cooling model
+        # are left empty
+        track_mass = [np.zeros(0)]
+        track_offsets = [np.zeros(1, dtype=np.int64)]
+        age = [np.zeros(0)]
+        luminosity = [np.zeros(0)]
+
+        for mass_range, model in zip(
+            ['low', 'intermediate', 'high'], [
+                self.low_mass_cooling_model,
                 self.intermediate_mass_cooling_model,
-                mass_range='intermediate')
-
-        # Set the high mass cooling model, i.e. 1.0 < M M_sun
-        mass_high, cooling_model_high, _, _ = cmr.get_cooling_model(
-            self.high_mass_cooling_model, mass_range='high')
-
-        # Gather all the models in different mass ranges
-        if mass_low is not None:
-            # Reshaping the WD mass array to match the shape of the other two.
-            mass_low = np.concatenate(
-                np.array([[mass_low[i]] * len(model['age'])
-                          for i, model in enumerate(cooling_model_low)],
-                         dtype=object)).T.ravel().astype(np.float64)
-
-            # The luminosity of the WD at the corresponding mass and age
-            luminosity_low = np.concatenate([
-                i['lum'] for i in cooling_model_low
-            ]).reshape(-1).astype(np.float64)
-
-            # The luminosity of the WD at the corresponding mass and luminosity
-            age_low = np.concatenate([i['age'] for i in cooling_model_low
-                                      ]).reshape(-1).astype(np.float64)
-        else:
-            mass_low = []
-            luminosity_low = []
-            age_low = []
-            cooling_model_low = []
-
-        if mass_intermediate is not None:
-            # Reshaping the WD mass array to match the shape of the other two.
-            mass_intermediate = np.concatenate(
-                np.array(
-                    [[mass_intermediate[i]] * len(model['age'])
-                     for i, model in enumerate(cooling_model_intermediate)],
-                    dtype=object)).T.ravel().astype(np.float64)
-
-            # The luminosity of the WD at the corresponding mass and age
-            luminosity_intermediate = np.concatenate([
-                i['lum'] for i in cooling_model_intermediate
-            ]).reshape(-1).astype(np.float64)
-
-            # The luminosity of the WD at the corresponding mass and luminosity
-            age_intermediate = np.concatenate([
-                i['age'] for i in cooling_model_intermediate
-            ]).reshape(-1).astype(np.float64)
-        else:
-            mass_intermediate = []
-            luminosity_intermediate = []
-            age_intermediate = []
-            cooling_model_intermediate = []
-
-        if mass_high is not None:
-            # Reshaping the WD mass array to match the shape of the other two.
-            mass_high = np.concatenate(
-                np.array([[mass_high[i]] * len(model['age'])
-                          for i, model in enumerate(cooling_model_high)],
-                         dtype=object)).T.ravel().astype(np.float64)
-
-            # The luminosity of the WD at the corresponding mass and age
-            luminosity_high = np.concatenate([
-                i['lum'] for i in cooling_model_high
-            ]).reshape(-1).astype(np.float64)
-
-            # The luminosity of the WD at the corresponding mass and luminosity
-            age_high = np.concatenate([i['age'] for i in cooling_model_high
-                                       ]).reshape(-1).astype(np.float64)
+                self.high_mass_cooling_model
+            ]):
 
-        else:
-            mass_high = []
-            luminosity_high = []
-            age_high = []
-            cooling_model_high = []
+            if model is None:
+
+                continue
+
+            mass, offsets, tracks = cmr.get_cooling_tracks(
+                model, mass_range=mass_range).get_flat(**loader_kwargs)
+
+            track_mass.append(mass)
+            track_offsets.append(offsets[1:] + track_offsets[-1][-1])
+            age.append(tracks['age'])
+            luminosity.append(tracks['lum'])
+
+        # The masses of the tracks and the offsets of the tracks in the
+        # flattened self.mass, self.luminosity and self.age
+        self.cooling_model_mass = np.concatenate(
+            track_mass).astype(np.float64)
+        self.cooling_model_offsets = np.concatenate(track_offsets)
+
+        # The WD mass, luminosity and age of every point on the tracks
+        self.mass = np.repeat(self.cooling_model_mass,
+                              np.diff(self.cooling_model_offsets))
+        self.luminosity = np.concatenate(luminosity).astype(np.float64)
+        self.age = np.concatenate(age).astype(np.float64)
+
+        # The configuration of the cooling interpolators is kept with them,
+        # the cooling models can be set again without recomputing them
+        self.cooling_interpolator_config = {
+            'low_mass_cooling_model': self.low_mass_cooling_model,
+            'intermediate_mass_cooling_model':
+            self.intermediate_mass_cooling_model,
+            'high_mass_cooling_model': self.high_mass_cooling_model,
+            'cooling_grid': {
+                'n_logL': n_logL,
+                'n_mass': n_mass
+            } if resample else None
+        }
 
-        self.cooling_model_grid = np.concatenate(
-            (cooling_model_low, cooling_model_intermediate,
-             cooling_model_high))
+        if resample:
 
-        self.mass = np.concatenate((mass_low, mass_intermediate, mass_high))
-        self.luminosity = np.concatenate(
-            (luminosity_low, luminosity_intermediate, luminosity_high))
-        self.age = np.concatenate((age_low, age_intermediate, age_high))
+            self._set_cooling_grid_interpolator(n_logL, n_mass)
+
+            return
+
+        self.cooling_grid = None
+        self.cooling_grid_params = None
 
         self.cooling_interpolator = CloughTocher2DInterpolator(
             (np.log10(self.luminosity), self.mass),
@@ -823,6 +1782,170 @@ class WDLF:
             maxiter=1000000,
             rescale=True)
 
+    def _set_cooling_grid_interpolator(self, n_logL, n_mass):
+        '''
+        Set the cooling time and cooling rate interpolators on the uniform
+        grid resampled from the cooling tracks.
+
+        Parameters
+        ----------
+        n_logL: int
+            The number of grid points in log(luminosity).
+        n_mass: int
+            The number of grid points in mass.
+
+        '''
+
+        key = (self.low_mass_cooling_model,
+               self.intermediate_mass_cooling_model,
+               self.high_mass_cooling_model, n_logL, n_mass)
+
+        if key not in self._cooling_grid_cache:
+
+            logL, mass, age = cmr.resample_cooling_tracks(
+                self.cooling_model_mass,
+                self.cooling_model_offsets, {
+                    'age': self.age,
+                    'lum': self.luminosity
+                },
+                n_logL=n_logL,
+                n_mass=n_mass)
+
+            # cooling((L+1), m) - cooling(L, m) is always negative
+            dLdt = -np.gradient(age, logL, axis=0)
+            dLdt[dLdt < 0.] = 0.
+
+            self._cooling_grid_cache[key] = {
+                'logL': logL,
+                'mass': mass,
+                'age': age,
+                'dLdt': dLdt
+            }
+
+        self.cooling_grid = self._cooling_grid_cache[key]
+        self.cooling_grid_params = {'n_logL': n_logL, 'n_mass': n_mass}
+
+        self.cooling_interpolator = UniformGridInterpolator2D(
+            self.cooling_grid['logL'],
+            self.cooling_grid['mass'],
+            self.cooling_grid['age'],
+            fill_value=-np.inf)
+
+        self.cooling_rate_interpolator = UniformGridInterpolator2D(
+            self.cooling_grid['logL'],
+            self.cooling_grid['mass'],
+            self.cooling_grid['dLdt'],
+            fill_value=0.)
+
+        self.dLdt = self.cooling_rate_interpolator(np.log10(self.luminosity),
+                                                   self.mass)
+
+    def _memoise_lookup(self, key, Mag, passband, config, store,
+                        memoise=True):
+        '''
+        Look up the result of compute_density() in the in-memory cache, and
+        then in the store. If found, the result is set to self.Mag,
+        self.number_density, self.number_density_err and
+        self.integration_report.
+
+        Parameters
+        ----------
+        key: str
+            The hash of the configurations and the magnitude grid.
+        Mag: array of float
+            The magnitude grid.
+        passband: str or list of str
+            The passband(s).
+        config: dict
+            The model configuration of each passband.
+        store: WDPhotTools.wdlf_store.WDLFStore
+            The store, can be None.
+        memoise: boolean (Default: True)
+            Set to False to only look up the store, the in-memory cache is
+            neither read nor updated.
+
+        Return
+        ------
+        True if the result is found, False otherwise.
+
+        '''
+
+        if memoise and (key in self._cache):
+
+            self._cache.move_to_end(key)
+            result = self._cache[key]
+
+        elif store is not None:
+
+            stored = [store.lookup(config[p], Mag) for p in config]
+
+            if any(i is None for i in stored):
+
+                return False
+
+            if isinstance(passband, str):
+
+                result = {
+                    'number_density': stored[0]['number_density'],
+                    'number_density_err': stored[0]['number_density_err'],
+                    'integration_report': None
+                }
+
+            else:
+
+                result = {
+                    'number_density': {
+                        p: i['number_density']
+                        for p, i in zip(config, stored)
+                    },
+                    'number_density_err': {
+                        p: i['number_density_err']
+                        for p, i in zip(config, stored)
+                    },
+                    'integration_report': None
+                }
+
+            if memoise:
+
+                self._cache[key] = result
+                self._memoise_trim()
+
+        else:
+
+            return False
+
+        self.Mag = Mag.copy()
+        self.number_density = copy.deepcopy(result['number_density'])
+        self.number_density_err = copy.deepcopy(result['number_density_err'])
+        self.integration_report = copy.deepcopy(result['integration_report'])
+
+        return True
+
+    def _memoise_add(self, key):
+        '''
+        Add the current result of compute_density() to the in-memory cache.
+
+        Parameters
+        ----------
+        key: str
+            The hash of the configurations and the magnitude grid.
+
+        '''
+
+        self._cache[key] = {
+            'number_density': copy.deepcopy(self.number_density),
+            'number_density_err': copy.deepcopy(self.number_density_err),
+            'integration_report': copy.deepcopy(self.integration_report)
+        }
+        self._cache.move_to_end(key)
+        self._memoise_trim()
+
+    def _memoise_trim(self):
+
+        while len(self._cache) > self.cache_size:
+
+            self._cache.popitem(last=False)
+
     def compute_density(self,
                         Mag,
                         passband='Mbol',
@@ -832,54 +1955,119 @@ class WDLF:
                         n_points=100,
                         epsabs=1e-6,
                         epsrel=1e-6,
+                        da_fraction=None,
+                        full_output=False,
+                        adaptive_tolerance=None,
+                        max_refinement=5,
                         normed=True,
                         save_csv=False,
                         folder=None,
-                        filename=None):
+                        filename=None,
+                        store=None,
+                        memoise=False):
         '''
         Compute the density based on the pre-selected models: (1) MS lifetime
         model, (2) initial mass function, (3) initial-final mass relation, and
         (4) WD cooling model. It integrates over the function _integrand().
 
+        If a list of passbands is provided, the densities of all the
+        passbands are integrated together at the given magnitudes as one
+        vector-valued integral over the MS mass, so the IFMR, IMF, MS
+        lifetime, cooling time, SFR and cooling rate are evaluated once for
+        all the passbands, and only the mapping from each passband to the
+        bolometric magnitude is evaluated per passband. The error is
+        controlled on the largest of the densities at each magnitude.
+
         Parameters
         ----------
         Mag: float or array of float
-            Absolute magnitude in the given passband
-        passband: str (Default: Mbol)
-            The passband to be integrated in.
+            Absolute magnitude in the given passband.
+        passband: str or list of str (Default: Mbol)
+            The passband(s) to be integrated in. If a list is provided, the
+            number density is returned as a dictionary with the passbands
+            as the keys.
         atmosphere: str (Default: H)
-            The atmosphere type.
+            The atmosphere type, it is ignored if da_fraction is provided.
         M_max: float (Deafult: 8.0)
             The upper limit of the main sequence stellar mass. This may not
             be used if it exceeds the upper bound of the IFMR model.
         limit: int (Default: 10000)
             The maximum number of steps of integration
         n_points: int (Default: 100)
-            The number of points for initial integration sampling,
-            too small a value will lead to failed integration because the
-            integrato can underestimate the density if the star formation
-            periods are short. While too large a value will lead to
-            low performance due to oversampling, though the accuracy is
-            guaranteed. The default value is sufficient to compute WDLF
-            for star burst as short as 1E8 years. For burst as short as
-            1E7, we recommand an n_points of 1000 or larger.
+            The number of points for initial integration sampling, it is
+            only used as the fallback when the scan for the breakpoints of
+            the SFR returns None, i.e. for an SFR without breakpoints (e.g.
+            a callable supplied through the 'manual' mode of
+            set_sfr_model). Otherwise, the integration is broken at the MS
+            masses where the SFR is discontinuous. For the fallback, too
+            small a value can underestimate the density if the star
+            formation periods are short, while too large a value will lead
+            to low performance due to oversampling.
         epsabs: float (Default: 1e-6)
             The absolute tolerance of the integration step. For star burst,
             we recommend a step smaller than 1e-8.
         epsrel: float (Default: 1e-6)
             The relative tolerance of the integration step. For star burst,
             we recommend a step smaller than 1e-8.
+        da_fraction: float or callable function (Default: None)
+            The fraction of DA in a mixed population of DA and DB, either as
+            a constant or as a function of Teff. The cooling, IMF and SFR
+            computations are shared between the two atmospheres, only the
+            mapping from the passband to the bolometric magnitude is
+            evaluated for each of them. Set to None to use a single
+            atmosphere type.
+        full_output: boolean (Default: False)
+            Set to True to also return the integration report, which is
+            always stored in self.integration_report. It is a dictionary of
+            the per-bin 'error' estimates (normalised in the same way as the
+            density), the number of function evaluations 'neval', the
+            warning 'message' from the integrator (empty if converged) and
+            the final 'epsabs' and 'epsrel' of each bin. If multiple
+            passbands are provided, it is a dictionary of the reports with
+            the passbands as the keys.
+        adaptive_tolerance: float (Default: None)
+            If provided, the bins of which the error estimate is larger than
+            adaptive_tolerance times the sum of the density are integrated
+            again with the epsabs and epsrel tightened by a factor of 10,
+            until all the errors are insignificant or max_refinement is
+            reached. This allows loose initial tolerances without
+            over-tightening the well-converged bins.
+        max_refinement: int (Default: 5)
+            The maximum number of tightening of the tolerances, only used if
+            adaptive_tolerance is provided.
         normed: boolean (Default: True)
             Set to True to return a WDLF sum to 1. Otherwise, it is arbitrary
             to the integrator.
         save_csv: boolean (Default: False)
-            Set to True to save the WDLF as CSV files. One CSV per T0.
+            Set to True to save the WDLF as CSV files. One CSV per T0. If
+            multiple passbands are provided, they are saved as columns in
+            the same CSV.
         folder: str (Default: None)
             The relative or absolute path to destination, the current working
             directory will be used if None.
         filename: str (Default: None)
             The filename of the csv. The default filename will be used
             if None.
+        store: str or WDPhotTools.wdlf_store.WDLFStore (Default: None)
+            The store (or the path to the store) to which the WDLF is
+            appended together with its full model configuration. A
+            configuration already in the store is looked up before the
+            WDLF is computed, and it is returned without being computed or
+            written again. If multiple passbands are provided, the WDLF of
+            each passband is stored separately. Multiple processes can
+            write to the same store, a path is opened only once per process
+            with wdlf_store.load_store().
+        memoise: boolean (Default: False)
+            Set to True to return the result of an identical earlier call
+            without recomputing it. The results are kept in an in-memory
+            LRU cache of at most self.cache_size entries, and are looked up
+            in the store (if provided) when they are not in memory. The
+            calls are identified by the hash of the full model
+            configuration (including the identities of the user-supplied
+            functions and the cooling models from which the current cooling
+            interpolators are built), the magnitude grid and the
+            tolerances. The integration report is not available for the results retrieved
+            from the store, and no CSV is saved for a memoised result.
 
         '''
 
@@ -887,48 +2075,144 @@ class WDLF:
 
             self.compute_cooling_age_interpolator()
 
-        Mag = np.asarray(Mag).reshape(-1)
-
-        number_density = np.zeros_like(Mag)
+        Mag = np.asarray(Mag, dtype=np.float64).reshape(-1)
 
-        self.Mag_to_Mbol_itp = self.atm_reader.interp_atm(
-            dependent='Mbol',
-            atmosphere=atmosphere,
-            independent=['mass', passband])
+        self.da_fraction = da_fraction
 
         print("The input age is {0:.2f} Gyr.".format(self.T0 / 1e9))
 
-        M_upper_bound = M_max
+        settings = {
+            'atmosphere': atmosphere,
+            'da_fraction': da_fraction,
+            'M_max': M_max,
+            'limit': limit,
+            'n_points': n_points,
+            'epsabs': epsabs,
+            'epsrel': epsrel,
+            'adaptive_tolerance': adaptive_tolerance,
+            'max_refinement': max_refinement,
+            'normed': normed
+        }
 
-        for i, Mag_i in enumerate(Mag):
+        # The atmosphere is not used for a mixed population
+        if da_fraction is not None:
 
-            M_min = optimize.fminbound(self._find_M_min,
-                                       0.5,
-                                       M_upper_bound,
-                                       args=[Mag_i],
-                                       xtol=1e-5,
-                                       maxfun=10000)
+            del settings['atmosphere']
 
-            points = 10.**np.linspace(np.log10(M_min), np.log10(M_max),
-                                      n_points)
+        if isinstance(passband, str):
 
-            # Note that the points are needed because it can fail to
-            # integrate if the star burst is too short
-            number_density[i] = integrate.quad(self._integrand,
-                                               M_min,
-                                               M_max,
-                                               args=[Mag_i],
-                                               limit=limit,
-                                               points=points,
-                                               epsabs=epsabs,
-                                               epsrel=epsrel)[0]
+            config = {
+                passband: self._model_config(passband=passband, **settings)
+            }
 
-            M_upper_bound = M_min
+        else:
+
+            passband = list(passband)
+            config = {
+                p: self._model_config(passband=p, **settings)
+                for p in passband
+            }
+
+        if isinstance(store, str):
+
+            store = wdlf_store.load_store(store)
+
+        if memoise or (store is not None):
+
+            key = wdlf_store.WDLFStore.config_hash(config, Mag)
+
+            if self._memoise_lookup(key, Mag, passband, config, store,
+                                    memoise):
+
+                if full_output:
+
+                    return self.Mag, self.number_density,\
+                        self.integration_report
+
+                return self.Mag, self.number_density
+
+        if not isinstance(passband, str):
+
+            # The WDLFs of all the passbands are integrated together at
+            # the given magnitudes
+            number_density, number_density_err, integration_report =\
+                self._integrate_passbands(Mag, passband, atmosphere,
+                                          da_fraction, M_max, limit, n_points,
+                                          epsabs, epsrel, adaptive_tolerance,
+                                          max_refinement)
+
+            for p in passband:
+
+                # Normalise the WDLFs
+                if normed:
+
+                    norm = np.nansum(number_density[p])
+                    number_density[p] /= norm
+                    number_density_err[p] /= norm
+
+            if save_csv:
+
+                if folder is None:
+
+                    _folder = os.getcwd()
+
+                else:
+
+                    _folder = os.path.abspath(folder)
+
+                if filename is None:
+
+                    _filename = "{0:.2f}Gyr_".format(self.T0/1e9) +\
+                        self.sfr_mode + '_' + self.ms_model + '_' +\
+                        self.ifmr_model + '_' +\
+                        self.low_mass_cooling_model + '_' +\
+                        self.intermediate_mass_cooling_model + '_' +\
+                        self.high_mass_cooling_model + '_' +\
+                        '_'.join(passband) + '.csv'
+
+                else:
+
+                    _filename = filename
+
+                np.savetxt(os.path.join(_folder, _filename),
+                           np.column_stack([Mag] + [
+                               number_density[p] for p in passband]),
+                           delimiter=',',
+                           header=','.join(['Mag'] + passband))
+
+            if store is not None:
+
+                for p in passband:
+
+                    store.add(config[p], Mag, number_density[p],
+                              number_density_err[p])
+
+            self.Mag = Mag
+            self.number_density = number_density
+            self.number_density_err = number_density_err
+            self.integration_report = integration_report
+
+            if memoise:
+
+                self._memoise_add(key)
+
+            if full_output:
+
+                return Mag, number_density, integration_report
+
+            return Mag, number_density
+
+        number_density, number_density_err, integration_report =\
+            self._integrate_passband(Mag, passband, atmosphere, da_fraction,
+                                     M_max, limit, n_points, epsabs, epsrel,
+                                     adaptive_tolerance, max_refinement)
 
         # Normalise the WDLF
         if normed:
 
-            number_density /= np.nansum(number_density)
+            norm = np.nansum(number_density)
+            number_density /= norm
+            number_density_err /= norm
 
         if save_csv:
 
@@ -957,8 +2241,23 @@ class WDLF:
                        np.column_stack((Mag, number_density)),
                        delimiter=',')
 
+        if store is not None:
+
+            store.add(config[passband], Mag, number_density,
+                      number_density_err)
+
         self.Mag = Mag
         self.number_density = number_density
+        self.number_density_err = number_density_err
+        self.integration_report = integration_report
+
+        if memoise:
+
+            self._memoise_add(key)
+
+        if full_output:
+
+            return Mag, number_density, self.integration_report
 
         return Mag, number_density
 
@@ -1427,17 +2726,38 @@ class WDLF:
 
             fig = plt.figure(figsize=figsize)
 
-        if log:
+        # The WDLFs in multiple passbands are stored in a dictionary
+        if isinstance(self.number_density, dict):
 
-            _density = np.log10(self.number_density)
+            number_density = self.number_density
 
         else:
 
-            _density = self.number_density
+            number_density = {None: self.number_density}
+
+        _density_all = []
+
+        for passband, density in number_density.items():
+
+            if log:
+
+                _density = np.log10(density)
+
+            else:
+
+                _density = density
+
+            label = "{0:.2f}".format(self.T0 / 1e9) + ' Gyr'
+
+            if passband is not None:
+
+                label = label + ' ' + passband
+
+            plt.plot(self.Mag, _density, label=label)
+            _density_all.append(_density)
+
+        _density = np.concatenate(_density_all)
 
-        plt.plot(self.Mag,
-                 _density,
-                 label="{0:.2f}".format(self.T0 / 1e9) + ' Gyr')
         plt.xlim(0, 20)
         plt.xlabel(r'M$_{\mathrm{bol}}$ / mag')
 
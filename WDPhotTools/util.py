@@ -1,9 +1,43 @@
 import numpy as np
+import os
+import scipy
 from scipy import interpolate
+import tempfile
+import warnings
 
 
 # Taken from
 # https://github.com/pig2015/mathpy/blob/master/polation/globalspline.py
+def temporary_path(filepath):
+    '''
+    Create a unique temporary file in the folder of the filepath, which is
+    written and then moved to the filepath with os.replace(), so that the
+    concurrent writers of the same file do not write to the same temporary
+    file, and a partially written file is never read.
+
+    Parameters
+    ----------
+    filepath: str
+        The path of the file to be written.
+
+    Return
+    ------
+    The path of the temporary file.
+
+    '''
+
+    with tempfile.NamedTemporaryFile(
+            dir=os.path.dirname(os.path.abspath(filepath)),
+            prefix=os.path.basename(filepath) + '.',
+            suffix='.tmp',
+            delete=False) as f:
+
+        # The same permission as the files created by open()
+        os.chmod(f.name, 0o644)
+
+        return f.name
+
+
 class GlobalSpline2D(interpolate.interp2d):
     def __init__(self, x, y, z, kind='linear'):
 
@@ -150,3 +184,553 @@ class GlobalSpline2D(interpolate.interp2d):
             zss = zss[0]
 
         return np.array(zss)
+
+
+class UniformGridInterpolator2D:
+    '''
+    Bilinear interpolation of a 2D grid which is uniformly spaced in both
+    dimensions. The grid cell is found arithmetically instead of searched,
+    and a pair of floats is interpolated without any numpy overhead, so it
+    is cheap to call from a scalar integrator as well as on arrays. The grid
+    can be masked with NaN, the interpolation returns fill_value outside the
+    grid or where any of the four corners of the cell is NaN.
+
+    Parameters
+    ----------
+    x: array of float
+        The uniformly spaced ascending coordinates of the first dimension.
+    y: array of float
+        The uniformly spaced ascending coordinates of the second dimension.
+    z: 2D array of float
+        The values on the grid, in the shape of (len(x), len(y)).
+    fill_value: float (Default: np.nan)
+        The value returned outside the grid or in the masked cells.
+
+    '''
+    def __init__(self, x, y, z, fill_value=np.nan):
+
+        x = np.asarray(x, dtype=np.float64).reshape(-1)
+        y = np.asarray(y, dtype=np.float64).reshape(-1)
+        z = np.asarray(z, dtype=np.float64)
+
+        if (len(x) < 2) or (len(y) < 2):
+
+            raise ValueError('The grid has to have at least 2 points in '
+                             'each dimension.')
+
+        if z.shape != (len(x), len(y)):
+
+            raise ValueError('z has to be in the shape of (len(x), len(y)), '
+                             'got {}.'.format(z.shape))
+
+        self.x = x
+        self.y = y
+        self.z = np.ascontiguousarray(z)
+        self.fill_value = fill_value
+
+        self._x0 = float(x[0])
+        self._y0 = float(y[0])
+        self._dx = float(x[-1] - x[0]) / (len(x) - 1)
+        self._dy = float(y[-1] - y[0]) / (len(y) - 1)
+        self._nx = len(x)
+        self._ny = len(y)
+
+        # Nested lists are faster than an ndarray to index with python ints
+        self._z_list = self.z.tolist()
+
+    def __call__(self, x, y):
+
+        if (np.ndim(x) == 0) and (np.ndim(y) == 0):
+
+            return self._evaluate_scalar(float(x), float(y))
+
+        return self._evaluate(np.asarray(x, dtype=np.float64),
+                              np.asarray(y, dtype=np.float64))
+
+    def _evaluate_scalar(self, x, y):
+
+        u = (x - self._x0) / self._dx
+        v = (y - self._y0) / self._dy
+
+        # This is also False for NaN
+        if not ((0. <= u <= self._nx - 1) and (0. <= v <= self._ny - 1)):
+
+            return self.fill_value
+
+        i = min(int(u), self._nx - 2)
+        j = min(int(v), self._ny - 2)
+        fu = u - i
+        fv = v - j
+
+        row_0 = self._z_list[i]
+        row_1 = self._z_list[i + 1]
+
+        value = ((row_0[j] * (1. - fu) + row_1[j] * fu) * (1. - fv) +
+                 (row_0[j + 1] * (1. - fu) + row_1[j + 1] * fu) * fv)
+
+        if value != value:
+
+            return self.fill_value
+
+        return value
+
+    def _evaluate(self, x, y):
+
+        x, y = np.broadcast_arrays(x, y)
+
+        u = (x - self._x0) / self._dx
+        v = (y - self._y0) / self._dy
+
+        inside = (u >= 0.) & (u <= self._nx - 1) & (v >= 0.) & (
+            v <= self._ny - 1)
+
+        u = np.where(inside, u, 0.)
+        v = np.where(inside, v, 0.)
+        i = np.minimum(u.astype(int), self._nx - 2)
+        j = np.minimum(v.astype(int), self._ny - 2)
+        fu = u - i
+        fv = v - j
+
+        z = self.z
+        value = ((z[i, j] * (1. - fu) + z[i + 1, j] * fu) * (1. - fv) +
+                 (z[i, j + 1] * (1. - fu) + z[i + 1, j + 1] * fu) * fv)
+
+        return np.where(inside & ~np.isnan(value), value, self.fill_value)
+
+
+class CloughTocher2DGradientInterpolator(
+        interpolate.CloughTocher2DInterpolator):
+    '''
+    The scipy.interpolate.CloughTocher2DInterpolator with the gradient of
+    the interpolant. The interpolant is a piecewise cubic Bezier polynomial
+    on the three sub-triangles of each triangle, its control points are
+    computed for all the triangles as in scipy, so the gradient is exact
+    and consistent with the interpolated values.
+
+    The control points are computed from the triangulation and the
+    estimated gradients at the vertices, which are not part of the public
+    API of scipy. They are computed and checked against the interpolated
+    values of scipy when the gradient is first evaluated, so that the
+    interpolators of which the gradient is never used cost no more than
+    the scipy ones. If they are not available or they do not match (e.g.
+    the internals of scipy have changed), the gradient is computed by the
+    central differences of the interpolated values instead, with a
+    warning.
+
+    Parameters
+    ----------
+    See `scipy.interpolate.CloughTocher2DInterpolator`.
+
+    '''
+
+    # The control points of each sub-triangle, which is opposite to the
+    # vertex of the smallest barycentric coordinate, in the order of
+    # b4^3, b4^2 p, b4^2 q, b4 p^2, b4 p q, b4 q^2, p^3, p^2 q, p q^2, q^3,
+    # where b4 is 3 times the smallest barycentric coordinate, p and q are
+    # the other two minus the smallest. The control points are indexed as
+    # _control_point_names.
+    _control_point_names = [
+        'c3000', 'c0300', 'c0030', 'c0003', 'c2100', 'c2010', 'c2001',
+        'c0210', 'c0201', 'c0021', 'c1200', 'c1020', 'c1002', 'c0120',
+        'c0102', 'c0012', 'c1101', 'c1011', 'c0111'
+    ]
+    _sub_triangles = [
+        [
+            'c0003', 'c0102', 'c0012', 'c0201', 'c0111', 'c0021', 'c0300',
+            'c0210', 'c0120', 'c0030'
+        ],
+        [
+            'c0003', 'c1002', 'c0012', 'c2001', 'c1011', 'c0021', 'c3000',
+            'c2010', 'c1020', 'c0030'
+        ],
+        [
+            'c0003', 'c1002', 'c0102', 'c2001', 'c1101', 'c0201', 'c3000',
+            'c2100', 'c1200', 'c0300'
+        ],
+    ]
+    _pq = np.array([[1, 2], [0, 2], [0, 1]])
+
+    def __init__(self, *args, **kwargs):
+
+        super().__init__(*args, **kwargs)
+
+        # None until the control points are computed and checked
+        self._analytic = None
+
+    @property
+    def analytic(self):
+        '''
+        True if the gradient is computed from the control points, False if
+        it is computed by the central differences.
+
+        '''
+
+        if self._analytic is None:
+
+            self._analytic = self._prepare_control_points()
+
+        return self._analytic
+
+    @analytic.setter
+    def analytic(self, analytic):
+
+        self._analytic = analytic
+
+    def _prepare_control_points(self):
+        '''
+        Compute the control points and check them against scipy.
+
+        '''
+
+        sub_triangle_index = np.array(
+            [[self._control_point_names.index(c) for c in i]
+             for i in self._sub_triangles])
+
+        try:
+
+            # (nsimplex, nsubtriangle, ncontrol, nvalue)
+            self._control_points = self._get_control_points()[
+                :, sub_triangle_index]
+
+            # Python lists are faster to index for a single point
+            self._transform = self.tri.transform.tolist()
+            self._pq_list = self._pq.tolist()
+            self._values_shape = tuple(self.values_shape)
+            analytic = self._check_control_points()
+
+        except (AttributeError, IndexError, TypeError, ValueError):
+
+            analytic = False
+
+        if not analytic:
+
+            warnings.warn('The internals of scipy {} are not as expected, the '
+                          'gradient is computed by central differences '
+                          'instead.'.format(scipy.__version__))
+
+        return analytic
+
+    def _check_control_points(self):
+        '''
+        Check the values of the control points against scipy at three points
+        in each triangle, one in each sub-triangle.
+
+        '''
+
+        weights = np.array([[0.6, 0.3, 0.1], [0.1, 0.6, 0.3], [0.3, 0.1, 0.6]])
+        xi = np.einsum('wk,skd->swd', weights,
+                       self.tri.points[self.tri.simplices]).reshape(-1, 2)
+        value = self._evaluate_with_gradient(xi)[0]
+
+        if self.scale is not None:
+
+            xi = xi * self.scale + self.offset
+
+        expected = super().__call__(xi).reshape(value.shape)
+
+        return value.shape == expected.shape and np.allclose(
+            value,
+            expected,
+            rtol=1e-8,
+            atol=1e-8 * np.nanmax(np.abs(expected), initial=1.),
+            equal_nan=True)
+
+    def _get_control_points(self):
+
+        tri = self.tri
+        points = tri.points[tri.simplices]
+        f = self.values[tri.simplices]
+        df = self.grad[tri.simplices]
+
+        e12 = points[:, 1] - points[:, 0]
+        e23 = points[:, 2] - points[:, 1]
+        e31 = points[:, 0] - points[:, 2]
+
+        def directional(i, e):
+
+            return np.einsum('svd,sd->sv', df[:, i], e)
+
+        c = {}
+        c['c3000'] = f[:, 0]
+        c['c0300'] = f[:, 1]
+        c['c0030'] = f[:, 2]
+        c['c2100'] = c['c3000'] + directional(0, e12) / 3.
+        c['c2010'] = c['c3000'] - directional(0, e31) / 3.
+        c['c1200'] = c['c0300'] - directional(1, e12) / 3.
+        c['c0210'] = c['c0300'] + directional(1, e23) / 3.
+        c['c1020'] = c['c0030'] + directional(2, e31) / 3.
+        c['c0120'] = c['c0030'] - directional(2, e23) / 3.
+        c['c2001'] = (c['c2100'] + c['c2010'] + c['c3000']) / 3.
+        c['c0201'] = (c['c1200'] + c['c0300'] + c['c0210']) / 3.
+        c['c0021'] = (c['c1020'] + c['c0120'] + c['c0030']) / 3.
+
+        # The direction of the cross-boundary derivative of each edge points
+        # to the centroid of the neighbour, which keeps the interpolant
+        # affine invariant, see scipy
+        centroid = np.mean(points, axis=1)
+        neighbour_centroid = centroid[tri.neighbors]
+        b = np.einsum('sij,skj->ski', tri.transform[:, :2],
+                      neighbour_centroid - tri.transform[:, None, 2])
+        b = np.concatenate((b, 1. - np.sum(b, axis=2, keepdims=True)), axis=2)
+        with np.errstate(divide='ignore', invalid='ignore'):
+
+            g = np.column_stack(
+                ((2. * b[:, 0, 2] + b[:, 0, 1] - 1.) /
+                 (2. - 3. * b[:, 0, 2] - 3. * b[:, 0, 1]),
+                 (2. * b[:, 1, 0] + b[:, 1, 2] - 1.) /
+                 (2. - 3. * b[:, 1, 0] - 3. * b[:, 1, 2]),
+                 (2. * b[:, 2, 1] + b[:, 2, 0] - 1.) /
+                 (2. - 3. * b[:, 2, 1] - 3. * b[:, 2, 0])))
+
+        g[tri.neighbors == -1] = -0.5
+        g = g[:, :, None]
+
+        c['c0111'] = (g[:, 0] *
+                      (-c['c0300'] + 3. * c['c0210'] - 3. * c['c0120'] +
+                       c['c0030']) + (-c['c0300'] + 2. * c['c0210'] -
+                                      c['c0120'] + c['c0021'] + c['c0201'])) / 2.
+        c['c1011'] = (g[:, 1] *
+                      (-c['c0030'] + 3. * c['c1020'] - 3. * c['c2010'] +
+                       c['c3000']) + (-c['c0030'] + 2. * c['c1020'] -
+                                      c['c2010'] + c['c2001'] + c['c0021'])) / 2.
+        c['c1101'] = (g[:, 2] *
+                      (-c['c3000'] + 3. * c['c2100'] - 3. * c['c1200'] +
+                       c['c0300']) + (-c['c3000'] + 2. * c['c2100'] -
+                                      c['c1200'] + c['c2001'] + c['c0201'])) / 2.
+        c['c1002'] = (c['c1101'] + c['c1011'] + c['c2001']) / 3.
+        c['c0102'] = (c['c1101'] + c['c0111'] + c['c0201']) / 3.
+        c['c0012'] = (c['c1011'] + c['c0111'] + c['c0021']) / 3.
+        c['c0003'] = (c['c1002'] + c['c0102'] + c['c0012']) / 3.
+
+        # (nsimplex, ncontrol, nvalue)
+        return np.stack([c[i] for i in self._control_point_names], axis=1)
+
+    def _points(self, *args):
+
+        if len(args) == 1:
+
+            xi = np.asarray(args[0], dtype=np.float64)
+
+        else:
+
+            xi = np.stack(np.broadcast_arrays(
+                *[np.asarray(i, dtype=np.float64) for i in args]),
+                          axis=-1)
+
+        shape = xi.shape[:-1]
+        xi = xi.reshape(-1, 2)
+
+        if self.scale is not None:
+
+            xi = (xi - self.offset) / self.scale
+
+        return xi, shape
+
+    @staticmethod
+    def _basis(b4, p, q):
+        '''
+        The cubic Bernstein basis of a sub-triangle and its derivatives
+        with respect to b4, p and q, each in the shape of (..., 10).
+
+        '''
+
+        zero = np.zeros_like(b4)
+        value = np.stack(
+            (b4**3., 3. * b4**2. * p, 3. * b4**2. * q, 3. * b4 * p**2.,
+             6. * b4 * p * q, 3. * b4 * q**2., p**3., 3. * p**2. * q,
+             3. * p * q**2., q**3.),
+            axis=-1)
+        d_b4 = np.stack((3. * b4**2., 6. * b4 * p, 6. * b4 * q, 3. * p**2.,
+                         6. * p * q, 3. * q**2., zero, zero, zero, zero),
+                        axis=-1)
+        d_p = np.stack((zero, 3. * b4**2., zero, 6. * b4 * p, 6. * b4 * q,
+                        zero, 3. * p**2., 6. * p * q, 3. * q**2., zero),
+                       axis=-1)
+        d_q = np.stack((zero, zero, 3. * b4**2., zero, 6. * b4 * p,
+                        6. * b4 * q, zero, 3. * p**2., 6. * p * q, 3. * q**2.),
+                       axis=-1)
+
+        return value, d_b4, d_p, d_q
+
+    def _evaluate_with_gradient(self, xi):
+
+        n = len(xi)
+        simplex = self.tri.find_simplex(xi)
+        inside = simplex >= 0
+        simplex = np.where(inside, simplex, 0)
+        transform = self.tri.transform[simplex]
+
+        b = np.einsum('nij,nj->ni', transform[:, :2], xi - transform[:, 2])
+        b = np.column_stack((b, 1. - np.sum(b, axis=1)))
+        m = np.argmin(b, axis=1)
+        b_min = b[np.arange(n), m]
+        p = b[np.arange(n), self._pq[m, 0]] - b_min
+        q = b[np.arange(n), self._pq[m, 1]] - b_min
+
+        value, d_b4, d_p, d_q = self._basis(3. * b_min, p, q)
+
+        # The derivatives with respect to the barycentric coordinates, the
+        # third one is 1 minus the other two
+        d_b = np.zeros((n, 3, 10))
+        d_b[np.arange(n), m] = 3. * d_b4 - d_p - d_q
+        d_b[np.arange(n), self._pq[m, 0]] = d_p
+        d_b[np.arange(n), self._pq[m, 1]] = d_q
+        d_x = np.einsum('nkc,nkd->ndc', d_b[:, :2] - d_b[:, 2:],
+                        transform[:, :2])
+
+        # (n, 1 + 2, nvalue)
+        output = np.einsum('nkc,ncv->nkv',
+                           np.concatenate((value[:, None], d_x), axis=1),
+                           self._control_points[simplex, m])
+        value = output[:, 0]
+        gradient = np.moveaxis(output[:, 1:], 1, 2)
+
+        if self.scale is not None:
+
+            gradient = gradient / self.scale
+
+        value[~inside] = self.fill_value
+        gradient[~inside] = np.nan
+
+        return value, gradient
+
+    def _evaluate_with_gradient_single(self, x, y):
+
+        simplex = int(self.tri.find_simplex(np.array([[x, y]]))[0])
+
+        if simplex < 0:
+
+            return np.full(self.values.shape[1], self.fill_value), np.full(
+                (self.values.shape[1], 2), np.nan)
+
+        (t00, t01), (t10, t11), (r0, r1) = self._transform[simplex]
+        b0 = t00 * (x - r0) + t01 * (y - r1)
+        b1 = t10 * (x - r0) + t11 * (y - r1)
+        b = [b0, b1, 1. - b0 - b1]
+        m = b.index(min(b))
+        i, j = self._pq_list[m]
+        b4, p, q = 3. * b[m], b[i] - b[m], b[j] - b[m]
+
+        # The basis and its derivatives as in _basis() in plain floats
+        b4_2, p_2, q_2 = b4 * b4, p * p, q * q
+        value = [
+            b4_2 * b4, 3. * b4_2 * p, 3. * b4_2 * q, 3. * b4 * p_2,
+            6. * b4 * p * q, 3. * b4 * q_2, p_2 * p, 3. * p_2 * q,
+            3. * p * q_2, q_2 * q
+        ]
+        d_b4 = [
+            3. * b4_2, 6. * b4 * p, 6. * b4 * q, 3. * p_2, 6. * p * q,
+            3. * q_2, 0., 0., 0., 0.
+        ]
+        d_p = [
+            0., 3. * b4_2, 0., 6. * b4 * p, 6. * b4 * q, 0., 3. * p_2,
+            6. * p * q, 3. * q_2, 0.
+        ]
+        d_q = [
+            0., 0., 3. * b4_2, 0., 6. * b4 * p, 6. * b4 * q, 0., 3. * p_2,
+            6. * p * q, 3. * q_2
+        ]
+
+        d_b = [None] * 3
+        d_b[m] = [3. * u - v - w for u, v, w in zip(d_b4, d_p, d_q)]
+        d_b[i] = d_p
+        d_b[j] = d_q
+        d_0 = [u - w for u, w in zip(d_b[0], d_b[2])]
+        d_1 = [v - w for v, w in zip(d_b[1], d_b[2])]
+
+        output = np.array((value, [u * t00 + v * t10 for u, v in zip(d_0, d_1)],
+                           [u * t01 + v * t11 for u, v in zip(d_0, d_1)
+                            ])) @ self._control_points[simplex, m]
+
+        return output[0], output[1:].T
+
+    def value_and_gradient(self, *args):
+        '''
+        Evaluate the interpolant and its gradient together, which costs
+        about the same as evaluating the gradient alone.
+
+        Parameters
+        ----------
+        *args: array of float
+            The points as in __call__(), either an array of points in the
+            shape of (..., 2) or the two coordinates.
+
+        Return
+        ------
+        The interpolated values as __call__(), and the gradient in the shape
+        of the values with the derivatives with respect to the two
+        coordinates along the last axis, NaN outside the convex hull.
+
+        '''
+
+        if not self.analytic:
+
+            return self._central_differences(*args)
+
+        xi, shape = self._points(*args)
+
+        if (len(xi) == 1) and (self.scale is None):
+
+            value, gradient = self._evaluate_with_gradient_single(*xi[0])
+
+        else:
+
+            value, gradient = self._evaluate_with_gradient(xi)
+
+        return value.reshape(shape + self._values_shape), gradient.reshape(
+            shape + self._values_shape + (2, ))
+
+    def _central_differences(self, *args):
+        '''
+        The interpolated values and their gradient by the central
+        differences, with only the public API of scipy.
+
+        '''
+
+        if len(args) == 1:
+
+            xi = np.asarray(args[0], dtype=np.float64)
+
+        else:
+
+            xi = np.stack(np.broadcast_arrays(
+                *[np.asarray(i, dtype=np.float64) for i in args]),
+                          axis=-1)
+
+        shape = xi.shape[:-1]
+        xi = xi.reshape(-1, 2)
+        value = super().__call__(xi)
+        gradient = np.empty(value.shape + (2, ))
+
+        for k in range(2):
+
+            h = np.zeros_like(xi)
+            h[:, k] = 1e-6 * np.maximum(np.abs(xi[:, k]), 1.)
+            step = h[:, k].reshape((-1, ) + (1, ) * (value.ndim - 1))
+            gradient[..., k] = (super().__call__(xi + h) -
+                                super().__call__(xi - h)) / 2. / step
+
+        gradient[~np.isfinite(gradient)] = np.nan
+
+        return value.reshape(shape + value.shape[1:]), gradient.reshape(
+            shape + value.shape[1:] + (2, ))
+
+    def gradient(self, *args):
+        '''
+        Evaluate the gradient of the interpolant.
+
+        Parameters
+        ----------
+        *args: array of float
+            The points as in __call__(), either an array of points in the
+            shape of (..., 2) or the two coordinates.
+
+        Return
+        ------
+        The gradient in the shape of the output of __call__() with the
+        derivatives with respect to the two coordinates along the last
+        axis, NaN outside the convex hull.
+
+        '''
+
+        return self.value_and_gradient(*args)[1]
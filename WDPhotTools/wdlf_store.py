@@ -0,0 +1,428 @@
+import glob
+import hashlib
+import json
+import numpy as np
+import os
+import re
+import socket
+import threading
+import time
+
+# The opened stores, keyed by their paths and the process IDs
+_stores = {}
+
+
+def load_store(folder):
+    '''
+    Load the WDLF store at the given path, it is opened only once per path
+    in a process, so that all the WDLFs of a process are written by the
+    same writer.
+
+    Parameters
+    ----------
+    folder: str
+        The relative or absolute path to the store, see WDLFStore.
+
+    '''
+
+    # A forked process opens the store again as a new writer
+    key = (os.path.abspath(folder), os.getpid())
+
+    if key not in _stores:
+
+        _stores[key] = WDLFStore(key[0])
+
+    return _stores[key]
+
+
+class WDLFStore:
+    '''
+    A binary store of WDLFs and their model configurations. The WDLFs are
+    appended to a small number of binary shards, each of which holds the
+    magnitudes, the number densities and their errors of many WDLFs as
+    contiguous float64 blocks. An index maps the hash of a model
+    configuration and the magnitude grid to the shard, the offset and the
+    size of the WDLF, together with the full configuration, so that a
+    configuration is only stored once and can be retrieved without reading
+    the other shards.
+
+    The store is append-only: each writer writes to its own shards and its
+    own index fragment (one JSON line per WDLF) which are never rewritten,
+    so multiple processes can write to the same store concurrently without
+    losing each other's entries. The fragments of all the writers are
+    merged when the index is read, only the lines added since the last
+    read are parsed, and a WDLF added by another writer is found by
+    lookup() once it is written. If a WDLF is stored more than once (see
+    the overwrite of add()), the latest one is used. The writer of a
+    process is named after the host and the process ID, use load_store()
+    to open a store only once per process, and compact() to merge the
+    files of all the writers.
+
+    Parameters
+    ----------
+    folder: str
+        The relative or absolute path to the store, it will be created if
+        it does not exist.
+    shard_size: int (Default: 256)
+        The maximum number of WDLFs in a shard.
+    writer: str (Default: None)
+        The name of the writer, which identifies its shards and its index
+        fragment. It has to be unique among the concurrent writers, the
+        host name and the process ID are used if None.
+
+    '''
+
+    columns = ['Mag', 'number_density', 'number_density_err']
+
+    def __init__(self, folder, shard_size=256, writer=None):
+
+        self.folder = os.path.abspath(folder)
+        self.shard_size = shard_size
+
+        if writer is None:
+
+            writer = re.sub(r'[^A-Za-z0-9.-]', '-', '{}-{}'.format(
+                socket.gethostname(), os.getpid()))
+
+        self.writer = writer
+        self.index_path = os.path.join(self.folder,
+                                       'index_{}.jsonl'.format(writer))
+
+        if not os.path.exists(self.folder):
+
+            os.makedirs(self.folder, exist_ok=True)
+
+        self.index = {}
+
+        # The number of bytes of each index fragment which have been read
+        self._read_bytes = {}
+        self._lock = threading.RLock()
+        self.refresh()
+
+    def __len__(self):
+
+        return len(self.index)
+
+    def __contains__(self, key):
+
+        return key in self.index
+
+    def refresh(self):
+        '''
+        Read the index fragments of all the writers, including the WDLFs
+        added by the other writers since the last refresh.
+
+        '''
+
+        for path in sorted(
+                glob.glob(os.path.join(self.folder, 'index_*.jsonl'))):
+
+            with open(path, 'rb') as f:
+
+                f.seek(self._read_bytes.get(path, 0))
+
+                for line in f:
+
+                    # A line which is being written by another writer is
+                    # read again at the next refresh
+                    if not line.endswith(b'\n'):
+
+                        break
+
+                    self._read_bytes[path] = self._read_bytes.get(
+                        path, 0) + len(line)
+
+                    try:
+
+                        entry = json.loads(line)
+
+                    except ValueError:
+
+                        continue
+
+                    key = entry.pop('key')
+
+                    # The latest WDLF of the same key is used
+                    if entry.get('time', 0.) >= self.index.get(key, {}).get(
+                            'time', 0.):
+
+                        self.index[key] = entry
+
+    @staticmethod
+    def config_hash(config, Mag):
+        '''
+        Hash a model configuration and a magnitude grid.
+
+        Parameters
+        ----------
+        config: dict
+            The JSON serialisable model configuration.
+        Mag: array of float
+            The magnitude grid.
+
+        Return
+        ------
+        The hexadecimal SHA-1 digest.
+
+        '''
+
+        sha1 = hashlib.sha1(
+            json.dumps(config, sort_keys=True, default=str).encode())
+        sha1.update(np.asarray(Mag, dtype=np.float64).reshape(-1).tobytes())
+
+        return sha1.hexdigest()
+
+    def _current_shard(self):
+
+        # The shards of this writer and the numbers of WDLFs in them
+        shards = {}
+
+        for entry in self.index.values():
+
+            if entry['shard'].startswith('wdlf_{}_'.format(self.writer)):
+
+                shards[entry['shard']] = shards.get(entry['shard'], 0) + 1
+
+        if len(shards) > 0:
+
+            shard = max(shards)
+
+            if shards[shard] < self.shard_size:
+
+                return shard
+
+        return 'wdlf_{}_{:05d}.bin'.format(self.writer, len(shards))
+
+    def add(self,
+            config,
+            Mag,
+            number_density,
+            number_density_err=None,
+            overwrite=False):
+        '''
+        Append a WDLF to the store, it is not written again if the same
+        configuration and magnitude grid is already in the store.
+
+        Parameters
+        ----------
+        config: dict
+            The JSON serialisable model configuration.
+        Mag: array of float
+            The magnitude grid.
+        number_density: array of float
+            The number density at the given magnitudes.
+        number_density_err: array of float (Default: None)
+            The error of the number density, it is stored as NaN if not
+            provided.
+        overwrite: boolean (Default: False)
+            Set to True to store the WDLF as a new entry even if the
+            configuration is already in the store.
+
+        Return
+        ------
+        The key of the WDLF in the store.
+
+        '''
+
+        Mag = np.asarray(Mag, dtype=np.float64).reshape(-1)
+        key = self.config_hash(config, Mag)
+
+        with self._lock:
+
+            if (key not in self.index) and (not overwrite):
+
+                self.refresh()
+
+            if (key in self.index) and (not overwrite):
+
+                return key
+
+            self._append(key, config, Mag, number_density,
+                         number_density_err)
+
+        return key
+
+    def _append(self, key, config, Mag, number_density, number_density_err):
+
+        if number_density_err is None:
+
+            number_density_err = np.full(len(Mag), np.nan)
+
+        data = np.concatenate([
+            np.asarray(i, dtype=np.float64).reshape(-1)
+            for i in (Mag, number_density, number_density_err)
+        ]).astype('<f8')
+
+        # Append the WDLF to the shard before it is indexed
+        shard = self._current_shard()
+
+        with open(os.path.join(self.folder, shard), 'ab') as f:
+
+            offset = f.tell() // 8
+            f.write(data.tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+
+        entry = {
+            'shard': shard,
+            'offset': offset,
+            'size': len(Mag),
+            'config': json.loads(json.dumps(config, default=str)),
+            'time': time.time()
+        }
+
+        with open(self.index_path, 'a') as f:
+
+            f.write(json.dumps(dict(entry, key=key)) + '\n')
+
+        self.index[key] = entry
+
+    def get(self, key):
+        '''
+        Retrieve a WDLF from the store.
+
+        Parameters
+        ----------
+        key: str
+            The key of the WDLF.
+
+        Return
+        ------
+        A dictionary of the 'Mag', 'number_density', 'number_density_err'
+        and the 'config'.
+
+        '''
+
+        entry = self.index[key]
+        size = entry['size']
+
+        with open(os.path.join(self.folder, entry['shard']), 'rb') as f:
+
+            f.seek(8 * entry['offset'])
+            data = np.fromfile(f, dtype='<f8', count=3 * size)
+
+        output = {
+            c: data[i * size:(i + 1) * size].astype(np.float64)
+            for i, c in enumerate(self.columns)
+        }
+        output['config'] = entry['config']
+
+        return output
+
+    def lookup(self, config, Mag):
+        '''
+        Retrieve a WDLF from the store by its configuration and magnitude
+        grid, e.g. to skip computing a WDLF which is already in the store.
+
+        Parameters
+        ----------
+        config: dict
+            The JSON serialisable model configuration.
+        Mag: array of float
+            The magnitude grid.
+
+        Return
+        ------
+        See get(), None if it is not in the store.
+
+        '''
+
+        key = self.config_hash(config, Mag)
+
+        # It may have been added by another writer
+        if key not in self.index:
+
+            self.refresh()
+
+        if key in self.index:
+
+            return self.get(key)
+
+        return None
+
+    def find(self, **kwargs):
+        '''
+        Find the WDLFs with the given model parameters, e.g.
+        find(ifmr_model='C08', passband='G3').
+
+        Return
+        ------
+        List of the keys of the matching WDLFs.
+
+        '''
+
+        self.refresh()
+
+        kwargs = json.loads(json.dumps(kwargs, default=str))
+
+        return [
+            key for key, entry in self.index.items() if all(
+                entry['config'].get(k) == v for k, v in kwargs.items())
+        ]
+
+    def compact(self):
+        '''
+        Merge the shards and the index fragments of all the writers into
+        the shards and the index fragment of this writer, the WDLFs which
+        have been overwritten are dropped. It must not be run while the
+        other writers are adding to the store.
+
+        '''
+
+        with self._lock:
+
+            self.refresh()
+
+            files = glob.glob(os.path.join(
+                self.folder, 'wdlf_*.bin')) + glob.glob(
+                    os.path.join(self.folder, 'index_*.jsonl'))
+
+            # Write the merged store under temporary names first, so that
+            # the store is never left without the WDLFs
+            index = {}
+            merged = [self.index_path]
+
+            with open(self.index_path + '.tmp', 'w') as index_file:
+
+                for n, key in enumerate(self.index):
+
+                    shard = 'wdlf_{}_{:05d}.bin'.format(
+                        self.writer, n // self.shard_size)
+                    path = os.path.join(self.folder, shard)
+
+                    if path in merged:
+
+                        mode = 'ab'
+
+                    else:
+
+                        mode = 'wb'
+                        merged.append(path)
+
+                    wdlf = self.get(key)
+
+                    with open(path + '.tmp', mode) as f:
+
+                        offset = f.tell() // 8
+                        f.write(
+                            np.concatenate([wdlf[c] for c in self.columns
+                                            ]).astype('<f8').tobytes())
+
+                    index[key] = dict(self.index[key],
+                                      shard=shard,
+                                      offset=offset)
+                    index_file.write(
+                        json.dumps(dict(index[key], key=key)) + '\n')
+
+            for path in merged:
+
+                os.replace(path + '.tmp', path)
+
+            for path in set(files) - set(merged):
+
+                os.remove(path)
+
+            self.index = index
+            self._read_bytes = {
+                self.index_path: os.path.getsize(self.index_path)
+            }
@@ -0,0 +1,85 @@
+import numpy as np
+import pytest
+from WDPhotTools.atmosphere_model_reader import atm_reader
+
+atm = atm_reader()
+
+
+# The projected single precision grid has to interpolate to the same values
+def test_single_precision_columns():
+    atm_single = atm_reader(columns=['G3', 'G3_BP'], single_precision=True)
+    assert atm_single.columns == [
+        'Teff', 'logg', 'mass', 'Mbol', 'G3', 'G3_BP', 'age'
+    ]
+    assert atm_single.model_da['G3'].dtype == np.float32
+    assert atm_single.model_da['Mbol'].dtype == np.float64
+    assert np.array_equal(atm_single.model_db['age'], atm.model_db['age'])
+    assert np.allclose(atm_single.model_da['G3'],
+                       atm.model_da['G3'],
+                       rtol=1e-6)
+    Mbol = np.linspace(5., 15., 20)
+    assert np.allclose(
+        atm_single.interp_atm(dependent=['G3', 'G3_BP'])(8.0, Mbol),
+        atm.interp_atm(dependent=['G3', 'G3_BP'])(8.0, Mbol),
+        atol=1e-5)
+
+
+
+# The analytic gradient on the atmosphere grid has to match the finite
+# differences, and so does the central difference fallback
+def test_interpolator_gradient():
+    itp = atm.interp_atm(dependent=['G3', 'G3_BP'],
+                         independent=['logg', 'Teff'])
+    assert itp.analytic
+    rng = np.random.default_rng(1)
+    x = np.column_stack(
+        (rng.uniform(7.2, 8.8, 50), rng.uniform(5000., 30000., 50)))
+    value, gradient = itp.value_and_gradient(x)
+    assert gradient.shape == (50, 2, 2)
+    assert np.allclose(value, itp(x))
+    for k, h in enumerate([1e-6, 1e-3]):
+        dx = np.zeros(2)
+        dx[k] = h
+        numerical = (itp(x + dx) - itp(x - dx)) / 2. / h
+        assert np.allclose(gradient[..., k],
+                           numerical,
+                           rtol=1e-6,
+                           atol=1e-6 * np.max(np.abs(numerical)))
+    itp.analytic = False
+    value_fallback, gradient_fallback = itp.value_and_gradient(x)
+    assert np.allclose(value_fallback, value)
+    assert np.allclose(gradient_fallback, gradient, rtol=1e-6)
+
+
+def test_unloaded_column():
+    atm_single = atm_reader(columns=['G3'])
+    with pytest.raises(ValueError):
+        atm_single.interp_atm(dependent='V')
+    with pytest.raises(ValueError):
+        atm_reader(columns=['G4'])
+
+
+# The synthesised DA columns agree with the bundled synthetic photometry
+def test_add_synthetic_photometry(tmp_path):
+    atm_synthetic = atm_reader(columns=['G3'])
+    filepath = str(tmp_path / 'synthetic_photometry.npz')
+    assert atm_synthetic.add_synthetic_photometry(
+        ['g_ps1', 'G3'], filepath=filepath, overwrite=True) == ['g_ps1', 'G3']
+    assert 'g_ps1' in atm_synthetic.columns
+    assert atm_synthetic.column_units['g_ps1'] == 'mag'
+    assert np.isnan(atm_synthetic.model_db['g_ps1']).all()
+    # The models outside the Koester grid are NaN
+    assert np.isnan(
+        atm_synthetic.model_da['g_ps1'][atm_synthetic.model_da['Teff'] <
+                                        5000.]).all()
+    valid = np.isfinite(atm_synthetic.model_da['g_ps1'])
+    assert np.allclose(atm_synthetic.model_da['g_ps1'][valid],
+                       atm.model_da['g_ps1'][valid],
+                       atol=0.1)
+    assert np.isclose(atm_synthetic.interp_atm(dependent='g_ps1')(8.0, 12.),
+                      atm.interp_atm(dependent='g_ps1')(8.0, 12.),
+                      atol=0.02)
+    with pytest.raises(ValueError):
+        atm_synthetic.add_synthetic_photometry('G3', filepath=filepath)
+    with pytest.raises(ValueError):
+        atm_synthetic.interp_atm(dependent='g_ps1', atmosphere='He')
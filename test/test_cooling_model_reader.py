@@ -0,0 +1,202 @@
+import json
+import numpy as np
+import pytest
+from WDPhotTools import cooling_model_reader as cmr
+
+
+# The concurrent loaders have to return the tracks in the same order
+def test_parallel_loading():
+    mass, cooling_model, _, _ = cmr.get_cooling_model('montreal_co_da_20')
+    assert (np.diff(mass) > 0.).all()
+    for backend in ['thread', 'process']:
+        mass_parallel, cooling_model_parallel, _, _ = cmr.get_cooling_model(
+            'montreal_co_da_20', n_jobs=2, backend=backend)
+        assert np.array_equal(mass, mass_parallel)
+        for i, j in zip(cooling_model, cooling_model_parallel):
+            assert np.array_equal(i, j)
+
+
+def test_read_wrapped_track(tmp_path):
+    filepath = tmp_path / 'wrapped.txt'
+    filepath.write_text('header\n1 2 3\n4 5\n6 7 8\n9 10\n')
+    track = cmr._read_wrapped_track(str(filepath),
+                                    dtype=[(i, np.float64)
+                                           for i in 'abcde'],
+                                    skiprows=1)
+    assert track.shape == (2, )
+    assert np.array_equal(track['a'], [1., 6.])
+    assert np.array_equal(track['e'], [5., 10.])
+    # A value which cannot be parsed is not silently dropped
+    filepath.write_text('header\n1 2 3\n4 5\n6 7 x\n9 10\n')
+    with pytest.raises(ValueError):
+        cmr._read_wrapped_track(str(filepath),
+                                dtype=[(i, np.float64) for i in 'abcde'],
+                                skiprows=1)
+
+
+def test_lazy_tracks():
+    mass, cooling_model, column_names, _ = cmr.get_cooling_model(
+        'lpcode_co_db_17_z0001', mass_range='intermediate')
+    cooling_tracks = cmr.get_cooling_tracks('lpcode_co_db_17_z0001',
+                                            mass_range='intermediate')
+    assert np.array_equal(cooling_tracks.mass, mass)
+    assert cooling_tracks.column_names == column_names
+    mass_selected, cooling_model_selected = cooling_tracks.get(
+        mass=mass[[2, 0]], columns=['age', 'lum'])
+    assert np.array_equal(mass_selected, mass[[2, 0]])
+    assert cooling_model_selected[0].dtype.names == ('age', 'lum')
+    for i, j in zip(cooling_model[[2, 0]], cooling_model_selected):
+        assert np.array_equal(i['age'], j['age'])
+        assert np.array_equal(i['lum'], j['lum'])
+
+
+def test_lazy_wrapped_tracks():
+    cooling_tracks = cmr.get_cooling_tracks('montreal_co_da_20')
+    _, cooling_model = cooling_tracks.get(mass=0.6, columns=['Teff', 'lum'])
+    assert len(cooling_model) == 1
+    assert cooling_model[0].dtype.names == ('Teff', 'lum')
+    assert cooling_model[0].flags['C_CONTIGUOUS']
+
+
+# The packed archive has to return the same tracks as the track files
+def test_cooling_model_archive(tmp_path):
+    filepath = cmr.build_cooling_model_archive(
+        str(tmp_path / 'cooling_models.npy'),
+        models=['lpcode_co_db_17_z0001', 'basti_co_da_10'])
+    archive = cmr.CoolingModelArchive(filepath)
+    assert 'basti_co_da_10' in archive
+    assert 'montreal_co_da_20' not in archive
+    for model in ['lpcode_co_db_17_z0001', 'basti_co_da_10']:
+        for mass_range in ('all', ) + cmr.cooling_model_registry[model][
+                'mass_ranges']:
+            mass, cooling_model, column_names, _ = cmr.get_cooling_model(
+                model, mass_range=mass_range, archive=False)
+            mass_packed, cooling_model_packed, column_names_packed, _ =\
+                cmr.get_cooling_model(model,
+                                      mass_range=mass_range,
+                                      archive=archive)
+            assert np.array_equal(mass, mass_packed)
+            assert column_names == column_names_packed
+            for i, j in zip(cooling_model, cooling_model_packed):
+                assert i.dtype == j.dtype
+                assert np.shares_memory(j, archive.data)
+                for c in i.dtype.names:
+                    assert np.allclose(i[c],
+                                       j[c],
+                                       rtol=1e-12,
+                                       atol=1e-12 * np.nanmax(np.abs(i[c])))
+    _, cooling_model = cmr.get_cooling_tracks(
+        'basti_co_da_10', archive=archive).get(mass=0.61,
+                                               columns=['age', 'lum'])
+    assert cooling_model[0].dtype.names == ('age', 'lum')
+    assert np.shares_memory(cooling_model[0], archive.data)
+    # The flat tracks of a mass range are a single view of the archive
+    mass, offsets, tracks, _, _ = cmr.get_cooling_model_flat(
+        'basti_co_da_10', mass_range='high', archive=archive)
+    _, cooling_model, _, _ = cmr.get_cooling_model('basti_co_da_10',
+                                                   mass_range='high',
+                                                   archive=archive)
+    assert np.shares_memory(tracks, archive.data)
+    assert np.array_equal(np.diff(offsets), [len(i) for i in cooling_model])
+    for i, track in enumerate(cooling_model):
+        assert np.array_equal(tracks[offsets[i]:offsets[i + 1]], track)
+
+
+
+# An archive is not used if its track files have changed or if it is of
+# another version
+def test_cooling_model_archive_stale(tmp_path):
+    filepath = cmr.build_cooling_model_archive(
+        str(tmp_path / 'cooling_models.npy'), models=['basti_co_da_10'])
+    index_path = str(tmp_path / 'cooling_models.json')
+    assert cmr.CoolingModelArchive(filepath).has('basti_co_da_10')
+    with open(index_path) as f:
+        index = json.load(f)
+    # A track file is modified after the archive is built
+    sources = index['models']['basti_co_da_10']['sources']
+    sources[sorted(sources)[0]][0] -= 1
+    with open(index_path, 'w') as f:
+        json.dump(index, f)
+    archive = cmr.CoolingModelArchive(filepath)
+    with pytest.warns(UserWarning, match='have changed'):
+        assert not archive.has('basti_co_da_10')
+    mass, cooling_model, _, _ = cmr.get_cooling_model('basti_co_da_10',
+                                                      archive=archive)
+    assert not np.shares_memory(cooling_model[0], archive.data)
+    assert np.array_equal(
+        mass,
+        cmr.get_cooling_model('basti_co_da_10', archive=False)[0])
+    # An archive of another version
+    index['version'] = cmr.archive_version + 1
+    with open(index_path, 'w') as f:
+        json.dump(index, f)
+    cmr._archives.pop(filepath, None)
+    with pytest.warns(UserWarning, match='version'):
+        assert cmr._get_archive(filepath) is None
+    cmr._archives.pop(filepath, None)
+
+
+def test_registry():
+    assert list(cmr.model_list) == cmr.list_cooling_model_names()
+    for mass_range in ['low', 'intermediate', 'high']:
+        for model in cmr.list_cooling_model_names(mass_range):
+            assert mass_range in cmr.cooling_model_registry[model][
+                'mass_ranges']
+    assert 'lpcode_one_da_07' not in cmr.list_cooling_model_names('low')
+
+
+@pytest.mark.xfail(raises=ValueError)
+def test_unavailable_mass_range():
+    cmr.get_cooling_model('lpcode_one_da_07', mass_range='low')
+
+
+def test_camisassa17_tracks():
+    mass, cooling_model, column_names, _ = cmr.get_cooling_model(
+        'lpcode_co_db_17')
+    assert len(mass) == len(cooling_model) > 0
+    assert list(cooling_model[0].dtype.names) == list(column_names)
+
+
+def test_flat_tracks():
+    mass, cooling_model, _, _ = cmr.get_cooling_model('montreal_co_db_20',
+                                                      mass_range='low',
+                                                      archive=False)
+    mass_flat, offsets, tracks, _, _ = cmr.get_cooling_model_flat(
+        'montreal_co_db_20',
+        mass_range='low',
+        columns=['age', 'lum'],
+        archive=False)
+    assert np.array_equal(mass, mass_flat)
+    assert offsets[0] == 0
+    assert offsets[-1] == len(tracks)
+    assert tracks.dtype.names == ('age', 'lum')
+    for i, track in enumerate(cooling_model):
+        assert np.array_equal(tracks['age'][offsets[i]:offsets[i + 1]],
+                              track['age'])
+    assert np.array_equal(
+        np.repeat(mass_flat, np.diff(offsets)),
+        np.concatenate([[m] * len(i) for m, i in zip(mass, cooling_model)]))
+
+
+# Only the photometric columns are stored in single precision
+def test_single_precision_tracks():
+    for archive in [None, False]:
+        _, offsets, tracks, _, _ = cmr.get_cooling_model_flat(
+            'basti_co_da_10', archive=archive)
+        _, offsets_single, tracks_single, _, column_units = \
+            cmr.get_cooling_model_flat('basti_co_da_10',
+                                       archive=archive,
+                                       single_precision=True)
+        assert np.array_equal(offsets, offsets_single)
+        for i in tracks.dtype.names:
+            if column_units[i] == 'mag':
+                assert tracks_single[i].dtype == np.float32
+                assert np.allclose(tracks_single[i], tracks[i], rtol=1e-6)
+            else:
+                assert tracks_single[i].dtype == np.float64
+                assert np.array_equal(tracks_single[i], tracks[i])
+    _, tracks_single = cmr.get_cooling_tracks('basti_co_da_10').get(
+        columns=['age', 'lum', 'u'], single_precision=True)
+    assert tracks_single[0].dtype == np.dtype([('age', np.float64),
+                                               ('lum', np.float64),
+                                               ('u', np.float32)])
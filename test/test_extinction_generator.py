@@ -0,0 +1,52 @@
+import numpy as np
+import os
+import pytest
+from WDPhotTools import extinction_generator as eg
+
+models, Teff, logg = eg.list_koester_models()
+index = np.arange(len(models))[::97]
+
+
+def test_koester_models():
+    assert len(models) == len(np.unique(Teff)) * len(np.unique(logg))
+    assert (np.diff(logg) >= 0.).all()
+
+
+# The tables have to be reproduced from the spectra and the response curves
+def test_generate_extinction_table(tmp_path):
+    tables = eg.generate_extinction_table(filters=['G3', 'W4', 'FUV'],
+                                          folder=str(tmp_path),
+                                          models=[models[i] for i in index])
+    for f in ['G3', 'W4', 'FUV']:
+        table = np.loadtxt(os.path.join(eg.extinction_folder,
+                                        '{}.csv'.format(f)),
+                           delimiter=',')
+        assert np.allclose(tables[f], table[index], rtol=1e-10, atol=1e-10)
+        assert np.allclose(
+            np.loadtxt(os.path.join(str(tmp_path), '{}.csv'.format(f)),
+                       delimiter=','), tables[f])
+
+
+def test_generate_extinction_table_parallel():
+    tables = eg.generate_extinction_table(filters='G3',
+                                          folder=False,
+                                          models=[models[i] for i in index])
+    tables_parallel = eg.generate_extinction_table(
+        filters='G3',
+        n_jobs=2,
+        folder=False,
+        models=[models[i] for i in index])
+    assert np.array_equal(tables['G3'], tables_parallel['G3'])
+
+
+def test_resample_spectrum():
+    spectres = pytest.importorskip('spectres')
+    wavelength, flux = eg.extended_spectrum(models[0], Teff[0])
+    f_wavelength, _ = eg.load_filter(eg.list_filter_responses()['W4'])
+    assert np.allclose(
+        eg.resample_spectrum(f_wavelength, wavelength, flux),
+        spectres.spectres(f_wavelength,
+                          wavelength,
+                          flux,
+                          fill=0.,
+                          verbose=False))
@@ -244,6 +244,22 @@ def test_fitting_Mbol_lsq():
                       atol=1e-03).all()
 
 
+# Fitting for Mbol and the distance with 5 filters
+def test_fitting_Mbol_distance_lsq():
+    ftr.fit(filters=['G3', 'G3_BP', 'G3_RP', 'FUV', 'NUV'],
+            mags=[10.882, 10.853, 10.946, 11.301, 11.183],
+            mag_errors=[0.1, 0.1, 0.1, 0.1, 0.1],
+            atmosphere='H',
+            logg=7.5,
+            independent=['Mbol'],
+            method='least_square',
+            initial_guess=[10.0])
+    assert np.isclose(ftr.results['H'].x,
+                      np.array([9.962, 10.]),
+                      rtol=1e-03,
+                      atol=1e-03).all()
+
+
 # Fitting for Mbol with 5 filters for both DA and DB with alternating None
 def test_fitting_Mbol_with_None_lsq():
     ftr.fit(filters=['G3', 'G3_BP', 'G3_RP', 'FUV', 'NUV', 'U'],
@@ -606,4 +622,227 @@ def test_chi2_minimization_red_interpolated():
     assert np.isclose(ftr.results['H'].x,
                       np.array([9.962, 7.5]),
                       rtol=1e-03,
-                      atol=1e-03).all()
\ No newline at end of file
+                      atol=1e-03).all()
+
+
+# The reddened magnitudes are interpolated once for a fixed Rv and E(B-V)
+def test_reddened_interpolator_cache():
+    ftr_cache = WDfitter()
+    ftr_cache.interp_reddening(filters=['G3', 'G3_BP', 'G3_RP', 'FUV', 'NUV'])
+    mags = np.array([10.882, 10.853, 10.946, 11.301, 11.183])
+    mags = mags + extinction
+    for i in range(2):
+        ftr_cache.fit(atmosphere='H',
+                      filters=['G3', 'G3_BP', 'G3_RP', 'FUV', 'NUV'],
+                      mags=mags,
+                      mag_errors=[0.1, 0.1, 0.1, 0.1, 0.1],
+                      independent=['Mbol', 'logg'],
+                      distance=10.,
+                      distance_err=0.1,
+                      initial_guess=[10.0, 7.5],
+                      reuse_interpolator=i > 0,
+                      Rv=rv,
+                      ebv=ebv)
+        if i == 0:
+            interpolator_g3 = ftr_cache.reddened_interpolator['H']['G3']
+    assert ftr_cache.reddened_interpolator['H']['G3'] is interpolator_g3
+    assert np.isclose(interpolator_g3(9.962, 7.5),
+                      ftr_cache.interpolator['H']['G3'](9.962, 7.5) + A_G3,
+                      atol=1e-3)
+    assert np.isclose(ftr_cache.results['H'].x,
+                      np.array([9.962, 7.5]),
+                      rtol=1e-03,
+                      atol=1e-03).all()
+
+
+# Fitting the E(B-V) as a free parameter
+def test_fitting_ebv():
+    mags = np.array([10.882, 10.853, 10.946, 11.301, 11.183])
+    mags = mags + extinction
+    ftr.interp_reddening(filters=['G3', 'G3_BP', 'G3_RP', 'FUV', 'NUV'])
+    ftr.fit(atmosphere='H',
+            filters=['G3', 'G3_BP', 'G3_RP', 'FUV', 'NUV'],
+            mags=mags,
+            mag_errors=[0.1, 0.1, 0.1, 0.1, 0.1],
+            independent=['Mbol', 'logg'],
+            distance=10.,
+            distance_err=0.1,
+            initial_guess=[10.0, 7.5],
+            Rv=rv,
+            ebv=0.5,
+            fit_ebv=True)
+    assert np.isclose(ftr.results['H'].x,
+                      np.array([9.962, 7.5, ebv]),
+                      rtol=1e-03,
+                      atol=1e-03).all()
+    assert np.isclose(ftr.best_fit_params['H']['ebv'], ebv, atol=1e-3)
+
+
+# Fitting the E(B-V), the Rv and the distance with the analytic Jacobian
+def test_fitting_ebv_Rv_distance_least_square():
+    mags = np.array([10.882, 10.853, 10.946, 11.301, 11.183])
+    mags = mags + extinction
+    ftr.interp_reddening(filters=['G3', 'G3_BP', 'G3_RP', 'FUV', 'NUV'])
+    ftr.fit(atmosphere='H',
+            filters=['G3', 'G3_BP', 'G3_RP', 'FUV', 'NUV'],
+            mags=mags,
+            mag_errors=[0.1, 0.1, 0.1, 0.1, 0.1],
+            independent=['Mbol', 'logg'],
+            initial_guess=[10.0, 7.5],
+            method='least_square',
+            Rv=3.,
+            ebv=1.,
+            fit_ebv=True,
+            fit_Rv=True)
+    assert np.isclose(ftr.results['H'].x,
+                      np.array([9.962, 7.5, ebv, rv, 10.]),
+                      rtol=1e-03,
+                      atol=1e-03).all()
+    assert np.isclose(ftr.best_fit_params['H']['Rv'], rv, atol=1e-3)
+
+
+# The Jacobian of the chi2 has to match the finite differences
+def test_chi2_minimization_jac():
+    mags = np.array([10.882, 10.853, 10.946, 11.301, 11.183])
+    errors = np.array([0.1, 0.1, 0.1, 0.1, 0.1])
+    ftr.fit(atmosphere='H',
+            filters=['G3', 'G3_BP', 'G3_RP', 'FUV', 'NUV'],
+            mags=mags,
+            mag_errors=errors,
+            independent=['Mbol', 'logg'],
+            distance=10.,
+            distance_err=0.1,
+            method='least_square',
+            initial_guess=[10.0, 7.5])
+    interpolator_filter = [
+        ftr.interpolator['H'][i]
+        for i in ['G3', 'G3_BP', 'G3_RP', 'FUV', 'NUV']
+    ]
+    for x, fun, jac, args in [
+        ([10.1, 7.6], ftr._chi2_minimization, ftr._chi2_minimization_jac,
+         (mags + 0.1, errors, 10., 0.1, interpolator_filter)),
+        ([10.1, 7.6, 11.], ftr._chi2_minimization_distance,
+         ftr._chi2_minimization_distance_jac,
+         (mags + 0.1, errors, interpolator_filter, 2))
+    ]:
+        x = np.array(x)
+        analytic = jac(x, *args)
+        for k in range(len(x)):
+            dx = np.zeros(len(x))
+            dx[k] = 1e-6
+            numerical = (fun(x + dx, *args) - fun(x - dx, *args)) / 2e-6
+            assert np.allclose(analytic[:, k], numerical, rtol=1e-5,
+                               atol=1e-6)
+    # A user supplied Jacobian takes precedence
+    ftr.fit(atmosphere='H',
+            filters=['G3', 'G3_BP', 'G3_RP', 'FUV', 'NUV'],
+            mags=mags,
+            mag_errors=errors,
+            independent=['Mbol', 'logg'],
+            method='least_square',
+            initial_guess=[10.0, 7.5],
+            kwargs_for_least_square={'jac': '2-point'})
+    assert np.isclose(ftr.results['H'].x,
+                      np.array([9.962, 7.5, 10.]),
+                      rtol=1e-03,
+                      atol=1e-03).all()
+
+
+# Fitting both atmospheres concurrently has to give the same results as
+# fitting them one after the other
+def test_fitting_concurrently():
+    ftr_serial = WDfitter()
+    ftr_concurrent = WDfitter()
+    for f, n_jobs in [(ftr_serial, 1), (ftr_concurrent, 2)]:
+        f.fit(filters=['G3', 'G3_BP', 'G3_RP', 'FUV', 'NUV'],
+              mags=[10.882, 10.853, 10.946, 11.301, 11.183],
+              mag_errors=[0.1, 0.1, 0.1, 0.1, 0.1],
+              independent=['Mbol', 'logg'],
+              method='least_square',
+              initial_guess=[10.0, 7.5],
+              n_jobs=n_jobs)
+    for j in ['H', 'He']:
+        assert np.allclose(ftr_serial.results[j].x,
+                           ftr_concurrent.results[j].x)
+        assert np.isclose(ftr_serial.best_fit_params[j]['Teff'],
+                          ftr_concurrent.best_fit_params[j]['Teff'])
+    assert np.isclose(ftr_concurrent.results['H'].x,
+                      np.array([9.962, 7.5, 10.]),
+                      rtol=1e-03,
+                      atol=1e-03).all()
+    comparison = ftr_concurrent.model_comparison
+    assert comparison['best_atmosphere'] == 'H'
+    assert comparison['chi2']['H'] < comparison['chi2']['He']
+    assert np.isclose(sum(comparison['probability'].values()), 1.)
+    assert np.isclose(
+        comparison['BIC']['H'] - comparison['chi2']['H'], 3. * np.log(5.))
+
+
+# The initial guess is outside the grid, the minimizer alone cannot move
+# but the multistart method has to find the global minimum
+def test_fitting_logg_Mbol_distance_multistart():
+    np.random.seed(0)
+    ftr.fit(atmosphere='H',
+            filters=['G3', 'G3_BP', 'G3_RP', 'FUV', 'NUV'],
+            mags=[10.882, 10.853, 10.946, 11.301, 11.183],
+            mag_errors=[0.1, 0.1, 0.1, 0.1, 0.1],
+            independent=['Mbol', 'logg'],
+            method='multistart',
+            initial_guess=[16.0, 9.2],
+            nstarts=64,
+            nbest=4,
+            n_jobs=2)
+    assert np.isclose(ftr.results['H'].x,
+                      np.array([9.962, 7.5, 10.]),
+                      rtol=1e-03,
+                      atol=1e-03).all()
+    assert ftr.multistart['H']['starts'].shape == (65, 3)
+    assert np.isinf(ftr.multistart['H']['chi2_starts'][0])
+    assert len(ftr.multistart['H']['chi2']) == 4
+    assert ftr.multistart['H']['n_at_best'] >= 1
+    assert np.isclose(ftr.best_fit_params['H']['Teff'], 13000., rtol=1e-3)
+
+
+# Fitting the E(B-V) without providing the Rv, which is fixed at 3.1
+def test_fitting_ebv_without_Rv():
+    ebv_small = 0.2
+    mags = np.array([10.882, 10.853, 10.946, 11.301, 11.183])
+    mags = mags + extinction / ebv * ebv_small
+    for distance, expected in [(None, [9.962, 7.5, ebv_small, 10.]),
+                               (10., [9.962, 7.5, ebv_small])]:
+        ftr.fit(atmosphere='H',
+                filters=['G3', 'G3_BP', 'G3_RP', 'FUV', 'NUV'],
+                mags=mags,
+                mag_errors=[0.1, 0.1, 0.1, 0.1, 0.1],
+                independent=['Mbol', 'logg'],
+                initial_guess=[10.0, 7.5],
+                distance=distance,
+                distance_err=0.1,
+                method='least_square',
+                fit_ebv=True)
+        assert ftr.fitting_params['Rv'] == 3.1
+        assert np.isclose(ftr.results['H'].x,
+                          np.array(expected),
+                          rtol=1e-03,
+                          atol=1e-03).all()
+
+
+# Fitting the E(B-V) with a single independent variable, the best fit
+# magnitudes are the intrinsic ones
+def test_fitting_Teff_ebv():
+    ebv_small = 0.2
+    mags = np.array([10.882, 10.853, 10.946, 11.301, 11.183])
+    ftr.fit(atmosphere='H',
+            filters=['G3', 'G3_BP', 'G3_RP', 'FUV', 'NUV'],
+            mags=mags + extinction / ebv * ebv_small,
+            mag_errors=[0.1, 0.1, 0.1, 0.1, 0.1],
+            independent=['Teff'],
+            logg=7.5,
+            initial_guess=[12000.],
+            method='least_square',
+            fit_ebv=True)
+    assert np.isclose(ftr.results['H'].x,
+                      np.array([13000., ebv_small, 10.]),
+                      rtol=1e-03,
+                      atol=1e-03).all()
+    assert np.isclose(ftr.best_fit_params['H']['G3'], mags[0], atol=1e-3)
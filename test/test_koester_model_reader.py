@@ -0,0 +1,24 @@
+import numpy as np
+import pytest
+from WDPhotTools import extinction_generator as eg
+from WDPhotTools import koester_model_reader as kmr
+
+
+def test_koester_library(tmp_path):
+    filepath = str(tmp_path / 'koester_models.npy')
+    kmr.build_koester_library(filepath, n_wavelength=2048)
+    library = kmr.load_koester_library(filepath)
+    assert library is kmr.load_koester_library(filepath)
+    assert isinstance(library.flux, np.memmap)
+    assert library.flux.shape == (len(library.Teff), len(library.logg), 2048)
+    models, Teff, logg = eg.list_koester_models()
+    assert len(library) == len(models)
+    for i in [0, 500, len(models) - 1]:
+        wavelength, flux = np.loadtxt(models[i]).T
+        library_wavelength, library_flux = library.get(Teff[i], logg[i])
+        assert np.allclose(
+            library_flux,
+            eg.resample_spectrum(library_wavelength, wavelength, flux),
+            rtol=1e-6)
+    with pytest.raises(ValueError):
+        library.get(5100., 8.0)
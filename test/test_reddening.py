@@ -2,6 +2,7 @@ import numpy as np
 import pytest
 from WDPhotTools.reddening import reddening_vector_interpolated
 from WDPhotTools.reddening import reddening_vector_filter
+from WDPhotTools.reddening import ReddeningCube, build_reddening_cube
 
 wave_grizyJHK = np.array(
     (4876.7, 6200.1, 7520.8, 8665.3, 9706.3, 12482.9, 16588.4, 21897.7))
@@ -166,3 +167,34 @@ def test_Rv51_filter():
         red_K([8.0, 7000., 5.1])
     ]).flatten()
     assert np.allclose(red, Rv_grizyJHK_51, rtol=1e-2, atol=1e-2)
+
+
+# The cube has to reproduce the per-filter interpolators in one call
+def test_reddening_cube():
+    filters = ['g_ps1', 'r_ps1', 'i_ps1', 'z_ps1', 'y_ps1', 'J_mko', 'H_mko',
+               'K_mko']
+    cube = ReddeningCube(filters)
+    assert cube.filters == filters
+    assert np.allclose(cube(8.0, 7000., 3.1),
+                       Rv_grizyJHK_31,
+                       rtol=1e-2,
+                       atol=1e-2)
+    logg = np.random.uniform(6.5, 9.5, 100)
+    Teff = np.random.uniform(5000., 80000., 100)
+    Rv = np.random.uniform(2.1, 5.1, 100)
+    red = cube(logg, Teff, Rv)
+    assert red.shape == (100, len(filters))
+    for i, f in enumerate(filters):
+        assert np.allclose(
+            red[:, i],
+            reddening_vector_filter(f)(np.column_stack((logg, Teff, Rv))))
+    assert np.isnan(cube(10., 7000., 3.1)).all()
+    with pytest.raises(ValueError):
+        ReddeningCube(['G4'])
+
+
+def test_reddening_cube_cache(tmp_path):
+    filepath = str(tmp_path / 'reddening_cube.npz')
+    build_reddening_cube(filepath)
+    cube = ReddeningCube(['G3', 'G3_BP'], filepath=filepath)
+    assert np.array_equal(cube.data, ReddeningCube(['G3', 'G3_BP']).data)
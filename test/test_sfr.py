@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+from scipy import integrate
+from WDPhotTools.sfr import TophatSFR
+from WDPhotTools.sfr import ExponentialSFR
+from WDPhotTools.sfr import TabulatedSFR
+from WDPhotTools.sfr import SFR
+
+t = np.linspace(-1e9, 12e9, 1001)
+
+tophat = TophatSFR(10e9, 9e9)
+exponential = ExponentialSFR(10e9, mean_lifetime=3e9)
+tabulated = TabulatedSFR((1e9, 2e9, 5e9), (0., 2., 1.))
+bursts = TophatSFR(10e9, 9e9) + TophatSFR(2e9, 1.9e9, rate=3.)
+
+
+# The scalar and the vectorised evaluations have to agree
+def test_scalar_and_vector_evaluation():
+    for sfr in [tophat, exponential, tabulated, bursts]:
+        assert np.allclose(sfr(t), [sfr(i) for i in t])
+        assert np.shape(sfr(t.reshape(7, -1, 11))) == (7, 13, 11)
+
+
+def test_tophat():
+    assert tophat(9.5e9) == 1.
+    assert tophat(8.9e9) == 0.
+    assert tophat(10.1e9) == 0.
+    assert np.isclose(tophat.integral(0., 12e9), 1e9)
+    assert np.allclose(tophat.breakpoints, (9e9, 10e9))
+
+
+# Compare the analytic integrals against numerical integration
+def test_integral():
+    for sfr in [tophat, exponential, tabulated, bursts]:
+        for t1, t2 in [(0., 12e9), (1.5e9, 9.5e9), (3e9, 4e9)]:
+            points = sfr.breakpoints[(sfr.breakpoints > t1)
+                                     & (sfr.breakpoints < t2)]
+            assert np.isclose(sfr.integral(t1, t2),
+                              integrate.quad(sfr, t1, t2, points=points,
+                                             limit=1000)[0],
+                              rtol=1e-6)
+
+
+def test_bursts():
+    assert np.isclose(bursts.integral(0., 12e9), 1e9 + 3e8)
+    assert np.allclose(bursts.breakpoints, (1.9e9, 2e9, 9e9, 10e9))
+    assert bursts(1.95e9) == 3.
+
+
+# An SFR has to implement both the evaluation and the antiderivative
+def test_abstract_sfr():
+    with pytest.raises(TypeError):
+        SFR()
+
+    class IncompleteSFR(SFR):
+        def _evaluate(self, time):
+            return np.ones_like(time)
+
+    with pytest.raises(TypeError):
+        IncompleteSFR()
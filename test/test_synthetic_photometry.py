@@ -0,0 +1,84 @@
+import numpy as np
+import os
+from WDPhotTools import extinction_generator as eg
+from WDPhotTools import synthetic_photometry as sp
+from WDPhotTools.atmosphere_model_reader import atm_reader
+from WDPhotTools.reddening import ReddeningCube
+
+
+# A new passband is added as a copy of the Pan-STARRS g filter
+def test_add_filter(tmp_path):
+    reddening_cube_filepath = str(tmp_path / 'reddening_cube.npz')
+    synthetic_photometry_filepath = str(tmp_path / 'synthetic_photometry.npz')
+    table, magnitude = sp.add_filter(
+        'test_g',
+        filepath=eg.list_filter_responses()['g_ps1'],
+        folder=str(tmp_path),
+        reddening_cube_filepath=reddening_cube_filepath,
+        synthetic_photometry_filepath=synthetic_photometry_filepath)
+    assert np.allclose(table,
+                       np.loadtxt(os.path.join(eg.extinction_folder,
+                                               'g_ps1.csv'),
+                                  delimiter=','),
+                       rtol=1e-10,
+                       atol=1e-10)
+    assert os.path.exists(str(tmp_path / 'test_g.csv'))
+    cube = ReddeningCube(['g_ps1', 'test_g'],
+                         filepath=reddening_cube_filepath)
+    assert np.allclose(cube.data[0], cube.data[1])
+    photometry = sp.load_synthetic_photometry(synthetic_photometry_filepath)
+    assert list(photometry['filters']) == ['test_g']
+    assert np.array_equal(photometry['data'][0], magnitude)
+    # The absolute magnitudes agree with the atmosphere models
+    atm = atm_reader()
+    for logg, Teff in [(7.5, 20000.), (8.0, 13000.), (8.5, 6000.)]:
+        row = atm.model_da[(atm.model_da['logg'] == logg)
+                           & (atm.model_da['Teff'] == Teff)]
+        radius = np.sqrt(6.674e-8 * row['mass'][0] * 1.989e33 / 10.**logg)
+        i = np.argwhere(photometry['logg'] == logg)[0][0]
+        j = np.argwhere(photometry['Teff'] == Teff)[0][0]
+        assert np.isclose(
+            magnitude[i, j] - 5. * np.log10(radius / 3.0857e19),
+            row['g_ps1'][0],
+            atol=0.02)
+
+
+# The weights of a filter on the grid of the spectra are the transpose of
+# the resampling of the spectra on the grid of the filter
+def test_resampling_weights():
+    rng = np.random.default_rng(0)
+    wavelength = np.sort(rng.uniform(1000., 5000., 300))
+    flux = rng.random(300)
+    new_wavelength = np.linspace(800., 4000., 100)
+    weight = rng.random((2, 100))
+    assert np.allclose(
+        sp.resampling_weights(new_wavelength, wavelength, weight) @ flux,
+        weight @ eg.resample_spectrum(new_wavelength, wavelength, flux))
+
+
+# The batched photometry agrees with the convolution of the spectra one by
+# one, including the black body beyond the spectra for W1
+def test_synthesise_photometry():
+    photometry = sp.synthesise_photometry(['g_ps1', 'W1'], Rv=[3.1])
+    assert photometry['data'].shape == (2, len(photometry['logg']),
+                                        len(photometry['Teff']))
+    assert photometry['reddening'].shape == photometry['data'].shape + (1, )
+    assert np.isclose(photometry['pivot_wavelength'][0], 4849., rtol=0.01)
+    models, Teff, logg = eg.list_koester_models()
+    filepaths = eg._filter_filepaths(['g_ps1', 'W1'])
+    index = [0, 500, len(models) - 1]
+    reddening, photon = eg.integrate_models([models[k] for k in index],
+                                            filepaths,
+                                            Rv=[3.1])
+    for n, k in enumerate(index):
+        i = np.argwhere(photometry['logg'] == logg[k])[0][0]
+        j = np.argwhere(photometry['Teff'] == Teff[k])[0][0]
+        for f, filepath in enumerate(filepaths):
+            wavelength, weight = eg.load_filter(filepath)
+            assert np.isclose(photometry['data'][f, i, j],
+                              sp.ab_magnitude(photon[n, f], wavelength,
+                                              weight),
+                              atol=1e-3)
+            assert np.isclose(photometry['reddening'][f, i, j, 0],
+                              reddening[n, f, 0],
+                              atol=1e-3)
@@ -1,6 +1,7 @@
 from matplotlib import pyplot as plt
 import numpy as np
 from WDPhotTools import theoretical_lf
+from WDPhotTools import wdlf_store
 
 wdlf = theoretical_lf.WDLF()
 
@@ -123,3 +124,217 @@ def test_changing_ifmr_model():
     wdlf.compute_density(Mag=Mag)
     wdlf.set_ifmr_model('C18')
     wdlf.compute_density(Mag=Mag)
+
+
+# The two-part S09b IFMR has to return one WD mass per MS mass
+def test_ifmr_S09b():
+    wdlf.set_ifmr_model('S09b')
+    M = np.array([1., 3., 4., 6.])
+    m = wdlf._ifmr(M)
+    assert m.shape == M.shape
+    assert np.allclose(m, [0.465, 0.733, 0.867, 0.961])
+    wdlf.set_ifmr_model('C08')
+
+
+def test_compute_density_multi_passband():
+    wdlf.set_sfr_model(mode='constant', age=age[0])
+    _, density = wdlf.compute_density(Mag=Mag,
+                                      passband=['Mbol', 'G3', 'G3_BP'],
+                                      save_csv=True,
+                                      folder='test_output')
+    assert list(density.keys()) == ['Mbol', 'G3', 'G3_BP']
+    for i in density.values():
+        assert len(i) == len(Mag)
+        assert np.isclose(np.sum(i), 1.)
+    wdlf.plot_wdlf(display=False,
+                   savefig=True,
+                   folder='test_output',
+                   filename='test_plot_wdlf_multi_passband',
+                   ext='png')
+    # Each passband has to match the single passband WDLF to within the
+    # integration tolerance
+    for p in ['Mbol', 'G3']:
+        _, density_single = wdlf.compute_density(Mag=Mag, passband=p)
+        assert np.allclose(density[p], density_single, rtol=1e-5, atol=1e-8)
+
+
+def test_compute_density_da_db_mixture():
+    wdlf.set_sfr_model(mode='constant', age=age[0])
+    _, density_da = wdlf.compute_density(Mag=Mag, passband='G3')
+    _, density_pure = wdlf.compute_density(Mag=Mag,
+                                           passband='G3',
+                                           da_fraction=1.)
+    assert np.allclose(density_da, density_pure, rtol=1e-3, atol=1e-6)
+    _, density_mixed = wdlf.compute_density(
+        Mag=Mag,
+        passband='G3',
+        da_fraction=lambda Teff: np.where(Teff > 10000., 0.8, 0.6))
+    assert np.isclose(np.sum(density_mixed), 1.)
+    _, density_multi = wdlf.compute_density(Mag=Mag,
+                                            passband=['G3', 'G3_BP'],
+                                            da_fraction=0.8)
+    assert np.isclose(np.sum(density_multi['G3_BP']), 1.)
+    _, density_single = wdlf.compute_density(Mag=Mag,
+                                             passband='G3_BP',
+                                             da_fraction=0.8)
+    assert np.allclose(density_multi['G3_BP'],
+                       density_single,
+                       rtol=1e-5,
+                       atol=1e-8)
+
+
+def test_sfr_breakpoint_masses():
+    wdlf.set_sfr_model(mode='burst', age=age[0], duration=1e7)
+    wdlf.Mag_to_Mbol_itp = wdlf.atm_reader.interp_atm(
+        dependent='Mbol', atmosphere='H', independent=['mass', 'Mbol'])
+    masses = wdlf._sfr_breakpoint_masses(10., 0.5, 8.)
+    assert len(masses) > 0
+    assert np.allclose(np.sort(wdlf._formation_time(masses, 10.)),
+                       wdlf.sfr.breakpoints,
+                       rtol=1e-6)
+    # A 1E7 years burst should be integrated without extra sampling points
+    _, density = wdlf.compute_density(Mag=Mag, n_points=2)
+    assert np.isclose(np.sum(density), 1.0)
+    assert (density > 0.).sum() > 1
+
+
+def test_compute_density_integration_report():
+    wdlf.set_sfr_model(mode='burst', age=age[0], duration=1e8)
+    _, density, report = wdlf.compute_density(Mag=Mag,
+                                               epsabs=1e-3,
+                                               epsrel=1e-3,
+                                               full_output=True)
+    assert report is wdlf.integration_report
+    assert np.array_equal(report['error'], wdlf.number_density_err)
+    assert (report['neval'][density > 0.] > 0).all()
+    assert (report['error'] >= 0.).all()
+    # Only the bins with significant errors are tightened
+    _, density_adaptive, report_adaptive = wdlf.compute_density(
+        Mag=Mag,
+        epsabs=1e-3,
+        epsrel=1e-3,
+        adaptive_tolerance=1e-16,
+        full_output=True)
+    assert np.isclose(np.sum(density_adaptive), 1.0)
+    assert (report_adaptive['epsabs'] <= 1e-3).all()
+    assert (report_adaptive['epsabs'] < 1e-3).any()
+    assert (report_adaptive['epsabs'][report['error'] == 0.] == 1e-3).all()
+
+
+def test_compute_density_store(tmp_path):
+    wdlf.set_sfr_model(mode='burst', age=age[0], duration=1e8)
+    _, density = wdlf.compute_density(Mag=Mag, store=str(tmp_path))
+    store = wdlf_store.WDLFStore(str(tmp_path))
+    keys = store.find(passband='Mbol', sfr_mode='burst', epsabs=1e-6)
+    assert len(keys) == 1
+    output = store.get(keys[0])
+    assert np.allclose(output['number_density'], density)
+    assert output['config']['sfr_params'] == {'age': age[0], 'duration': 1e8}
+    # The stored WDLF is returned without being computed again
+    wdlf._integrate_passband = None
+    try:
+        _, density_stored = wdlf.compute_density(Mag=Mag, store=str(tmp_path))
+    finally:
+        del wdlf._integrate_passband
+    assert np.array_equal(density, density_stored)
+
+
+def test_compute_density_memoise(tmp_path):
+    wdlf.set_sfr_model(mode='burst', age=age[0], duration=1e8)
+    wdlf._cache.clear()
+    _, density = wdlf.compute_density(Mag=Mag,
+                                      store=str(tmp_path),
+                                      memoise=True)
+    assert len(wdlf._cache) == 1
+    _, density_memoised = wdlf.compute_density(Mag=Mag, memoise=True)
+    assert np.array_equal(density, density_memoised)
+    # A different tolerance is a different configuration
+    wdlf.compute_density(Mag=Mag, epsabs=1e-7, memoise=True)
+    assert len(wdlf._cache) == 2
+    # A redefined manual function is a different configuration
+    wdlf.set_sfr_model(mode='manual',
+                       age=age[0],
+                       sfr_model=lambda t: float((t > 2e9) & (t < 3e9)))
+    identity = wdlf._model_config()['sfr_params']['sfr_model']
+    wdlf.set_sfr_model(mode='manual',
+                       age=age[0],
+                       sfr_model=lambda t: float((t > 1e9) & (t < 3e9)))
+    assert identity != wdlf._model_config()['sfr_params']['sfr_model']
+    # Retrieve from the disk tier
+    wdlf.set_sfr_model(mode='burst', age=age[0], duration=1e8)
+    wdlf._cache.clear()
+    _, density_stored = wdlf.compute_density(Mag=Mag,
+                                             store=str(tmp_path),
+                                             memoise=True)
+    assert np.array_equal(density, density_stored)
+    assert wdlf.integration_report is None
+
+
+
+# The memoised WDLF is keyed on the cooling models from which the cooling
+# interpolators are built, not the ones which are set
+def test_compute_density_memoise_cooling_model(tmp_path):
+    wdlf_cooling = theoretical_lf.WDLF()
+    wdlf_cooling.set_sfr_model(mode='constant', age=age[0])
+    wdlf_cooling.compute_cooling_age_interpolator()
+    _, density = wdlf_cooling.compute_density(Mag=Mag,
+                                              store=str(tmp_path),
+                                              memoise=True)
+    wdlf_cooling.set_high_mass_cooling_model('basti_co_da_10')
+    _, density_memoised = wdlf_cooling.compute_density(Mag=Mag, memoise=True)
+    assert np.array_equal(density, density_memoised)
+    assert len(wdlf_cooling._cache) == 1
+    wdlf_cooling.compute_cooling_age_interpolator()
+    _, density_basti = wdlf_cooling.compute_density(Mag=Mag,
+                                                    store=str(tmp_path),
+                                                    memoise=True)
+    assert len(wdlf_cooling._cache) == 2
+    _, density_fresh = wdlf_cooling.compute_density(Mag=Mag)
+    assert np.allclose(density_basti, density_fresh)
+    assert not np.allclose(density_basti, density)
+    assert wdlf_cooling._model_config()['high_mass_cooling_model'] ==\
+        'basti_co_da_10'
+    # The atmosphere is not a part of the key of a mixed population
+    wdlf_cooling.compute_density(Mag=Mag,
+                                 atmosphere='H',
+                                 da_fraction=0.8,
+                                 memoise=True)
+    assert len(wdlf_cooling._cache) == 3
+    wdlf_cooling.compute_density(Mag=Mag,
+                                 atmosphere='He',
+                                 da_fraction=0.8,
+                                 memoise=True)
+    assert len(wdlf_cooling._cache) == 3
+
+
+def test_empty_mass_range():
+    wdlf_empty = theoretical_lf.WDLF(low_mass_cooling_model=None)
+    wdlf_empty.compute_cooling_age_interpolator()
+    assert wdlf_empty.mass.min() >= 0.5
+    assert 'lpcode_co_db_17_z0001' in\
+        wdlf_empty.intermediate_mass_cooling_model_list
+
+
+def test_resampled_cooling_grid():
+    wdlf_grid = theoretical_lf.WDLF()
+    wdlf_grid.compute_cooling_age_interpolator()
+    logL = np.log10(wdlf_grid.luminosity)
+    mask = (wdlf_grid.mass > 0.55) & (wdlf_grid.mass < 1.0) & (
+        wdlf_grid.age > 1e8) & (logL < 32.5)
+    age = wdlf_grid.cooling_interpolator(logL[mask], wdlf_grid.mass[mask])
+    wdlf_grid.compute_cooling_age_interpolator(resample=True)
+    age_grid = wdlf_grid.cooling_interpolator(logL[mask],
+                                              wdlf_grid.mass[mask])
+    assert wdlf_grid.cooling_grid['age'].shape == (1000, 200)
+    # Only the faint ends of the tracks are outside the physical domain
+    finite = np.isfinite(age_grid)
+    assert finite.mean() > 0.95
+    assert np.median(np.abs(age_grid[finite] / age[finite] - 1.)) < 0.01
+    # The grid is cached for the same set of cooling models
+    grid = wdlf_grid.cooling_grid
+    wdlf_grid.compute_cooling_age_interpolator(resample=True)
+    assert wdlf_grid.cooling_grid is grid
+    assert wdlf_grid._model_config()['cooling_grid'] == {
+        'n_logL': 1000,
+        'n_mass': 200
+    }
@@ -0,0 +1,55 @@
+import numpy as np
+from WDPhotTools.util import UniformGridInterpolator2D
+
+
+# A bilinear function has to be reproduced exactly
+def test_uniform_grid_interpolator():
+    x = np.linspace(0., 2., 5)
+    y = np.linspace(-1., 1., 9)
+    z = 1. + 2. * x[:, None] - 3. * y[None, :] + x[:, None] * y[None, :]
+    itp = UniformGridInterpolator2D(x, y, z, fill_value=-np.inf)
+    x_test = np.random.uniform(0., 2., 100)
+    y_test = np.random.uniform(-1., 1., 100)
+    z_test = 1. + 2. * x_test - 3. * y_test + x_test * y_test
+    assert np.allclose(itp(x_test, y_test), z_test)
+    assert np.allclose([itp(i, j) for i, j in zip(x_test, y_test)], z_test)
+    assert np.isclose(itp(2., 1.), 1. + 4. - 3. + 2.)
+    assert itp(2.1, 0.) == -np.inf
+    assert itp(np.nan, 0.) == -np.inf
+    assert np.array_equal(itp(np.array([-0.1, 1.]), np.array([0., 3.])),
+                          [-np.inf, -np.inf])
+
+
+def test_uniform_grid_interpolator_mask():
+    z = np.ones((3, 3))
+    z[2, 2] = np.nan
+    itp = UniformGridInterpolator2D([0., 1., 2.], [0., 1., 2.], z)
+    assert itp(0.5, 0.5) == 1.
+    assert np.isnan(itp(1.5, 1.5))
+    assert np.isnan(itp(np.array([1.5]), np.array([1.5]))[0])
+
+
+# The values have to match scipy and the gradient the finite differences
+def test_clough_tocher_gradient_interpolator():
+    from scipy.interpolate import CloughTocher2DInterpolator
+    from WDPhotTools.util import CloughTocher2DGradientInterpolator
+    rng = np.random.default_rng(0)
+    points = rng.uniform(0., 1., (50, 2))
+    values = np.column_stack((np.sin(3. * points[:, 0]) * points[:, 1],
+                              np.exp(points[:, 0] - points[:, 1])))
+    itp = CloughTocher2DGradientInterpolator(points, values)
+    itp_scipy = CloughTocher2DInterpolator(points, values)
+    x_test = rng.uniform(0.3, 0.7, (20, 2))
+    assert np.allclose(itp(x_test), itp_scipy(x_test), rtol=1e-12)
+    gradient = itp.gradient(x_test)
+    assert gradient.shape == (20, 2, 2)
+    h = 1e-6
+    for k in range(2):
+        dx = np.zeros(2)
+        dx[k] = h
+        numerical = (itp(x_test + dx) - itp(x_test - dx)) / 2. / h
+        assert np.allclose(gradient[..., k], numerical, atol=1e-6)
+    value, gradient_single = itp.value_and_gradient(*x_test[0])
+    assert np.allclose(value, itp(x_test[0]))
+    assert np.allclose(gradient_single, gradient[0])
+    assert np.isnan(itp.gradient(2., 2.)).all()
@@ -0,0 +1,91 @@
+import numpy as np
+import os
+from WDPhotTools.wdlf_store import WDLFStore, load_store
+
+Mag = np.arange(0, 20., 2.0)
+config = {'ifmr_model': 'C08', 'passband': 'G3', 'sfr_params': {'age': 3e9}}
+
+
+def test_add_and_get(tmp_path):
+    store = WDLFStore(str(tmp_path), shard_size=2)
+    density = np.random.random(len(Mag))
+    key = store.add(config, Mag, density)
+    assert key in store
+    output = store.get(key)
+    assert np.array_equal(output['Mag'], Mag)
+    assert np.array_equal(output['number_density'], density)
+    assert output['config'] == config
+    assert np.array_equal(store.lookup(config, Mag)['number_density'],
+                          density)
+
+
+def test_deduplication_and_find(tmp_path):
+    store = WDLFStore(str(tmp_path), shard_size=2)
+    for age in [1e9, 2e9, 3e9, 3e9]:
+        store.add(dict(config, sfr_params={'age': age}), Mag,
+                  np.ones(len(Mag)) * age)
+    assert len(store) == 3
+    # Reload from the disk
+    store = WDLFStore(str(tmp_path))
+    keys = store.find(sfr_params={'age': 2e9})
+    assert len(keys) == 1
+    assert np.all(store.get(keys[0])['number_density'] == 2e9)
+    assert len(store.find(passband='G3')) == len(store)
+
+
+# Two writers of the same store must not lose each other's WDLFs
+def test_concurrent_writers(tmp_path):
+    store_1 = WDLFStore(str(tmp_path), writer='one')
+    store_2 = WDLFStore(str(tmp_path), writer='two')
+    key_1 = store_1.add(dict(config, sfr_params={'age': 1e9}), Mag,
+                        np.ones(len(Mag)))
+    key_2 = store_2.add(dict(config, sfr_params={'age': 2e9}), Mag,
+                        np.ones(len(Mag)) * 2.)
+    # Each writer finds the WDLF of the other one
+    assert np.all(
+        store_1.lookup(dict(config, sfr_params={'age': 2e9}),
+                       Mag)['number_density'] == 2.)
+    assert store_2.add(dict(config, sfr_params={'age': 1e9}), Mag,
+                       np.zeros(len(Mag))) == key_1
+    # A partially written line of the index is ignored
+    with open(store_2.index_path, 'a') as f:
+        f.write('{"shard": "wdlf_two_')
+    store = WDLFStore(str(tmp_path))
+    assert len(store) == 2
+    assert np.all(store.get(key_1)['number_density'] == 1.)
+    assert np.all(store.get(key_2)['number_density'] == 2.)
+
+
+# The latest WDLF is used after the store is opened again
+def test_overwrite_reopen(tmp_path):
+    store = WDLFStore(str(tmp_path), writer='one')
+    key = store.add(config, Mag, np.ones(len(Mag)))
+    assert store.add(config, Mag, np.ones(len(Mag)) * 2.,
+                     overwrite=True) == key
+    assert np.all(store.get(key)['number_density'] == 2.)
+    store = WDLFStore(str(tmp_path), writer='two')
+    assert len(store) == 1
+    assert np.all(store.get(key)['number_density'] == 2.)
+    store.add(config, Mag, np.ones(len(Mag)) * 3., overwrite=True)
+    assert np.all(
+        WDLFStore(str(tmp_path)).lookup(config, Mag)['number_density'] == 3.)
+
+
+def test_compact_and_load_store(tmp_path):
+    keys = [
+        WDLFStore(str(tmp_path), shard_size=2, writer=str(i)).add(
+            dict(config, sfr_params={'age': age}), Mag,
+            np.ones(len(Mag)) * age) for i, age in enumerate([1e9, 2e9, 3e9])
+    ]
+    store = load_store(str(tmp_path))
+    assert load_store(os.path.join(str(tmp_path), '.')) is store
+    store.add(config, Mag, np.zeros(len(Mag)), overwrite=True)
+    store.compact()
+    assert sorted(os.listdir(str(tmp_path))) == [
+        'index_{}.jsonl'.format(store.writer),
+        'wdlf_{}_00000.bin'.format(store.writer)
+    ]
+    store = WDLFStore(str(tmp_path))
+    assert len(store) == 3
+    for key, age in zip(keys, [1e9, 2e9, 0.]):
+        assert np.all(store.get(key)['number_density'] == age)